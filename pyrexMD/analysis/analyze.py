@@ -39,11 +39,13 @@ from Bio.PDB import PDBParser, Polypeptide
 from MDAnalysis.analysis import distances as _distances, rms as _rms, align as _align
 import MDAnalysis as mda
 import numpy as np
+import h5py
 import seaborn as sns
 import matplotlib
 import matplotlib.pyplot as plt
 import operator
 import os
+import multiprocessing
 import glob
 import logging
 import warnings
@@ -173,10 +175,63 @@ def alignto(mobile, ref, sel1, sel2, weights='mass', tol_mass=0.1, strict=False)
     return old_rmsd, new_rmsd
 
 
+def _HELP_kabsch_batch(mobile_xyz, ref_xyz, weights=None):
+    """
+    Vectorized (weighted) Kabsch superposition of a block of frames onto a
+    single reference structure. Equivalent to calling alignto() for each frame
+    but without modifying any atom positions.
+
+    Args:
+        mobile_xyz (array): mobile coordinates with shape (n_frames, n_atoms, 3)
+        ref_xyz (array): reference coordinates with shape (n_atoms, 3)
+        weights (None, array):
+          | None: weigh each atom equally
+          | array: weights with shape (n_atoms,)
+
+    Returns:
+        old_rmsd (array)
+            RMSD before rotation (centers are superimposed), shape (n_frames,)
+        new_rmsd (array)
+            RMSD after superposition, shape (n_frames,)
+        R (array)
+            rotation matrices with shape (n_frames, 3, 3). Centered mobile
+            coordinates x are superimposed onto the reference via x @ R
+        mobile_com (array)
+            weighted mobile centers with shape (n_frames, 3)
+        ref_com (array)
+            weighted reference center with shape (3,)
+    """
+    mobile_xyz = np.asarray(mobile_xyz, dtype=np.float64)
+    ref_xyz = np.asarray(ref_xyz, dtype=np.float64)
+    if weights is None:
+        w = np.full(ref_xyz.shape[0], 1.0/ref_xyz.shape[0])
+    else:
+        w = np.asarray(weights, dtype=np.float64)
+        w = w/w.sum()
+
+    mobile_com = np.einsum("n,bni->bi", w, mobile_xyz)
+    ref_com = w @ ref_xyz
+    X = mobile_xyz - mobile_com[:, None, :]
+    Y = ref_xyz - ref_com
+    old_rmsd = np.sqrt(np.einsum("n,bni->b", w, (X-Y)**2))
+
+    # covariance matrices and optimal rotations (reflections are excluded via sign of det)
+    H = np.einsum("bni,n,nj->bij", X, w, Y)
+    U, S, Vt = np.linalg.svd(H)
+    d = np.where(np.linalg.det(U) * np.linalg.det(Vt) < 0, -1.0, 1.0)
+    U[:, :, 2] *= d[:, None]
+    R = U @ Vt
+    new_rmsd = np.sqrt(np.einsum("n,bni->b", w, (X @ R - Y)**2))
+    return old_rmsd, new_rmsd, R, mobile_com, ref_com
+
+
 def get_rmsd(mobile, ref, sel1, sel2, prec=3, weights='mass', superposition=True):
     """
     Returns rmsd for single frame.
 
+    .. Note:: reference implementation which ignores weights. Use
+      get_RMSD(..., batched=True) for fast (weighted) RMSD time series.
+
     Args:
         mobile (universe, atomgrp): mobile structure
         ref (universe, atomgrp): reference structure
@@ -202,6 +257,7 @@ def get_rmsd(mobile, ref, sel1, sel2, prec=3, weights='mass', superposition=True
     return round(rmsd, prec)
 
 
+@_misc.memoize()
 def get_RMSD(mobile, ref, sel1, sel2, sss=[None, None, None], prec=3,
              weights='mass', superposition=True, plot=False, verbose=True, **kwargs):
     """
@@ -228,6 +284,29 @@ def get_RMSD(mobile, ref, sel1, sel2, sss=[None, None, None], prec=3,
         superposition (bool)
         plot (bool)
 
+    Keyword Args:
+        start (None, int): start frame
+        stop (None, int): stop frame
+        step (None, int): step size
+        n_jobs (int):
+          | number of worker processes
+          | 1: serial analysis (default)
+          | -1: use all available cores
+          | >1: split frame range into n_jobs chunks which are analyzed in
+            parallel and stitched back in frame order
+        backend (str): "multiprocessing"
+        batched (bool):
+          | False: call get_rmsd() for each frame (reference implementation,
+            ignores weights)
+          | True: select atoms once, read frames in blocks and superimpose each
+            block with a vectorized Kabsch algorithm (honors weights)
+        block_size (int): number of frames per block if batched == True
+        prefetch (int): number of blocks which are decoded ahead by a background
+          thread if batched == True (0: disabled, default)
+        cache (bool, str): read coordinates via the on-disk coordinate cache, see
+          topology.get_cached_coordinates() (False: disabled, default)
+        memoize (bool): memoize result on disk, see misc.memoize(). Defaults to False.
+
     .. Hint:: Args and Keyword Args of analysis.PLOT() are valid Keyword Args.
 
     Returns:
@@ -240,16 +319,59 @@ def get_RMSD(mobile, ref, sel1, sel2, sss=[None, None, None], prec=3,
     """
     default = {"start": sss[0],
                "stop": sss[1],
-               "step": sss[2]}
+               "step": sss[2],
+               "n_jobs": 1,
+               "backend": "multiprocessing",
+               "batched": False,
+               "block_size": 1000,
+               "prefetch": 0,
+               "cache": False}
     cfg = _misc.CONFIG(default, **kwargs)
     ############################################################################
-    FRAME, TIME, RMSD = [], [], []
-    for ts in tqdm(mobile.trajectory[cfg.start:cfg.stop:cfg.step], disable=not verbose):
-        FRAME.append(ts.frame)
-        TIME.append(ts.time)
-        RMSD.append(get_rmsd(mobile, ref, sel1=sel1, sel2=sel2, prec=prec, weights=weights, superposition=superposition))
+    if cfg.n_jobs != 1:
+        cfg = _HELP_sss_None2int(mobile.universe, cfg)
+        RESULTS = _HELP_run_parallel(get_RMSD, args=(mobile, ref),
+                                     kwargs={**kwargs, "sel1": sel1, "sel2": sel2, "prec": prec, "weights": weights,
+                                             "superposition": superposition, "plot": False},
+                                     cfg=cfg, n_jobs=cfg.n_jobs, backend=cfg.backend, verbose=verbose)
+        FRAME = np.concatenate([result[0] for result in RESULTS])
+        TIME = np.concatenate([result[1] for result in RESULTS])
+        RMSD = np.concatenate([result[2] for result in RESULTS])
+        if plot:
+            PLOT(xdata=TIME, ydata=RMSD, xlabel='Time (ps)', ylabel=f'RMSD ($\AA$)', **kwargs)
+        return FRAME, TIME, RMSD
+
+    if cfg.batched:
+        cfg = _HELP_sss_None2int(mobile.universe, cfg)
+        mobile_atoms = mobile.select_atoms(sel1)
+        ref_atoms = ref.select_atoms(sel2)
+        ref_xyz = ref_atoms.positions.astype(np.float64)
+        w = _align.get_weights(ref_atoms, weights if weights is not False else None)
+
+        FRAME = np.arange(cfg.start, cfg.stop, cfg.step)
+        TIME = np.empty(len(FRAME))
+        RMSD = np.empty(len(FRAME))
+        i_block = 0
+        for frames, times, xyz in _top.iter_frame_blocks(mobile_atoms, frames=FRAME, block_size=cfg.block_size,
+                                                           prefetch=cfg.prefetch, cache=cfg.cache, verbose=verbose):
+            TIME[i_block: i_block+len(frames)] = times
+            if superposition:
+                RMSD[i_block: i_block+len(frames)] = _HELP_kabsch_batch(xyz, ref_xyz, weights=w)[1]
+            else:
+                w_norm = np.full(len(ref_xyz), 1.0/len(ref_xyz)) if w is None else w/np.sum(w)
+                RMSD[i_block: i_block+len(frames)] = np.sqrt(np.einsum("n,bni->b", w_norm, (xyz-ref_xyz)**2))
+            i_block += len(frames)
+        if prec is not None:
+            RMSD = np.round(RMSD, prec)
+
+    else:
+        FRAME, TIME, RMSD = [], [], []
+        for ts in tqdm(mobile.trajectory[cfg.start:cfg.stop:cfg.step], disable=not verbose):
+            FRAME.append(ts.frame)
+            TIME.append(ts.time)
+            RMSD.append(get_rmsd(mobile, ref, sel1=sel1, sel2=sel2, prec=prec, weights=weights, superposition=superposition))
 
-    FRAME, TIME, RMSD = np.array(FRAME), np.array(TIME), np.array(RMSD)
+        FRAME, TIME, RMSD = np.array(FRAME), np.array(TIME), np.array(RMSD)
 
     if plot:
         #PLOT(xdata=FRAME, ydata=RMSD, xlabel='Frame', ylabel=f'RMSD ($\AA$)', **kwargs)
@@ -357,6 +479,80 @@ def _HELP_sss_None2int(obj, cfg):
     return cfg
 
 
+def _HELP_split_frames(start, stop, step, n_chunks):
+    """
+    Split the frame range(start, stop, step) into up to n_chunks contiguous chunks.
+
+    Args:
+        start (int): start frame
+        stop (int): stop frame
+        step (int): step size
+        n_chunks (int): number of chunks
+
+    Returns:
+        CHUNKS (list)
+            list with (start, stop) tuples. Each chunk covers range(start, stop, step)
+    """
+    frames = np.arange(start, stop, step)
+    CHUNKS = [(int(c[0]), int(c[-1])+1) for c in np.array_split(frames, n_chunks) if len(c) > 0]
+    return CHUNKS
+
+
+def _HELP_parallel_worker(job):
+    """
+    Worker of _HELP_run_parallel(). Executes func(*args, **kwargs) of job.
+    """
+    func, args, kwargs = job
+    return func(*args, **kwargs)
+
+
+def _HELP_run_parallel(func, args, kwargs, cfg, n_jobs=-1, backend="multiprocessing", verbose=True):
+    """
+    Split the frame range of cfg (start, stop, step) into chunks and execute
+    func(*args, start=start, stop=stop, step=step, n_jobs=1, verbose=False, **kwargs)
+    for each chunk in a separate worker process.
+
+    .. Note:: MDA universes are pickled when passed to the workers, i.e. each
+      worker re-opens the trajectory from the same file paths and keeps its own
+      file handle. Changes of the topology (e.g. normed resids) are preserved.
+
+    Args:
+        func (function): trajectory analysis function which supports the
+          keywords start, stop, step, n_jobs and verbose
+        args (tuple): positional arguments of func
+        kwargs (dict): keyword arguments of func
+        cfg (misc.CONFIG class): config with keys start, stop, step (integers)
+        n_jobs (int):
+          | number of worker processes
+          | -1 or None: use all available cores
+        backend (str): "multiprocessing"
+        verbose (bool): show progress bar (completed chunks)
+
+    Returns:
+        RESULTS (list)
+            list with return values of func for each chunk (sorted in frame order)
+    """
+    if backend != "multiprocessing":
+        raise ValueError(f'''{_HELP_run_parallel.__module__}.{_HELP_run_parallel.__name__}():\
+        \nbackend must be "multiprocessing".''')
+    if n_jobs in [-1, None]:
+        n_jobs = os.cpu_count()
+
+    CHUNKS = _HELP_split_frames(cfg.start, cfg.stop, cfg.step, n_jobs)
+    JOBS = []
+    for start, stop in CHUNKS:
+        job_kwargs = dict(kwargs)
+        job_kwargs.update({"start": start, "stop": stop, "step": cfg.step, "n_jobs": 1, "verbose": False})
+        JOBS.append((func, args, job_kwargs))
+
+    if len(JOBS) == 0:
+        return []
+    with multiprocessing.get_context().Pool(min(n_jobs, len(JOBS))) as pool:
+        RESULTS = list(tqdm(pool.imap(_HELP_parallel_worker, JOBS), total=len(JOBS), disable=not verbose))
+    return RESULTS
+
+
+@_misc.memoize()
 def get_Distance_Matrices(mobile, sel="protein and name CA", sss=[None, None, None],
                           flatten=False, verbose=True, **kwargs):
     """
@@ -376,20 +572,58 @@ def get_Distance_Matrices(mobile, sel="protein and name CA", sss=[None, None, No
         verbose (bool): show progress bar
 
     Keyword Args:
-        dtype (dtype): float (default)
+        dtype (dtype):
+          | float (default), np.float32 or np.float16
+          | np.float32: relative error <= 2^-24 (~6e-8), i.e. far below the
+            precision of xtc coordinates (0.01 Å)
+          | np.float16: relative error <= 2^-11 (~5e-4), i.e. <= 0.05 Å for
+            distances <= 100 Å. Largest value is 65504.
+        condensed (bool):
+          | return condensed distance matrices, i.e. only the upper triangle
+            without diagonal with shape (n_frames, N*(N-1)/2). Ignores flatten.
+          | Use cluster.reshape_data(DM, dim_out=3, condensed=True) to restore
+            square distance matrices.
         start (None, int): start frame
         stop (None, int): stop frame
         step (None, int): step size
+        save_as (None, str):
+          | None: return distance matrices as array
+          | str: stream distance matrices directly into a chunked h5 file and
+            return the realpath of the h5 file instead. Memory usage is bounded
+            by one block of frames.
+        save_dir (str):
+          | save directory of h5 file
+          | special case: save_dir is ignored when save_as is relative/absolute path
+        HDF_group (str): Hierarchical Data Format group, "/distance_matrices" (default)
+        block_size (int): number of frames which are read and written per block
+        prefetch (int): number of blocks which are decoded ahead by a background
+          thread (0: disabled, default)
+        cache (bool, str): read coordinates via the on-disk coordinate cache, see
+          topology.get_cached_coordinates() (False: disabled, default)
+        compression (None, str): h5 compression filter, e.g. "gzip" or "lzf"
+        compression_opts (None, int): h5 compression options, e.g. gzip level 0-9
+        memoize (bool): memoize result on disk, see misc.memoize(). Defaults to False.
 
     Returns:
         DM (array)
             array of distance matrices
+        h5_file (str)
+            realpath of h5 file (only if save_as is passed)
     """
     ############################################################################
     default = {"dtype": float,
                "start": sss[0],
                "stop": sss[1],
-               "step": sss[2]
+               "step": sss[2],
+               "save_as": None,
+               "save_dir": "./",
+               "HDF_group": "/distance_matrices",
+               "block_size": 1000,
+               "prefetch": 0,
+               "cache": False,
+               "compression": None,
+               "compression_opts": None,
+               "condensed": False
                }
     cfg = _misc.CONFIG(default, **kwargs)
     cfg = _HELP_sss_None2int(mobile, cfg)  # convert None values of they keys sss, start, stop, step to integers
@@ -397,14 +631,10 @@ def get_Distance_Matrices(mobile, sel="protein and name CA", sss=[None, None, No
     # mobile is MDA universe
     if isinstance(mobile, mda.Universe):
         a = mobile.select_atoms(sel)
-        DM = np.empty((len(mobile.trajectory[cfg.start:cfg.stop:cfg.step]),
-                       a.n_atoms*a.n_atoms), dtype=cfg.dtype)  # tuple args: length, size (of flattened array)
-
-        for i, ts in enumerate(tqdm(mobile.trajectory[cfg.start:cfg.stop:cfg.step], disable=not verbose)):
-            DM[i] = mda.analysis.distances.distance_array(a.positions, a.positions).flatten()
-        if not flatten:
-            DM = DM.reshape((len(mobile.trajectory[cfg.start:cfg.stop:cfg.step]),
-                             a.n_atoms, a.n_atoms))  # tuple args: length, N_CA, N_CA
+        n_frames = len(mobile.trajectory[cfg.start:cfg.stop:cfg.step])
+        POSITIONS = (positions for _, _, block in _top.iter_frame_blocks(a, sss=[cfg.start, cfg.stop, cfg.step], block_size=cfg.block_size,
+                                                                          dtype=np.float32, prefetch=cfg.prefetch, cache=cfg.cache)
+                     for positions in block)
 
     # mobile is list with pdb files
     elif isinstance(mobile, list):
@@ -414,20 +644,159 @@ def get_Distance_Matrices(mobile, sel="protein and name CA", sss=[None, None, No
                 raise TypeError('<mobile> is passed as list but does not contain .pdb file paths.')
         u = mda.Universe(mobile[0])
         a = u.select_atoms(sel)
-        DM = np.empty((len(mobile), a.n_atoms*a.n_atoms), dtype=cfg.dtype)  # tuple args: length, size (of flattened array)
+        n_frames = len(mobile)
+        POSITIONS = (mda.Universe(pdb_file).select_atoms(sel).positions for pdb_file in mobile)
+    n_atoms = a.n_atoms
+    if cfg.condensed:
+        size = n_atoms*(n_atoms-1)//2
+        flatten = True
+    else:
+        size = n_atoms*n_atoms
 
-        for i, pdb_file in enumerate(tqdm(mobile, disable=not verbose)):
-            u = mda.Universe(pdb_file)
-            a = u.select_atoms(sel)
-            DM[i] = mda.analysis.distances.distance_array(a.positions, a.positions).flatten()
+    def _get_dm(positions):
+        if cfg.condensed:
+            return mda.analysis.distances.self_distance_array(positions)
+        return mda.analysis.distances.distance_array(positions, positions).flatten()
+
+    if cfg.save_as is None:
+        DM = np.empty((n_frames, size), dtype=cfg.dtype)  # tuple args: length, size (of flattened array)
+        for i, positions in enumerate(tqdm(POSITIONS, total=n_frames, disable=not verbose)):
+            DM[i] = _get_dm(positions)
         if not flatten:
-            DM = DM.reshape((len(mobile), a.n_atoms, a.n_atoms))  # tuple args: length, N_CA, N_CA
-    return DM
+            DM = DM.reshape((n_frames, n_atoms, n_atoms))  # tuple args: length, N_CA, N_CA
+        return DM
+
+    # stream blocks of distance matrices into h5 file
+    if _misc.get_extension(cfg.save_as) != ".h5":
+        cfg.save_as += ".h5"
+    h5_file = _misc.joinpath(cfg.save_dir, cfg.save_as)
+    shape = (n_frames, size) if flatten else (n_frames, n_atoms, n_atoms)
+    frame_bytes = max(1, size*np.dtype(cfg.dtype).itemsize)
+    chunk_frames = int(max(1, min(n_frames, cfg.block_size, 2**20 // frame_bytes)))  # h5 chunks of ~1 MB
+    block = np.empty((max(1, min(cfg.block_size, n_frames)), size), dtype=cfg.dtype)
+
+    with h5py.File(h5_file, "w") as handle:
+        dset = handle.create_dataset(cfg.HDF_group, shape=shape, dtype=cfg.dtype,
+                                     chunks=(chunk_frames,)+shape[1:],
+                                     compression=cfg.compression,
+                                     compression_opts=cfg.compression_opts)
+        dset.attrs["condensed"] = cfg.condensed
+        dset.attrs["shape"] = (n_frames, n_atoms, n_atoms)
+        i_block = 0
+        for i, positions in enumerate(tqdm(POSITIONS, total=n_frames, disable=not verbose)):
+            block[i-i_block] = _get_dm(positions)
+            if i+1-i_block == len(block) or i+1 == n_frames:
+                dset[i_block:i+1] = block[:i+1-i_block].reshape((i+1-i_block,)+shape[1:])
+                i_block = i+1
+    if verbose:
+        print(f"Saved h5 file as: {h5_file}")
+    return h5_file
+
+
+def get_Contact_Pair_Distances(mobile, pairs, sel="protein and name CA", sss=[None, None, None],
+                               method="contact_distance", verbose=True, **kwargs):
+    """
+    Calculate distances of (RESi, RESj) pairs for each frame of mobile. Only the
+    distances of the passed pairs are evaluated instead of full distance matrices.
+
+    Args:
+        mobile (universe): structure with trajectory
+        pairs (list, array): list of pairs represented by (RESi, RESj) tuples, i.e.
+          RESi and RESj are the 1-based residue numbers of the selection
+        sel (str): selection string
+        sss (list):
+          | [start, stop, step]
+          | start (None, int): start frame
+          | stop (None, int): stop frame
+          | step (None, int): step size
+        method (str):
+          | 'contact_distance': distances of the pair atoms, i.e. sel must
+            contain one atom per residue (e.g. "protein and name CA")
+          | 'shortest_distance': shortest distance between the atoms of both
+            residues (same values as get_shortest_RES_distances())
+        verbose (bool): show progress bar
+
+    Keyword Args:
+        dtype (dtype): data type of returned pair distances
+        ignh (bool): ignore hydrogen (mass < 1.2). Only used for method='shortest_distance'.
+        block_size (int): number of frames which are read per block
+        prefetch (int): number of blocks which are decoded ahead by a background
+          thread (0: disabled, default)
+        cache (bool, str): read coordinates via the on-disk coordinate cache, see
+          topology.get_cached_coordinates() (False: disabled, default)
+        start (None, int): start frame
+        stop (None, int): stop frame
+        step (None, int): step size
+
+    Returns:
+        PD (array)
+            array of pair distances with shape (n_frames, n_pairs)
+    """
+    default = {"dtype": float,
+               "ignh": True,
+               "start": sss[0],
+               "stop": sss[1],
+               "step": sss[2],
+               "block_size": 100,
+               "prefetch": 0,
+               "cache": False}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    pairs = np.asarray(pairs, dtype=int).reshape((-1, 2)) - 1
+    a = mobile.select_atoms(sel)
+
+    if method.lower() == "contact_distance":
+        ATM_i, ATM_j = pairs[:, 0], pairs[:, 1]
+        offsets = None
+    elif method.lower() == "shortest_distance":
+        if cfg.ignh:
+            a = a[a.masses > 1.2]
+        RES_ndx = np.unique(a.resindices, return_inverse=True)[1]
+        RES_atoms = [np.flatnonzero(RES_ndx == i) for i in range(max(RES_ndx)+1)]
+        # all atom pairs of each residue pair, reduced to their minimum via offsets
+        ATM_i = [np.repeat(RES_atoms[i], len(RES_atoms[j])) for i, j in pairs]
+        ATM_j = [np.tile(RES_atoms[j], len(RES_atoms[i])) for i, j in pairs]
+        offsets = np.cumsum([0] + [len(item) for item in ATM_i[:-1]])
+        ATM_i, ATM_j = np.concatenate(ATM_i), np.concatenate(ATM_j)
+    else:
+        raise ValueError("method must be either 'shortest_distance' or 'contact_distance'")
+
+    n_frames = len(mobile.trajectory[cfg.start:cfg.stop:cfg.step])
+    PD = np.empty((n_frames, len(pairs)), dtype=cfg.dtype)
+    i_block = 0
+    for frames, _, xyz in _top.iter_frame_blocks(a, sss=[cfg.start, cfg.stop, cfg.step], block_size=cfg.block_size,
+                                                 prefetch=cfg.prefetch, cache=cfg.cache, verbose=verbose):
+        d = mda.lib.distances.calc_bonds(xyz[:, ATM_i].reshape((-1, 3)), xyz[:, ATM_j].reshape((-1, 3)))
+        d = d.reshape((len(frames), -1))
+        PD[i_block: i_block+len(frames)] = d if offsets is None else np.minimum.reduceat(d, offsets, axis=1)
+        i_block += len(frames)
+    return PD
 ################################################################################
 ################################################################################
 
 
-def get_shortest_RES_distances(u, sel):
+def _HELP_shortest_RES_pairs(ATM_i, ATM_j, d, RES_ndx, dim):
+    """
+    Get indices of the shortest atom pair of each RES pair. Atom pairs must be
+    ordered, ties are then resolved by the first atom pair (same as np.argmin).
+
+    Args:
+        ATM_i (array): first atom indices of atom pairs
+        ATM_j (array): second atom indices of atom pairs
+        d (array): atom pair distances
+        RES_ndx (array): RES index (0, ..., dim-1) of each atom
+        dim (int): number of RES
+
+    Returns:
+        ndx (array)
+            indices of the shortest atom pairs
+    """
+    key = RES_ndx[ATM_i]*dim + RES_ndx[ATM_j]
+    order = np.lexsort((d, key))  # stable
+    return order[np.unique(key[order], return_index=True)[1]]
+
+
+def get_shortest_RES_distances(u, sel, cutoff=None, detailed=True):
     """
     Calculates shortest RES distances (current frame) for selection of universe u.
 
@@ -436,6 +805,15 @@ def get_shortest_RES_distances(u, sel):
     Args:
         u (universe, str): structure universe or pdb path
         sel (str): selection string
+        cutoff (None, float):
+          | None: evaluate all RES pairs. Atom pairs within 8 A are found via
+            neighbor search, RES pairs without such atom pairs are evaluated one
+            RES at a time. Small selections (up to 2000 atoms) evaluate all atom
+            pairs at once.
+          | float: evaluate only atom pairs within cutoff via neighbor search.
+            RES pairs without atom pairs within cutoff have a distance of np.inf.
+        detailed (bool): return detailed list SD_d. Use False to skip building
+          the detailed list, e.g. when calculating SD for many frames.
 
     Returns:
         SD (arrray)
@@ -445,41 +823,75 @@ def get_shortest_RES_distances(u, sel):
           |       SD[0][2] is shortest distance RES0-RES2
           | etc.
         SD_d (array, dtype=object)
-            detailed List with [d_min, (RES_pair), (ATM_pair), (ATM_names)]
+          | detailed List with [d_min, (RES_pair), (ATM_pair), (ATM_names)]
+          | None (if detailed is False)
     """
     if isinstance(u, str):
-        # uc: universe copy
         uc = mda.Universe(u)
-    elif isinstance(u, mda.Universe):
-        # uc: universe copy
-        uc = u.copy()
-    elif isinstance(u, mda.AtomGroup):
+    elif min(u.universe.residues.resids) != 1:
+        # uc: universe copy (normalizing resids modifies the universe)
         uc = u.universe.copy()
+    else:
+        uc = u.universe
     _top.norm_resids(uc, verbose=True)
     a = _top.true_select_atoms(uc, sel)
-    dim = len(a.residues.resids)
-    SD = np.zeros(shape=(dim, dim))
+    RES_ndx = np.unique(a.resindices, return_inverse=True)[1]
+    dim = RES_ndx.max() + 1
+    pos = a.positions
+
+    # atom pairs (i < j) and their distances
+    if cutoff is None and len(a) <= 2000:
+        ATM_i, ATM_j = np.triu_indices(len(a), k=1)
+        d = _distances.self_distance_array(pos)
+    else:
+        ATM_pairs, d = mda.lib.distances.self_capped_distance(pos, max_cutoff=8.0 if cutoff is None else cutoff)
+        ATM_pairs = np.sort(ATM_pairs, axis=1)
+        ATM_i, ATM_j = ATM_pairs[:, 0], ATM_pairs[:, 1]
+
+    # keep pairs of different RES and reduce to shortest distance of each RES pair
+    # (neighbor search returns pairs unordered)
+    mask = RES_ndx[ATM_i] != RES_ndx[ATM_j]
+    ATM_i, ATM_j, d = ATM_i[mask], ATM_j[mask], d[mask]
+    if cutoff is not None or len(a) > 2000:
+        order = np.lexsort((ATM_j, ATM_i))
+        ATM_i, ATM_j, d = ATM_i[order], ATM_j[order], d[order]
+    first = _HELP_shortest_RES_pairs(ATM_i, ATM_j, d, RES_ndx, dim)
+    ATM_i, ATM_j, d = ATM_i[first], ATM_j[first], d[first]
+
+    if cutoff is None and len(a) > 2000:
+        # RES pairs without atom pairs within the search radius: evaluate one RES
+        # against the atoms of its remaining partner RES at a time
+        found = np.tri(dim, dtype=bool)
+        found[RES_ndx[ATM_i], RES_ndx[ATM_j]] = True
+        found[RES_ndx[ATM_j], RES_ndx[ATM_i]] = True
+        FAR = [(ATM_i, ATM_j, d)]
+        for res in np.flatnonzero(~np.all(found, axis=1)):
+            atoms_i = np.flatnonzero(RES_ndx == res)
+            atoms_j = np.flatnonzero(~found[res][RES_ndx])
+            DA = _distances.distance_array(pos[atoms_i], pos[atoms_j])
+            row = np.argmin(DA, axis=0)
+            far_i, far_j, far_d = atoms_i[row], atoms_j, DA[row, np.arange(len(atoms_j))]
+            first = _HELP_shortest_RES_pairs(far_i, far_j, far_d, RES_ndx, dim)
+            FAR.append((far_i[first], far_j[first], far_d[first]))
+        ATM_i, ATM_j, d = [np.concatenate(x) for x in zip(*FAR)]
+
+    RES_i, RES_j = RES_ndx[ATM_i], RES_ndx[ATM_j]
+    order = np.lexsort((RES_j, RES_i))
+    ATM_i, ATM_j, d, RES_i, RES_j = ATM_i[order], ATM_j[order], d[order], RES_i[order], RES_j[order]
+
+    SD = np.zeros(shape=(dim, dim)) if cutoff is None else np.full((dim, dim), np.inf)
+    np.fill_diagonal(SD, 0)
+    SD[RES_i, RES_j] = d
+    SD[RES_j, RES_i] = d
+
+    if not detailed:
+        return(SD, None)
     SD_d = []
-
-    for i in range(dim):
-        for j in range(i + 1, dim):
-            DA = _distances.distance_array(a.residues[i].atoms.positions, a.residues[j].atoms.positions)
-            d_min = np.min(DA)
-            d_min_index = np.unravel_index(np.argmin(DA), DA.shape)  # atom indices
-
-            # write values to list
-            RES_pair = (a.residues[i].resid, a.residues[j].resid)
-            ATM_pair = (a.residues[i].atoms[d_min_index[0]].id,
-                        a.residues[j].atoms[d_min_index[1]].id)
-            ATM_names = (a.residues[i].atoms.names[d_min_index[0]],
-                         a.residues[j].atoms.names[d_min_index[1]])
-
-            SD[i][j] = d_min
-            SD_d.append([d_min, RES_pair, ATM_pair, ATM_names])
-
-        # SD contains only half of the distances (double for loop w/o double counting RES pairs )
-        SD_t = np.transpose(SD)    # -> transpose SD
-        SD = np.maximum(SD, SD_t)  # -> take element-wise maximum
+    for i, j, d_min in zip(ATM_i, ATM_j, d):
+        RES_pair = (a[i].resid, a[j].resid)
+        ATM_pair = (a[i].id, a[j].id)
+        ATM_names = (a[i].name, a[j].name)
+        SD_d.append([d_min, RES_pair, ATM_pair, ATM_names])
 
     # convert to array with dtype=object since array contains lists, tuples and sequences
     SD_d = np.array(SD_d, dtype=object)
@@ -73,17 +73,23 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import heat as ht
+import torch
 import h5py
+import multiprocessing
+import MDAnalysis as mda
 import pyrexMD.misc as _misc
 import pyrexMD.analysis.analyze as _ana
 from pyrexMD.analysis.analyze import get_Distance_Matrices, _HELP_sss_None2int  # required for internal conversion
 #from pyrexMD.analysis.abinitio import get_decoy_list, get_decoy_scores, get_decoy_RMSD
 import pandas as pd
 from sklearn.manifold import TSNE, MDS
-from sklearn.cluster import KMeans, DBSCAN
+from sklearn.cluster import KMeans, MiniBatchKMeans, DBSCAN, kmeans_plusplus
+from sklearn.decomposition import PCA
+from sklearn.metrics import adjusted_rand_score
 from tqdm.notebook import tqdm
 import glob
 import os
+import time
 
 
 def get_decoy_list(decoy_dir, pattern="*.pdb", ndx_range=(None, None)):
@@ -262,7 +268,7 @@ def log_cluster_decoys(best_decoys, best_scores, save_as, verbose=True):
 ################################################################################
 
 
-def save_h5(data, save_as, save_dir="./", HDF_group="/distance_matrices", verbose=True):
+def save_h5(data, save_as, save_dir="./", HDF_group="/distance_matrices", verbose=True, condensed=False, dtype=None):
     """
     Save data (e.g. distance matrices DM) as h5 file.
 
@@ -277,6 +283,20 @@ def save_h5(data, save_as, save_dir="./", HDF_group="/distance_matrices", verbos
           | save directory
           | special case: save_dir is ignored when save_as is relative/absolute path
         HDF_group (str): Hierarchical Data Format group
+        verbose (bool)
+        condensed (bool):
+          | store condensed distance matrices (upper triangle without diagonal)
+          | data with shape (length, N, N) is condensed before saving
+          | data with shape (length, N*(N-1)/2) is treated as already condensed
+        dtype (None, dtype):
+          | storage data type
+          | None: keep data type of data
+          | np.float32: relative error <= 2^-24 (~6e-8)
+          | np.float16: relative error <= 2^-11 (~5e-4), i.e. <= 0.05 Å for
+            distances <= 100 Å. Largest value is 65504.
+
+    .. Note:: The h5 dataset has the attributes "condensed" and "shape", where
+      "shape" is the shape of the data after restoring square distance matrices.
 
     Returns:
         h5_file (str)
@@ -286,14 +306,28 @@ def save_h5(data, save_as, save_dir="./", HDF_group="/distance_matrices", verbos
         save_as += ".h5"
     h5_file = _misc.joinpath(save_dir, save_as)
 
+    if condensed:
+        if len(np.shape(data)) == 3:
+            data = _HELP_condense(data)
+        length, size = np.shape(data)
+        n = _HELP_condensed_size2n(size)
+        shape = (length, n, n)
+    else:
+        shape = np.shape(data)
+
+    if dtype is not None:
+        data = np.asarray(data, dtype=_HELP_np_dtype(dtype))
+
     with h5py.File(h5_file, "w") as handle:
         handle[HDF_group] = data
+        handle[HDF_group].attrs["condensed"] = condensed
+        handle[HDF_group].attrs["shape"] = shape
     if verbose:
         print(f"Saved h5 file as: {h5_file}")
     return h5_file
 
 
-def read_h5(h5_file, HDF_group="/distance_matrices"):
+def read_h5(h5_file, HDF_group="/distance_matrices", expand=False):
     """
     read h5 data (e.g. distance matrices DM)
 
@@ -304,6 +338,8 @@ def read_h5(h5_file, HDF_group="/distance_matrices"):
     Args:
         h5_file (str)
         HDF_group (str): Hierarchical Data Format group
+        expand (bool): restore square distance matrices if h5 file contains
+          condensed distance matrices
 
     Returns:
         data (array)
@@ -313,9 +349,82 @@ def read_h5(h5_file, HDF_group="/distance_matrices"):
         h5_file += ".h5"
     with h5py.File(h5_file, "r") as handle:
         data = np.array(handle[HDF_group])
+        if expand and handle[HDF_group].attrs.get("condensed", False):
+            data = _HELP_expand(data)
         return data
 
 
+def is_condensed_h5(h5_file, HDF_group="/distance_matrices"):
+    """
+    Check if h5 file contains condensed distance matrices.
+
+    Args:
+        h5_file (str)
+        HDF_group (str): Hierarchical Data Format group
+
+    Returns:
+        condensed (bool)
+            True if h5 dataset has the attribute condensed == True
+    """
+    if _misc.get_extension(h5_file) != ".h5":
+        h5_file += ".h5"
+    with h5py.File(h5_file, "r") as handle:
+        condensed = bool(handle[HDF_group].attrs.get("condensed", False))
+        return condensed
+
+
+def _HELP_np_dtype(dtype):
+    """
+    Convert heat or numpy data type to numpy data type.
+    """
+    if isinstance(dtype, type) and issubclass(dtype, ht.types.datatype):
+        return np.dtype(dtype.char())
+    return np.dtype(dtype)
+
+
+def _HELP_ht_dtype(dtype):
+    """
+    Convert heat or numpy data type to heat data type.
+    """
+    return ht.types.canonical_heat_type(_HELP_np_dtype(dtype).type)
+
+
+def _HELP_condensed_size2n(size):
+    """
+    Get matrix dimension N of condensed distance matrices with size N*(N-1)/2.
+    """
+    n = int(round((1 + np.sqrt(1 + 8*size))/2))
+    if n*(n-1)//2 != size:
+        raise ValueError(f"size {size} is not a valid size of condensed distance matrices.")
+    return n
+
+
+def _HELP_condense(data):
+    """
+    Convert distance matrices with shape (length, N, N) into condensed distance
+    matrices with shape (length, N*(N-1)/2) (upper triangle without diagonal).
+    """
+    data = np.asarray(data)
+    n = data.shape[-1]
+    iu = np.triu_indices(n, k=1)
+    return data[:, iu[0], iu[1]]
+
+
+def _HELP_expand(data):
+    """
+    Convert condensed distance matrices with shape (length, N*(N-1)/2) into
+    square distance matrices with shape (length, N, N).
+    """
+    data = np.asarray(data)
+    length, size = data.shape
+    n = _HELP_condensed_size2n(size)
+    iu = np.triu_indices(n, k=1)
+    DM = np.zeros((length, n, n), dtype=data.dtype)
+    DM[:, iu[0], iu[1]] = data
+    DM[:, iu[1], iu[0]] = data
+    return DM
+
+
 def reshape_data(data, dim_out=2, sss=[None, None, None], verbose=True, **kwargs):
     """
     Reshape data between the shapes: (length, size) <-> (length, sizeD1, sideD2)
@@ -337,6 +446,10 @@ def reshape_data(data, dim_out=2, sss=[None, None, None], verbose=True, **kwargs
         start (None, int): start index
         stop (None, int): stop index
         step (None, int): step size
+        condensed (bool):
+          | use condensed distance matrices as 2D representation, i.e.
+          | (length, N*(N-1)/2) <-> (length, N, N)
+          | (only supported for numpy arrays)
 
     Returns:
         data (array, ht.DNDarray)
@@ -345,7 +458,8 @@ def reshape_data(data, dim_out=2, sss=[None, None, None], verbose=True, **kwargs
     ############################################################################
     default = {"start": sss[0],
                "stop": sss[1],
-               "step": sss[2]
+               "step": sss[2],
+               "condensed": False
                }
     cfg = _misc.CONFIG(default, **kwargs)
     cfg = _HELP_sss_None2int(data, cfg)  # convert None values of they keys sss, start, stop, step to integers
@@ -353,6 +467,14 @@ def reshape_data(data, dim_out=2, sss=[None, None, None], verbose=True, **kwargs
     ############################################################################
     if (len(np.shape(data)) == dim_out):
         return data
+    elif cfg.condensed:
+        shape = np.shape(data)
+        if len(shape) == 2:
+            data = _HELP_expand(data)
+        elif len(shape) == 3:
+            data = _HELP_condense(data)
+        if verbose:
+            print(f"reshaping data: {shape} -> {np.shape(data)}")
     else:
         if len(np.shape(data)) == 2:
             length, size = np.shape(data)
@@ -370,6 +492,303 @@ def reshape_data(data, dim_out=2, sss=[None, None, None], verbose=True, **kwargs
     return data
 
 
+def _HELP_heat_load(h5_file, HDF_group, cfg, verbose=True):
+    """
+    Load h5 file data as 2D heat array (split along first axis).
+
+    Args:
+        h5_file (str): path to h5 file containing data
+        HDF_group (str): Hierarchical Data Format group
+        cfg (misc.CONFIG): config with keys dtype, start, stop, step
+        verbose (bool)
+
+    Returns:
+        data (heat.DNDarray)
+            data with shape (length, size)
+        condensed (bool)
+            True if data contains condensed distance matrices
+    """
+    if isinstance(h5_file, str):
+        if verbose:
+            print("loading data...")
+        condensed = is_condensed_h5(h5_file, HDF_group)
+        data = ht.load(h5_file, HDF_group, split=0, dtype=_HELP_ht_dtype(cfg.dtype))
+    else:
+        raise TypeError("wrong datatype: <h5_file> must be str (path to h5 file containing data).")
+    data = reshape_data(data, dim_out=2, sss=[cfg.start, cfg.stop, cfg.step], verbose=verbose)
+    return data, condensed
+
+
+def _HELP_heat_allreduce(data, x):
+    """
+    Sum x over all MPI processes if data is distributed, otherwise return x.
+    """
+    if data.split is None or data.comm.size == 1:
+        return x
+    return data.comm.handle.allreduce(x)
+
+
+def _HELP_heat_local_labels(data, labels):
+    """
+    Returns the labels of the local data points of (distributed) data.
+
+    Args:
+        data (heat.DNDarray): data with shape (length, ...)
+        labels (array, heat.DNDarray): cluster labels of all data points
+
+    Returns:
+        labels (array)
+            cluster labels of the local data points
+    """
+    if isinstance(labels, ht.DNDarray):
+        return labels.larray.flatten().long().cpu().numpy()
+    labels = np.asarray(labels, dtype=int)
+    if data.split is None:
+        return labels
+    counts, displs = data.counts_displs()
+    return labels[displs[data.comm.rank]:displs[data.comm.rank]+counts[data.comm.rank]]
+
+
+def _HELP_heat_centroids(data, labels, condensed=False):
+    """
+    Distributed version of get_DM_centroids(). Only the per cluster sums are
+    reduced across MPI processes.
+
+    Args:
+        data (heat.DNDarray): data with shape (length, ...)
+        labels (array, heat.DNDarray): cluster labels of all data points
+        condensed (bool): data contains condensed distance matrices
+
+    Returns:
+        CENTROIDS (array)
+            centroids of data, one for each label
+    """
+    if isinstance(labels, ht.DNDarray):
+        lmin, lmax = int(labels.min().item()), int(labels.max().item())
+    else:
+        lmin, lmax = int(np.min(labels)), int(np.max(labels))
+    L = _HELP_heat_local_labels(data, labels)
+    X = data.larray.reshape((data.larray.shape[0], -1)).double()
+    SUM = torch.zeros((lmax+1, X.shape[1]), dtype=torch.float64, device=X.device)
+    SUM.index_add_(0, torch.as_tensor(L, device=X.device).long(), X)
+    SUM = _HELP_heat_allreduce(data, SUM.cpu().numpy())
+    COUNTS = _HELP_heat_allreduce(data, np.bincount(L, minlength=lmax+1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        CENTROIDS = (SUM/COUNTS[:, None])[lmin:].reshape((-1,) + tuple(data.gshape[1:]))
+    if condensed:
+        return _HELP_expand(CENTROIDS)
+    return CENTROIDS
+
+
+def _HELP_heat_SE(data, centers, labels, block_size=1000):
+    """
+    Squared errors of the local data points, computed on the local chunks of
+    the (distributed) data in blocks, i.e. without reading the h5 file again.
+
+    Args:
+        data (heat.DNDarray): data with shape (length, size)
+        centers (array): cluster centers with shape (n_clusters, size)
+        labels (array): cluster labels of the local data points
+        block_size (int): number of data points per block
+
+    Returns:
+        SE (array)
+            squared errors of the local data points
+    """
+    X = data.larray.reshape((data.larray.shape[0], -1))
+    C = torch.as_tensor(np.asarray(centers).reshape((len(centers), -1)), dtype=X.dtype, device=X.device)
+    L = torch.as_tensor(labels, device=X.device).long()
+    SE = torch.empty(len(X), dtype=torch.float64, device=X.device)
+    for ndx in range(0, len(X), block_size):
+        SE[ndx:ndx+block_size] = ((X[ndx:ndx+block_size]-C[L[ndx:ndx+block_size]])**2).sum(dim=1)
+    return SE.cpu().numpy()
+
+
+def _HELP_heat_WSS_DATA(data, centers, labels, n_clusters, factor=1, prec=3, rescale=False):
+    """
+    Distributed version of _HELP_WSS_DATA(). Only the per cluster statistics
+    are reduced across MPI processes, the squared errors of individual data
+    points are never gathered.
+
+    Args:
+        data (heat.DNDarray): data with shape (length, size)
+        centers (array): cluster centers with shape (n_clusters, size)
+        labels (array, heat.DNDarray): cluster labels of the local data points
+          (array) or of all data points (heat.DNDarray with same split as data)
+        n_clusters (int): number of clusters
+        factor (int): factor of squared errors, 2 for condensed distance matrices
+        prec (None, int): rounding precision
+        rescale (bool): rescale wss_data by diving through length of data
+
+    Returns:
+        WSS_DATA (WSS_DATA)
+        inertia (float)
+            sum of squared errors of all data points (not rounded, not rescaled)
+    """
+    L = labels.larray.flatten().long().cpu().numpy() if isinstance(labels, ht.DNDarray) else labels
+    SE = factor*_HELP_heat_SE(data, centers, L)
+    COUNTS = _HELP_heat_allreduce(data, np.bincount(L, minlength=n_clusters))
+    SUM = _HELP_heat_allreduce(data, np.bincount(L, weights=SE, minlength=n_clusters))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        MEAN = SUM/COUNTS
+        VAR = _HELP_heat_allreduce(data, np.bincount(L, weights=(SE-MEAN[L])**2, minlength=n_clusters))/COUNTS
+    WSS_DATA = _HELP_round_WSS_DATA(SUM, MEAN, np.sqrt(VAR), length=data.gshape[0], prec=prec, rescale=rescale)
+    return WSS_DATA, float(np.sum(SUM))
+
+
+def _HELP_heat_fit(data, n_clusters, center_type, condensed, cfg, init=None):
+    """
+    Fit heat's KMeans/KMedoids to loaded data and return CLUSTER_DATA.
+
+    Args:
+        data (heat.DNDarray): data with shape (length, size)
+        n_clusters (int): number of clusters
+        center_type (str): 'centroid' or 'medoid'
+        condensed (bool): data contains condensed distance matrices
+        cfg (misc.CONFIG, dict): config with keys random_state, prec, rescale
+        init (None, array):
+          | None: random initialization of cluster centers
+          | array: initial cluster centers with shape (n_clusters, size)
+
+    Returns:
+        cluster_data (CLUSTER_DATA)
+    """
+    length, size = np.shape(data)
+    if init is None:
+        init = "random"
+    else:
+        init = ht.array(np.asarray(init), dtype=data.dtype)
+    if center_type.lower() == "centroid":
+        kmeans = ht.cluster.KMeans(n_clusters=n_clusters, init=init, random_state=cfg["random_state"])
+    elif center_type.lower() == "medoid":
+        kmeans = ht.cluster.KMedoids(n_clusters=n_clusters, init=init, random_state=cfg["random_state"])
+    else:
+        raise ValueError("""center_type must be either 'centroid' or 'medoid'.""")
+
+    kmeans.fit(data)
+    centers = kmeans.cluster_centers_.numpy()
+    labels = kmeans.labels_.numpy().flatten().astype(int)
+    counts = np.bincount(labels)
+
+    # |A|^2 = 2 * |condensed(A)|^2 for symmetric matrices with zero diagonal
+    wss_data, inertia = _HELP_heat_WSS_DATA(data, centers, kmeans.labels_, n_clusters, factor=2 if condensed else 1,
+                                            prec=cfg["prec"], rescale=cfg["rescale"])
+    if condensed:
+        centers = _HELP_expand(centers)
+    else:
+        centers = centers.reshape((n_clusters, int(np.sqrt(size)), int(np.sqrt(size))))
+    return CLUSTER_DATA(centers=centers, counts=counts, labels=labels, inertia=inertia,
+                        wss_data=wss_data, compact_score=wss_data.se_mean, n_iter=kmeans.n_iter_)
+
+
+def heat_Distance_Matrices(mobile, sel="protein and name CA", sss=[None, None, None], condensed=False,
+                           verbose=True, **kwargs):
+    """
+    Calculate distance matrices distributed across MPI processes.
+
+    Each MPI process calculates the distance matrices of its own frame slice
+    (see get_Distance_Matrices()) and keeps them as local chunk of a heat array
+    which is split along the frame axis. The distance matrices are never
+    gathered on a single process.
+
+    .. Hint:: Run the script via "mpirun -n <n_processes> python <script>".
+      Without MPI the function works with a single process.
+
+    Args:
+        mobile (universe, list):
+          | (MDA universe): structure with trajectory
+          | (list): list with paths to structure files (.pdb)
+        sel (str): selection string
+        sss (list):
+          | [start, stop, step]
+          | start (None, int): start frame
+          | stop (None, int): stop frame
+          | step (None, int): step size
+        condensed (bool): calculate condensed distance matrices, i.e. only the
+          upper triangle without diagonal with shape (n_frames, N*(N-1)/2)
+        verbose (bool): show progress bar (MPI rank 0 only)
+
+    Keyword Args:
+        dtype (dtype): compute data type: np.float64 (default), np.float32 or heat equivalents
+        start (None, int): start frame
+        stop (None, int): stop frame
+        step (None, int): step size
+        save_as (None, str):
+          | None: do not save distance matrices
+          | str: save distance matrices as h5 file (see save_h5()). All MPI
+            processes write their own slice (parallel I/O if h5py is built with MPI).
+        save_dir (str):
+          | save directory of h5 file
+          | special case: save_dir is ignored when save_as is relative/absolute path
+        HDF_group (str): Hierarchical Data Format group, "/distance_matrices" (default)
+        block_size (int): number of frames which are read per block
+        prefetch (int): number of blocks which are decoded ahead by a background thread
+        cache (bool, str): read coordinates via the on-disk coordinate cache
+
+    Returns:
+        DM (heat.DNDarray)
+            flattened distance matrices with shape (n_frames, size), split along the frame axis
+    """
+    default = {"dtype": np.float64,
+               "start": sss[0],
+               "stop": sss[1],
+               "step": sss[2],
+               "save_as": None,
+               "save_dir": "./",
+               "HDF_group": "/distance_matrices",
+               "block_size": 1000,
+               "prefetch": 0,
+               "cache": False}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    comm = ht.MPI_WORLD
+    verbose = verbose and comm.rank == 0
+    dtype = _HELP_np_dtype(cfg.dtype)
+    if isinstance(mobile, mda.Universe):
+        frames = range(mobile.trajectory.n_frames)[cfg.start:cfg.stop:cfg.step]
+        n_atoms = mobile.select_atoms(sel).n_atoms
+    elif isinstance(mobile, list):
+        frames = range(len(mobile))[cfg.start:cfg.stop:cfg.step]
+        n_atoms = mda.Universe(mobile[0]).select_atoms(sel).n_atoms
+    else:
+        raise TypeError("<mobile> must be MDA universe or list with paths to .pdb files.")
+    size = n_atoms*(n_atoms-1)//2 if condensed else n_atoms*n_atoms
+
+    # distance matrices of local frame slice
+    _, _, slices = comm.chunk((len(frames),), 0)
+    local = frames[slices[0]]
+    if len(local) == 0:
+        DM = np.empty((0, size), dtype=dtype)
+    elif isinstance(mobile, mda.Universe):
+        DM = get_Distance_Matrices(mobile, sel=sel, sss=[local.start, local.stop, local.step], flatten=True,
+                                   condensed=condensed, dtype=dtype, block_size=cfg.block_size,
+                                   prefetch=cfg.prefetch, cache=cfg.cache, verbose=verbose)
+    else:
+        DM = get_Distance_Matrices([mobile[i] for i in local], sel=sel, flatten=True,
+                                   condensed=condensed, dtype=dtype, verbose=verbose)
+    DM = ht.array(DM, dtype=_HELP_ht_dtype(dtype), is_split=0, comm=comm)
+
+    if cfg.save_as is not None:
+        if _misc.get_extension(cfg.save_as) != ".h5":
+            cfg.save_as += ".h5"
+        h5_file = _misc.joinpath(cfg.save_dir, cfg.save_as)
+        if condensed:
+            ht.save_hdf5(DM, h5_file, cfg.HDF_group)
+        else:
+            ht.save_hdf5(ht.array(DM.larray.reshape((-1, n_atoms, n_atoms)), is_split=0, copy=False, comm=comm),
+                         h5_file, cfg.HDF_group)
+        comm.Barrier()
+        if comm.rank == 0:
+            with h5py.File(h5_file, "r+") as handle:
+                handle[cfg.HDF_group].attrs["condensed"] = condensed
+                handle[cfg.HDF_group].attrs["shape"] = (len(frames), n_atoms, n_atoms)
+        comm.Barrier()
+        if verbose:
+            print(f"Saved h5 file as: {h5_file}")
+    return DM
+
+
+@_misc.memoize()
 def heat_KMeans(h5_file, HDF_group="/distance_matrices", n_clusters=20, center_type='centroid',
                 sss=[None, None, None], verbose=True, **kwargs):
     """
@@ -393,11 +812,17 @@ def heat_KMeans(h5_file, HDF_group="/distance_matrices", n_clusters=20, center_t
         start (None, int): start index
         stop (None, int): stop index
         step (None, int): step size
-        dtype (dtype): heat.float64 (default), heat.float32, etc.
-        prec (None, int): rounding precision of wss_data
+        dtype (dtype):
+          | compute data type: heat.float64 (default), heat.float32, etc.
+          | numpy data types are converted to heat data types.
+          | h5 files stored with float16 (see save_h5()) should be clustered
+            with heat.float32.
+        random_state (None, int): random state of KMeans initialization
+        prec (None, int): rounding precision of wss_data. Defaults to 3.
         rescale (bool):
           | rescale wss_data by diving through length of DM ~ n_frames.
           | Defaults to True.
+        memoize (bool): memoize result on disk, see misc.memoize(). Defaults to False.
 
     Returns:
         cluster_data (CLUSTER_DATA)
@@ -409,8 +834,10 @@ def heat_KMeans(h5_file, HDF_group="/distance_matrices", n_clusters=20, center_t
           |     data point cluster labels
           | .noise_label (None, int)
           |     noise label used for algorithms such as DBSCAN
+          | .inertia (float)
+          |      sum of squared errors of all data points (not rounded, not rescaled)
           | .wss_data (WSS_DATA)
-          |      output of get_WSS() or get_DM_WSS()
+          |      same as output of get_DM_WSS(), but computed from the loaded data
           |      .wss_data.wss (float)
           |         Within Cluster Sums of Squares ~ Sum of Squared Errors of all clusters
           |      .wss_data.sse (list)
@@ -426,55 +853,77 @@ def heat_KMeans(h5_file, HDF_group="/distance_matrices", n_clusters=20, center_t
                "start": sss[0],
                "stop": sss[1],
                "step": sss[2],
-               "rescale": True}
+               "prec": 3,
+               "rescale": True,
+               "random_state": None}
     cfg = _misc.CONFIG(default, **kwargs)
 
-    if isinstance(h5_file, str):
-        if verbose:
-            print("loading data...")
-        data = ht.load(h5_file, HDF_group, split=0, dtype=cfg.dtype)
-    else:
-        raise TypeError("wrong datatype: <h5_file> must be str (path to h5 file containing data).")
-    if np.shape(data) != 2:
-        data = reshape_data(data, dim_out=2, sss=[cfg.start, cfg.stop, cfg.step], verbose=verbose)
+    data, condensed = _HELP_heat_load(h5_file, HDF_group, cfg, verbose=verbose)
     if verbose:
         print("clustering data...")
         timer = _misc.TIMER()
         _misc.timeit(timer)  # start timer
 
-    length, size = np.shape(data)
-    if center_type.lower() == "centroid":
-        kmeans = ht.cluster.KMeans(n_clusters=n_clusters)
-    elif center_type.lower() == "medoid":
-        kmeans = ht.cluster.KMedoids(n_clusters=n_clusters)
-    else:
-        raise ValueError("""center_type must be either 'centroid' or 'medoid'.""")
-
-    kmeans.fit(data)
-    centers = kmeans.cluster_centers_.numpy().reshape((n_clusters, int(np.sqrt(size)), int(np.sqrt(size))))
-    counts = np.bincount(kmeans.labels_.numpy().flatten())
-    labels = kmeans.labels_.numpy().flatten()
-
-    wss_data = get_DM_WSS(h5_file, centers=centers, labels=labels, verbose=False, **cfg)
-    cluster_data = CLUSTER_DATA(centers=centers, counts=counts, labels=labels, wss_data=wss_data, compact_score=wss_data.se_mean)
+    cluster_data = _HELP_heat_fit(data, n_clusters, center_type, condensed, cfg)
 
     if verbose:
         _misc.timeit(timer, msg="clustering time:")  # stop timer
-        _misc.cprint(f"WSS: {wss_data.wss}")
+        _misc.cprint(f"WSS: {cluster_data.wss_data.wss}")
     return cluster_data
 
 
-def heat_KMeans_bestofN(h5_file, n_clusters, N=50, topx=5, verbose=True, **kwargs):
+_HELP_BESTOFN_DATA = None   # numpy data shared with forked worker processes of heat_KMeans_bestofN() and apply_elbow_method()
+
+
+def _HELP_heat_KMeans_worker(job):
+    """
+    Worker of heat_KMeans_bestofN(). Fits a single restart to the data which
+    was loaded by the parent process before the worker processes were forked.
+    """
+    ndx, n_clusters, center_type, condensed, cfg, n_threads = job
+    torch.set_num_threads(n_threads)
+    data = ht.array(_HELP_BESTOFN_DATA, split=None)
+    return ndx, _HELP_heat_fit(data, n_clusters, center_type, condensed, cfg)
+
+
+def heat_KMeans_bestofN(h5_file, n_clusters, N=50, topx=5, n_jobs=1, verbose=True, **kwargs):
     """
     Repeat heat_KMeans N times and return topx results based on minimized sum of squared errors.
 
+    The data is loaded only once and reused for all restarts. The restarts are
+    ranked by their inertia (sum of squared errors of all data points), i.e.
+    the returned clusters are the true topx of all N restarts.
+
+    .. Note:: n_jobs>1 runs the restarts concurrently in forked worker
+      processes which share the loaded data. If the script is executed with
+      multiple MPI processes, each restart is instead distributed across all
+      MPI ranks and the restarts are executed one after another.
+
     Args:
         h5_file (str): path to h5 file containing data
         n_clusters (int): number of clusters
         N (int): number of repeats
         topx (int): number of best ranked clusters to return
+        n_jobs (int):
+          | number of concurrent restarts (worker processes)
+          | -1 or None: use all available cores
         verbose (bool)
 
+    Keyword Args:
+        HDF_group (str): Hierarchical Data Format group
+        center_type (str): 'centroid' or 'medoid'
+        sss (list): [start, stop, step] indices of <h5_file> data
+        start (None, int): start index
+        stop (None, int): stop index
+        step (None, int): step size
+        dtype (dtype): compute data type: heat.float64 (default), heat.float32, etc.
+        random_state (None, int):
+          | random state of the first restart. Restart i uses random_state+i.
+          | None: draw random states for all restarts.
+        prec (None, int): rounding precision of wss_data
+        rescale (bool): rescale wss_data by diving through length of DM ~ n_frames.
+          Defaults to True.
+
     .. Hint:: Args and Keyword Args of heat_KMeans are valid Keyword Args.
 
     Returns:
@@ -486,8 +935,10 @@ def heat_KMeans_bestofN(h5_file, n_clusters, N=50, topx=5, verbose=True, **kwarg
           |         counts per cluster of best result
           |     .labels (array)
           |         data point cluster labels
+          |     .inertia (float)
+          |         sum of squared errors of all data points (used for ranking)
           |     .wss_data (WSS_DATA)
-          |         output of get_WSS() or get_DM_WSS()
+          |         same as output of get_DM_WSS()
           |         .wss (float)
           |             Within Cluster Sums of Squares ~ Sum of Squared Errors of all clusters
           |         .sse (list)
@@ -499,16 +950,54 @@ def heat_KMeans_bestofN(h5_file, n_clusters, N=50, topx=5, verbose=True, **kwarg
           |     .compact_score (array)
           |         mean values of Squared Errors for each cluster ~ can be interpreted as a compactness score
     """
-    CLUSTER = []
-    WSS = 99999999999999999999999999999999
-
-    for i in tqdm(range(N)):
-        cluster_data = heat_KMeans(h5_file, n_clusters=n_clusters, verbose=False)
-        if cluster_data.wss_data.wss < WSS:
-            CLUSTER.append(cluster_data)
-            WSS = cluster_data.wss_data.wss
+    sss = kwargs.pop("sss", [None, None, None])
+    default = {"HDF_group": "/distance_matrices",
+               "center_type": "centroid",
+               "dtype": ht.float64,
+               "start": sss[0],
+               "stop": sss[1],
+               "step": sss[2],
+               "prec": 3,
+               "rescale": True,
+               "random_state": None}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    if cfg.random_state is None:
+        SEEDS = [int(item) for item in np.random.default_rng().integers(2**31-N, size=N)]
+    else:
+        SEEDS = [cfg.random_state+i for i in range(N)]
+    fit_cfg = {"prec": cfg.prec, "rescale": cfg.rescale}
+    data, condensed = _HELP_heat_load(h5_file, cfg.HDF_group, cfg, verbose=verbose)
+
+    if n_jobs in [-1, None]:
+        n_jobs = os.cpu_count()
+    n_jobs = max(1, min(n_jobs, N))
+    if n_jobs > 1 and ht.MPI_WORLD.size > 1:
+        n_jobs = 1
+
+    def RESULTS():
+        global _HELP_BESTOFN_DATA
+        if n_jobs == 1:
+            for ndx, seed in enumerate(SEEDS):
+                yield ndx, _HELP_heat_fit(data, n_clusters, cfg.center_type, condensed, dict(fit_cfg, random_state=seed))
+            return
+        n_threads = max(1, torch.get_num_threads()//n_jobs)
+        JOBS = [(ndx, n_clusters, cfg.center_type, condensed, dict(fit_cfg, random_state=seed), n_threads)
+                for ndx, seed in enumerate(SEEDS)]
+        _HELP_BESTOFN_DATA = data.numpy()
+        try:
+            with multiprocessing.get_context("fork").Pool(n_jobs) as pool:
+                yield from pool.imap_unordered(_HELP_heat_KMeans_worker, JOBS)
+        finally:
+            _HELP_BESTOFN_DATA = None
+
+    # keep true topx ranked by inertia (ties: restart index)
+    TOPX = []
+    for ndx, cluster_data in tqdm(RESULTS(), total=N, disable=not verbose):
+        TOPX.append((cluster_data.inertia, ndx, cluster_data))
+        TOPX = sorted(TOPX, key=lambda item: item[:2])[:topx]
+    TOPX_CLUSTER = [item[2] for item in TOPX]
 
-    TOPX_CLUSTER = CLUSTER[-topx:][::-1]
     if verbose:
         _misc.cprint("Returned clusters:", "blue")
         for ndx, item in enumerate(TOPX_CLUSTER):
@@ -516,38 +1005,336 @@ def heat_KMeans_bestofN(h5_file, n_clusters, N=50, topx=5, verbose=True, **kwarg
     return TOPX_CLUSTER
 
 
-def get_DM_centroids(DM, labels):
+def WF_heat_clustering(mobile, n_clusters=20, sel="protein and name CA", sss=[None, None, None],
+                       center_type="centroid", condensed=True, verbose=True, **kwargs):
     """
-    get Distance Matrix centroids.
+    Distributed workflow from trajectory to cluster labels using MPI and heat.
+
+    | 1) each MPI process calculates the distance matrices of its own frame slice
+    |    (see heat_Distance_Matrices()), optionally saved as h5 file
+    | 2) the distributed distance matrices are clustered with heat's KMeans/KMedoids
+    | 3) WSS and centroids are computed on the local chunks and only the per
+    |    cluster statistics are reduced across MPI processes
+
+    Only small summaries (cluster centers, statistics and labels) are gathered,
+    i.e. each process holds only its own slice of distance matrices.
+
+    .. Hint:: Run the script via "mpirun -n <n_processes> python <script>".
+      Without MPI the function works with a single process. All processes
+      return the same result.
+
+    Args:
+        mobile (universe, list):
+          | (MDA universe): structure with trajectory
+          | (list): list with paths to structure files (.pdb)
+        n_clusters (int): number of clusters
+        sel (str): selection string
+        sss (list):
+          | [start, stop, step]
+          | start (None, int): start frame
+          | stop (None, int): stop frame
+          | step (None, int): step size
+        center_type (str):
+          | 'centroid': use heat.cluster.KMeans() with centroids as cluster centers
+          | 'medoid': use heat.cluster.KMedoids() with medoids as cluster centers
+        condensed (bool): use condensed distance matrices (halves memory usage)
+        verbose (bool): print progress (MPI rank 0 only)
+
+    Keyword Args:
+        dtype (dtype): compute data type: np.float64 (default), np.float32 or heat equivalents
+        random_state (None, int): random state of KMeans initialization
+        prec (None, int): rounding precision of wss_data. Defaults to 3.
+        rescale (bool):
+          | rescale wss_data by diving through length of DM ~ n_frames.
+          | Defaults to True.
+        save_as (None, str): save distance matrices as h5 file
+        save_dir (str): save directory of h5 file
+
+    .. Hint:: Args and Keyword Args of heat_Distance_Matrices() are valid Keyword Args.
+
+    Returns:
+        cluster_data (CLUSTER_DATA)
+          | .centers (array)
+          |     cluster centers
+          | .counts (array)
+          |     counts per cluster
+          | .labels (array)
+          |     data point cluster labels
+          | .inertia (float)
+          |      sum of squared errors of all data points (not rounded, not rescaled)
+          | .wss_data (WSS_DATA)
+          |      same as output of get_DM_WSS()
+          | .compact_score (array)
+          |      mean values of Squared Errors for each cluster ~ can be interpreted as a compactness score
+          | .n_iter (int)
+          |      number of iterations
+    """
+    default = {"random_state": None,
+               "prec": 3,
+               "rescale": True}
+    cfg = _misc.CONFIG(default, **kwargs)
+    for key in default:
+        kwargs.pop(key, None)
+    ############################################################################
+    verbose = verbose and ht.MPI_WORLD.rank == 0
+    if verbose:
+        _misc.cprint(f"calculating distance matrices ({ht.MPI_WORLD.size} MPI processes)...", "blue")
+        timer = _misc.TIMER()
+        _misc.timeit(timer)  # start timer
+    DM = heat_Distance_Matrices(mobile, sel=sel, sss=sss, condensed=condensed, verbose=verbose, **kwargs)
+    if verbose:
+        _misc.timeit(timer, msg="distance matrices time:")  # stop timer
+        print("clustering data...")
+        timer = _misc.TIMER()
+        _misc.timeit(timer)  # start timer
+
+    cluster_data = _HELP_heat_fit(DM, n_clusters, center_type, condensed, cfg)
+
+    if verbose:
+        _misc.timeit(timer, msg="clustering time:")  # stop timer
+        _misc.cprint(f"WSS: {cluster_data.wss_data.wss}")
+    return cluster_data
+
+
+@_misc.memoize()
+def minibatch_KMeans(h5_file, n_clusters=20, HDF_group="/distance_matrices", sss=[None, None, None],
+                     batch_size=1000, n_epochs=3, verbose=True, **kwargs):
+    """
+    apply mini-batch KMeans clustering to data streamed from a h5 file.
+
+    The data is never loaded as a whole: the cluster centers are initialized
+    with k-means++ on a random sample of init_size data points (which is also
+    used as the first mini-batch), updated incrementally with slabs of batch_size data points (read in random order
+    for each epoch) and the labels are assigned in a final streaming pass. The
+    peak memory usage is therefore one slab, i.e. this function is suited for
+    data which does not fit into RAM.
+
+    Args:
+        h5_file (str): path to h5 file containing data (see save_h5())
+        n_clusters (int): number of clusters
+        HDF_group (str): Hierarchical Data Format group
+        sss (list):
+          | [start, stop, step] indices of <h5_file> data
+          | start (None, int): start index
+          | stop (None, int): stop index
+          | step (None, int): step size
+        batch_size (int): number of data points per slab (mini-batch)
+        n_epochs (int): number of passes over the data to update cluster centers
+        verbose (bool)
+
+    Keyword Args:
+        start (None, int): start index
+        stop (None, int): stop index
+        step (None, int): step size
+        dtype (dtype):
+          | compute data type: np.float64 (default), np.float32 or heat equivalents.
+          | h5 files stored with float16 (see save_h5()) are converted to dtype.
+        random_state (None, int): random state of initialization and slab order
+        init_size (None, int):
+          | number of randomly sampled data points used for k-means++ initialization.
+          | None: max(3*n_clusters, batch_size)
+        prec (None, int): rounding precision of wss_data. Defaults to 3.
+        rescale (bool):
+          | rescale wss_data by diving through length of DM ~ n_frames.
+          | Defaults to True.
+        memoize (bool): memoize result on disk, see misc.memoize(). Defaults to False.
+
+    Returns:
+        cluster_data (CLUSTER_DATA)
+          | .centers (array)
+          |     cluster centers
+          | .counts (array)
+          |     counts per cluster
+          | .labels (array)
+          |     data point cluster labels
+          | .noise_label (None, int)
+          |     noise label used for algorithms such as DBSCAN
+          | .inertia (float)
+          |      sum of squared errors of all data points (not rounded, not rescaled)
+          | .wss_data (WSS_DATA)
+          |      same as output of get_DM_WSS()
+          | .compact_score (array)
+          |      mean values of Squared Errors for each cluster ~ can be interpreted as a compactness score
+          | .n_iter (int)
+          |      number of mini-batch updates
+    """
+    default = {"dtype": np.float64,
+               "start": sss[0],
+               "stop": sss[1],
+               "step": sss[2],
+               "random_state": None,
+               "init_size": None,
+               "prec": 3,
+               "rescale": True}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    if not isinstance(h5_file, str):
+        raise TypeError("wrong datatype: <h5_file> must be str (path to h5 file containing data).")
+    if _misc.get_extension(h5_file) != ".h5":
+        h5_file += ".h5"
+    condensed = is_condensed_h5(h5_file, HDF_group)
+    dtype = _HELP_np_dtype(cfg.dtype)
+    rng = np.random.default_rng(cfg.random_state)
+    sss = [cfg.start, cfg.stop, cfg.step]
+
+    # k-means++ initialization on a random sample
+    with h5py.File(h5_file, "r") as handle:
+        frames = range(len(handle[HDF_group]))[slice(*sss)]
+        if len(frames) < n_clusters:
+            raise ValueError(f"n_clusters={n_clusters} exceeds the number of data points ({len(frames)}).")
+        init_size = max(3*n_clusters, batch_size) if cfg.init_size is None else max(cfg.init_size, n_clusters)
+        sample = np.sort(rng.choice(len(frames), size=min(init_size, len(frames)), replace=False))
+        sample = handle[HDF_group][[frames[i] for i in sample]]
+    sample = sample.reshape((len(sample), -1)).astype(dtype, copy=False)
+    init, _ = kmeans_plusplus(sample, n_clusters, random_state=int(rng.integers(2**31)))
+
+    # update cluster centers with slabs of data
+    if verbose:
+        print("clustering data...")
+        timer = _misc.TIMER()
+        _misc.timeit(timer)  # start timer
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1, batch_size=batch_size,
+                             random_state=int(rng.integers(2**31)))
+    # first update with the k-means++ sample: partial_fit() rejects a first batch with
+    # fewer than n_clusters data points, which a short trailing slab can have.
+    kmeans.partial_fit(sample)
+    del sample
+    n_blocks = n_epochs*int(np.ceil(len(frames)/batch_size))
+    BLOCKS = (block for epoch in range(n_epochs)
+              for ndx, block in _HELP_iter_DM_blocks(h5_file, sss=sss, block_size=batch_size, HDF_group=HDF_group,
+                                                     shuffle=True, random_state=rng))
+    for block in tqdm(BLOCKS, total=n_blocks, disable=not verbose):
+        kmeans.partial_fit(block.astype(dtype, copy=False))
+    centers = kmeans.cluster_centers_
+
+    # assign labels in a final streaming pass
+    labels = np.zeros(len(frames), dtype=int)
+    SE = np.zeros(len(frames))
+    for ndx, block in _HELP_iter_DM_blocks(h5_file, sss=sss, block_size=batch_size, HDF_group=HDF_group):
+        block = block.astype(dtype, copy=False)
+        l = kmeans.predict(block)
+        labels[ndx:ndx+len(block)] = l
+        SE[ndx:ndx+len(block)] = np.sum((block-centers[l])**2, axis=1)
+
+    # |A|^2 = 2 * |condensed(A)|^2 for symmetric matrices with zero diagonal
+    if condensed:
+        SE *= 2
+        centers = _HELP_expand(centers)
+    else:
+        n = int(np.sqrt(centers.shape[1]))
+        centers = centers.reshape((n_clusters, n, n))
+    counts = np.bincount(labels, minlength=n_clusters)
+    wss_data = _HELP_WSS_DATA(SE, labels, n_clusters, prec=cfg.prec, rescale=cfg.rescale)
+
+    if verbose:
+        _misc.timeit(timer, msg="clustering time:")  # stop timer
+        _misc.cprint(f"WSS: {wss_data.wss}")
+    return CLUSTER_DATA(centers=centers, counts=counts, labels=labels, inertia=float(np.sum(SE)),
+                        wss_data=wss_data, compact_score=wss_data.se_mean, n_iter=kmeans.n_steps_)
+
+
+def _HELP_iter_DM_blocks(DM, sss=[None, None, None], block_size=1000, HDF_group="/distance_matrices",
+                         shuffle=False, random_state=None):
+    """
+    Iterate over blocks of distance matrices. If DM is a path to a h5 file, only
+    one block is read into memory at a time.
 
     Args:
         DM (str, array): path to h5_file containing distance matrices or array with distance matrices
+        sss (list): [start, stop, step] indices of DM data
+        block_size (int): number of distance matrices per block
+        HDF_group (str): Hierarchical Data Format group
+        shuffle (bool): iterate over blocks in random order
+        random_state (None, int, np.random.Generator): random state of shuffle
+
+    Yields:
+        ndx (int)
+            index of the first distance matrix of the block within DM[start:stop:step]
+        block (array)
+            block of flattened distance matrices with shape (n, size)
+    """
+    if isinstance(DM, str):
+        if _misc.get_extension(DM) != ".h5":
+            DM += ".h5"
+        with h5py.File(DM, "r") as handle:
+            yield from _HELP_iter_DM_blocks(handle[HDF_group], sss=sss, block_size=block_size,
+                                            shuffle=shuffle, random_state=random_state)
+        return
+
+    frames = range(len(DM))[slice(*sss)]
+    NDX = np.arange(0, len(frames), block_size)
+    if shuffle:
+        NDX = np.random.default_rng(random_state).permutation(NDX)
+    for ndx in NDX.tolist():
+        block_frames = frames[ndx:ndx+block_size]
+        block = np.asarray(DM[block_frames.start:block_frames.stop:block_frames.step])
+        yield ndx, block.reshape((len(block), -1))
+
+
+def get_DM_centroids(DM, labels, condensed=False, HDF_group="/distance_matrices", **kwargs):
+    """
+    get Distance Matrix centroids.
+
+    .. Note:: DM is processed in blocks, i.e. if DM is a path to a h5 file, the
+      peak memory usage is one block of distance matrices.
+
+    Args:
+        DM (str, array, heat.DNDarray):
+          | path to h5_file containing distance matrices or array with distance matrices
+          | heat.DNDarray: distance matrices distributed across MPI processes,
+            only the per cluster sums are reduced
         labels (array): cluster labels for each frame of DM
+        condensed (bool):
+          | DM contains condensed distance matrices with shape (length, N*(N-1)/2)
+          | (ignored if DM is a path to a h5 file, which stores this information itself)
+        HDF_group (str): Hierarchical Data Format group
+
+    Keyword Args:
+        block_size (int): number of distance matrices per block
 
     Returns:
         CENTROIDS (array)
-            centroids of DM, one for each label
+            centroids of DM, one for each label. Centroids of condensed distance
+            matrices are returned as square matrices.
     """
+    default = {"block_size": 1000}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    if isinstance(DM, ht.DNDarray):
+        return _HELP_heat_centroids(DM, labels, condensed=condensed)
     if isinstance(DM, str):
-        DM = read_h5(DM)
-    CENTROIDS = []
-
-    DM_map = [[] for i in range(min(labels), max(labels)+1)]
-    for ndx, item in enumerate(labels):
-        DM_map[item].append(DM[ndx])
+        condensed = is_condensed_h5(DM, HDF_group)
+        with h5py.File(DM if _misc.get_extension(DM) == ".h5" else DM+".h5", "r") as handle:
+            shape = handle[HDF_group].shape
+    else:
+        shape = np.shape(DM)
+    labels = np.asarray(labels, dtype=int)
+    n_labels = max(labels)+1
 
-    for dms in DM_map:
-        CENTROIDS.append(sum(dms)/len(dms))
+    SUM = np.zeros((n_labels, int(np.prod(shape[1:]))))
+    for ndx, block in _HELP_iter_DM_blocks(DM, sss=[None, len(labels), None], block_size=cfg.block_size, HDF_group=HDF_group):
+        np.add.at(SUM, labels[ndx:ndx+len(block)], block)
+    COUNTS = np.bincount(labels, minlength=n_labels)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        CENTROIDS = (SUM/COUNTS[:, None])[min(labels):].reshape((-1,) + tuple(shape[1:]))
 
-    return np.array(CENTROIDS)
+    if condensed:
+        return _HELP_expand(CENTROIDS)
+    return CENTROIDS
 
 
 def get_DM_WSS(DM, centers, labels, sss=[None, None, None], **kwargs):
     """
     get distance matrix WSS (Within Cluster Sums of Squares ~ Sum of Squared Errors of all clusters)
 
+    .. Note:: DM is processed in blocks, i.e. if DM is a path to a h5 file, the
+      peak memory usage is one block of distance matrices.
+
     Args:
-        DM (str, array): path to h5_file containing distance matrices or array with distance matrices
+        DM (str, array, heat.DNDarray):
+          | path to h5_file containing distance matrices or array with distance matrices
+          | heat.DNDarray: distance matrices distributed across MPI processes,
+            only the per cluster statistics are reduced
         centers (array): cluster centers array with dim(DM) == dim(centers).
         labels (array): cluster labels array with length(DM)
         sss (list):
@@ -561,6 +1348,16 @@ def get_DM_WSS(DM, centers, labels, sss=[None, None, None], **kwargs):
         rescale (bool):
           | rescale wss_data by diving through length of DM ~ n_frames.
           | Defaults to False.
+        condensed (bool):
+          | DM contains condensed distance matrices with shape (length, N*(N-1)/2)
+          | (ignored if DM is a path to a h5 file, which stores this information itself)
+        HDF_group (str): Hierarchical Data Format group
+        dtype (dtype): compute data type, np.float64 (default), np.float32 or
+          heat equivalents. Data stored as float16 is converted to dtype.
+        block_size (int): number of distance matrices per block
+
+    .. Note:: Condensed distance matrices yield the same WSS_DATA as square
+      distance matrices, i.e. squared errors of the upper triangle are doubled.
 
     Returns:
         WSS_DATA (WSS_DATA)
@@ -577,38 +1374,179 @@ def get_DM_WSS(DM, centers, labels, sss=[None, None, None], **kwargs):
                "stop": sss[1],
                "step": sss[2],
                "prec": 3,
-               "rescale": False}
+               "rescale": False,
+               "condensed": False,
+               "HDF_group": "/distance_matrices",
+               "dtype": np.float64,
+               "block_size": 1000}
     cfg = _misc.CONFIG(default, **kwargs)
     ############################################################################
     if isinstance(DM, str):
-        DM = reshape_data(read_h5(DM), dim_out=3, sss=[cfg.start, cfg.stop, cfg.step], verbose=False)
+        cfg.condensed = is_condensed_h5(DM, cfg.HDF_group)
+    dtype = _HELP_np_dtype(cfg.dtype)
+    centers = np.asarray(centers, dtype=dtype)
+    if cfg.condensed:
+        # |A|^2 = 2 * |condensed(A)|^2 for symmetric matrices with zero diagonal
+        centers = reshape_data(centers, dim_out=2, verbose=False, condensed=True)
+        factor = 2
+    else:
+        factor = 1
+    centers = centers.reshape((len(centers), -1))
+    if isinstance(DM, str):
+        with h5py.File(DM if _misc.get_extension(DM) == ".h5" else DM+".h5", "r") as handle:
+            n_frames = len(handle[cfg.HDF_group])
     else:
-        DM = reshape_data(DM, dim_out=3, sss=[cfg.start, cfg.stop, cfg.step], verbose=False)
+        n_frames = len(DM)
+    n_frames = len(range(n_frames)[cfg.start:cfg.stop:cfg.step])
+    if len(labels) != n_frames:
+        raise ValueError(f"length of labels ({len(labels)}) does not match the number of frames "
+                         f"of DM[start:stop:step] ({n_frames}).")
+    if isinstance(DM, ht.DNDarray):
+        if [cfg.start, cfg.stop, cfg.step] != [None, None, None]:
+            DM = DM[cfg.start:cfg.stop:cfg.step]
+        WSS_DATA, _ = _HELP_heat_WSS_DATA(DM, centers, _HELP_heat_local_labels(DM, labels), len(centers),
+                                          factor=factor, prec=cfg.prec, rescale=cfg.rescale)
+        return WSS_DATA
+    labels = np.asarray(labels, dtype=int)
+
+    # Squared Errors of each frame
+    SE = np.zeros(len(labels))
+    for ndx, block in _HELP_iter_DM_blocks(DM, sss=[cfg.start, cfg.stop, cfg.step],
+                                           block_size=cfg.block_size, HDF_group=cfg.HDF_group):
+        block = block.astype(dtype, copy=False)
+        l = labels[ndx:ndx+len(block)]
+        SE[ndx:ndx+len(block)] = factor*np.sum((block-centers[l])**2, axis=1)
+
+    return _HELP_WSS_DATA(SE, labels, len(centers), prec=cfg.prec, rescale=cfg.rescale)
+
+
+def _HELP_WSS_DATA(SE, labels, n_clusters, prec=3, rescale=False):
+    """
+    Returns WSS_DATA for the squared errors SE of each data point.
 
-    SE = [[] for i in range(len(centers))]   # Squared Errors (of individual clusters)
+    Args:
+        SE (array): squared errors of each data point
+        labels (array): cluster labels of each data point
+        n_clusters (int): number of clusters
+        prec (None, int): rounding precision
+        rescale (bool): rescale wss_data by diving through length of labels
 
-    for ndx, l in enumerate(labels):
-        d = np.linalg.norm(centers[l]-DM[ndx])
-        SE[l].append(d*d)
+    Returns:
+        WSS_DATA (WSS_DATA)
+    """
+    # per cluster statistics via vectorized reductions
+    COUNTS = np.bincount(labels, minlength=n_clusters)
+    SUM = np.bincount(labels, weights=SE, minlength=n_clusters)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        MEAN = SUM/COUNTS
+        STD = np.sqrt(np.bincount(labels, weights=(SE-MEAN[labels])**2, minlength=n_clusters)/COUNTS)
+    return _HELP_round_WSS_DATA(SUM, MEAN, STD, length=len(labels), prec=prec, rescale=rescale)
 
-    if cfg.rescale:
-        norm = 1.0/len(DM)
+
+def _HELP_round_WSS_DATA(SUM, MEAN, STD, length, prec=3, rescale=False):
+    """
+    Returns WSS_DATA for per cluster statistics of squared errors.
+
+    Args:
+        SUM (array): sum of squared errors of each cluster
+        MEAN (array): mean of squared errors of each cluster
+        STD (array): std of squared errors of each cluster
+        length (int): number of data points
+        prec (None, int): rounding precision
+        rescale (bool): rescale wss_data by diving through length
+
+    Returns:
+        WSS_DATA (WSS_DATA)
+    """
+    if rescale:
+        norm = 1.0/length
     else:
         norm = 1
 
     # statistics
-    SE_mean = [round(norm*np.mean(item), cfg.prec) for item in SE]
-    SE_std = [round(norm*np.std(item), cfg.prec) for item in SE]
+    SE_mean = [round(norm*item, prec) for item in MEAN]
+    SE_std = [round(norm*item, prec) for item in STD]
 
     # SSE: Sum of Squared Errors (of individual clusters)
-    SSE = [round(norm*sum(item), cfg.prec) for item in SE]
+    SSE = [round(norm*item, prec) for item in SUM]
     # WSS: Within Cluster Sums of Squares == Sum of Squared Errors (of all clusters)
-    WSS = round(sum(SSE), cfg.prec)
+    WSS = round(sum(SSE), prec)
 
     WSS_DATA = WSS_DATA_obj(wss=WSS, sse=SSE, se_mean=SE_mean, se_std=SE_std)
     return WSS_DATA
 
 
+def benchmark_precision(DM, n_clusters=10, dtypes=[np.float64, np.float32, np.float16],
+                        save_dir="./", random_state=0, verbose=True, **kwargs):
+    """
+    Benchmark the accuracy loss of reduced precision distance matrices on
+    clustering results. For each storage data type, DM is saved as temporary h5
+    file and clustered via heat_KMeans() with the same random_state. Results are
+    compared to the first entry of dtypes (reference, usually np.float64).
+
+    .. Note:: float64 data is clustered with heat.float64, all other data types
+      are clustered with heat.float32.
+
+    Args:
+        DM (str, array): path to h5_file containing distance matrices or array with distance matrices
+        n_clusters (int): number of clusters
+        dtypes (list): storage data types
+        save_dir (str): directory of temporary h5 files
+        random_state (int): random state of KMeans initialization
+        verbose (bool)
+
+    .. Hint:: Args and Keyword Args of heat_KMeans are valid Keyword Args.
+
+    Returns:
+        DTYPES (list)
+            list with names of storage data types
+        DM_ERROR (list)
+            list with max. absolute error of stored distance matrices
+        WSS (list)
+            list with WSS ~ Within Cluster Sums of Squares
+        WSS_ERROR (list)
+            list with relative WSS error compared to reference
+        LABELS_ARI (list)
+            list with adjusted rand index of labels compared to reference
+            (1.0: identical clustering)
+        TIME (list)
+            list with clustering time in seconds
+    """
+    condensed = False
+    if isinstance(DM, str):
+        condensed = is_condensed_h5(DM)
+        DM = read_h5(DM)
+    DM = np.asarray(DM)
+
+    DTYPES, DM_ERROR, WSS, WSS_ERROR, LABELS_ARI, TIME = [], [], [], [], [], []
+    for dtype in dtypes:
+        dtype = _HELP_np_dtype(dtype)
+        h5_file = save_h5(DM, save_as=f"benchmark_{dtype.name}.h5", save_dir=save_dir,
+                          condensed=condensed, dtype=dtype, verbose=False)
+        compute_dtype = ht.float64 if dtype == np.float64 else ht.float32
+
+        t0 = time.time()
+        cluster_data = heat_KMeans(h5_file, n_clusters=n_clusters, verbose=False,
+                                   random_state=random_state, **{**kwargs, "dtype": compute_dtype})
+        TIME.append(round(time.time()-t0, 3))
+        _misc.rm(h5_file, verbose=False)
+
+        if len(DTYPES) == 0:
+            ref_wss = cluster_data.wss_data.wss
+            ref_labels = cluster_data.labels
+        DTYPES.append(dtype.name)
+        DM_ERROR.append(float(np.max(np.abs(DM.astype(dtype).astype(np.float64)-DM))))
+        WSS.append(cluster_data.wss_data.wss)
+        WSS_ERROR.append(abs(cluster_data.wss_data.wss-ref_wss)/ref_wss if ref_wss != 0 else 0.0)
+        LABELS_ARI.append(adjusted_rand_score(ref_labels, cluster_data.labels))
+
+    if verbose:
+        _misc.cprint("dtype\t\tmax DM error\tWSS\t\tWSS error\tlabels ARI\ttime (s)", "blue")
+        for i in range(len(DTYPES)):
+            print(f"{DTYPES[i]}\t\t{DM_ERROR[i]:.2e}\t{WSS[i]}\t{WSS_ERROR[i]:.2e}\t{LABELS_ARI[i]:.4f}\t\t{TIME[i]}")
+    return DTYPES, DM_ERROR, WSS, WSS_ERROR, LABELS_ARI, TIME
+
+
 def get_WSS(data, centers, labels, **kwargs):
     """
     get WSS (Within Cluster Sums of Squares ~ Sum of Squared Errors of all clusters)
@@ -663,11 +1601,99 @@ def get_WSS(data, centers, labels, **kwargs):
     return WSS_DATA
 
 
+def _HELP_warm_start_centers(data, cluster_data, n_clusters, condensed):
+    """
+    Initial cluster centers for n_clusters which are derived from the result
+    of a smaller number of clusters: all previous centers are kept and the
+    missing centers are seeded by farthest-first traversal, i.e. each new
+    center is the data point with the largest squared distance to all
+    centers selected so far.
+
+    Args:
+        data (heat.DNDarray): data with shape (length, size)
+        cluster_data (CLUSTER_DATA): result of a smaller number of clusters
+        n_clusters (int): number of clusters
+        condensed (bool): data contains condensed distance matrices
+
+    Returns:
+        init (array)
+            initial cluster centers with shape (n_clusters, size)
+    """
+    centers = cluster_data.centers
+    if condensed:
+        centers = _HELP_condense(centers)
+    else:
+        centers = centers.reshape((len(centers), -1))
+    CENTERS = [centers]
+
+    # squared distance of each data point to its closest center
+    D = ht.spatial.distance.cdist(data, ht.array(centers, dtype=data.dtype)).min(axis=1)**2
+    for i in range(n_clusters-len(centers)):
+        center = data[ht.argmax(D).item()].numpy().reshape((1, -1))
+        CENTERS.append(center)
+        D = ht.minimum(D, ((data - ht.array(center, dtype=data.dtype))**2).sum(axis=1))
+    return np.vstack(CENTERS)
+
+
+def _HELP_elbow_chain(data, n_clusters, center_type, condensed, cfg, warm_start=True):
+    """
+    Cluster data for each number of clusters in ascending order.
+
+    Args:
+        data (heat.DNDarray): data with shape (length, size)
+        n_clusters (list): number of clusters
+        center_type (str): 'centroid' or 'medoid'
+        condensed (bool): data contains condensed distance matrices
+        cfg (dict): config with keys random_state, prec, rescale
+        warm_start (bool): initialize cluster centers with result of previous
+          (smaller) number of clusters
+
+    Yields:
+        n (int)
+            number of clusters
+        cluster_data (CLUSTER_DATA)
+        time (float)
+            clustering time in seconds
+    """
+    cluster_data = None
+    for n in sorted(n_clusters):
+        t0 = time.perf_counter()
+        init = None
+        if warm_start and cluster_data is not None and len(cluster_data.centers) < n:
+            init = _HELP_warm_start_centers(data, cluster_data, n, condensed)
+        cluster_data = _HELP_heat_fit(data, n, center_type, condensed, cfg, init=init)
+        yield n, cluster_data, time.perf_counter()-t0
+
+
+def _HELP_elbow_worker(job):
+    """
+    Worker of apply_elbow_method(). Clusters a chain of cluster numbers using
+    the data which was loaded by the parent process before the worker processes
+    were forked.
+    """
+    n_clusters, center_type, condensed, cfg, warm_start, n_threads = job
+    torch.set_num_threads(n_threads)
+    data = ht.array(_HELP_BESTOFN_DATA, split=None)
+    return list(_HELP_elbow_chain(data, n_clusters, center_type, condensed, cfg, warm_start=warm_start))
+
+
 def apply_elbow_method(h5_file, n_clusters=range(10, 31, 5), sss=[None, None, None],
-                       plot=True, verbose=True, **kwargs):
+                       plot=True, verbose=True, n_jobs=1, warm_start=True, return_stats=False, **kwargs):
     """
     Apply elbow method for a list with cluster numbers n.
 
+    The data is loaded only once and reused for all cluster numbers n. If
+    warm_start is True, the cluster numbers are processed in ascending order
+    and the centers of each n are initialized with the centers of the previous
+    (smaller) n plus the farthest data points, which reduces the number of
+    iterations.
+
+    .. Note:: n_jobs>1 splits the (sorted) cluster numbers into n_jobs chains
+      of consecutive n which are processed concurrently in forked worker
+      processes sharing the loaded data. Warm starts are applied within each
+      chain. If the script is executed with multiple MPI processes, each n is
+      instead distributed across all MPI ranks.
+
     Args:
         h5_file (str): path to h5_file containing distance matrices
         n_clusters (range, list, array): list with cluster numbers n to test using elbow method
@@ -678,12 +1704,24 @@ def apply_elbow_method(h5_file, n_clusters=range(10, 31, 5), sss=[None, None, No
           | step (None, int): step size
         plot (bool)
         verbose (bool)
+        n_jobs (int):
+          | number of concurrent chains (worker processes)
+          | -1 or None: use all available cores
+        warm_start (bool): initialize cluster centers with centers of previous n
+        return_stats (bool): return clustering time and number of iterations for each n
 
     Keyword Args:
+        HDF_group (str): Hierarchical Data Format group
+        center_type (str): 'centroid' or 'medoid'
+        start (None, int): start index
+        stop (None, int): stop index
+        step (None, int): step size
+        dtype (dtype): compute data type: heat.float64 (default), heat.float32, etc.
+        random_state (None, int): random state of KMeans initialization
         prec (None, int): rounding precision
         rescale (bool):
           | rescale wss_data by diving through length of DM ~ n_frames.
-          | Defaults to False.
+          | Defaults to True.
 
     .. Hint:: Args and Keyword Args of misc.figure() are valid Keyword Args.
 
@@ -692,36 +1730,68 @@ def apply_elbow_method(h5_file, n_clusters=range(10, 31, 5), sss=[None, None, No
             list with cluster numbers n to test
         WSS (list)
            list of wss scores ~ Within Cluster Sums of Squares
-
+        TIME (list)
+           clustering time in seconds for each n (only if return_stats is True)
+        N_ITER (list)
+           number of iterations for each n (only if return_stats is True)
     """
-    default = {"start": sss[0],
+    default = {"HDF_group": "/distance_matrices",
+               "center_type": "centroid",
+               "dtype": ht.float64,
+               "start": sss[0],
                "stop": sss[1],
                "step": sss[2],
                "prec": 3,
-               "rescale": True}
+               "rescale": True,
+               "random_state": None}
     cfg = _misc.CONFIG(default, **kwargs)
     ############################################################################
     if not isinstance(n_clusters, (list, range, np.ndarray)):
         raise TypeError("n_clusters must be range, list, np.ndarray")
 
     N_CLUSTERS = list(n_clusters)
-    WSS = []    # wss of each test case
-    first_print = True
-
-    for i in tqdm(n_clusters):
-        cluster_data = heat_KMeans(h5_file, n_clusters=i, sss=[cfg.start, cfg.step, cfg.stop],
-                                   prec=cfg.prec, rescale=cfg.rescale, verbose=False)
-        # wss, sse,  = wss_data
-        WSS.append(cluster_data.wss_data.wss)
+    K = sorted(set(N_CLUSTERS))
+    fit_cfg = {"random_state": cfg.random_state, "prec": cfg.prec, "rescale": cfg.rescale}
+    data, condensed = _HELP_heat_load(h5_file, cfg.HDF_group, cfg, verbose=False)
+
+    if n_jobs in [-1, None]:
+        n_jobs = os.cpu_count()
+    n_jobs = max(1, min(n_jobs, len(K)))
+    if n_jobs > 1 and ht.MPI_WORLD.size > 1:
+        n_jobs = 1
+
+    def RESULTS():
+        global _HELP_BESTOFN_DATA
+        if n_jobs == 1:
+            yield from _HELP_elbow_chain(data, K, cfg.center_type, condensed, fit_cfg, warm_start=warm_start)
+            return
+        n_threads = max(1, torch.get_num_threads()//n_jobs)
+        JOBS = [([int(n) for n in chain], cfg.center_type, condensed, fit_cfg, warm_start, n_threads)
+                for chain in np.array_split(K, n_jobs)]
+        _HELP_BESTOFN_DATA = data.numpy()
+        try:
+            with multiprocessing.get_context("fork").Pool(n_jobs) as pool:
+                for chain in pool.imap_unordered(_HELP_elbow_worker, JOBS):
+                    yield from chain
+        finally:
+            _HELP_BESTOFN_DATA = None
+
+    STATS = {}    # n: (wss, time, n_iter)
+    for n, cluster_data, t in tqdm(RESULTS(), total=len(K), disable=not verbose):
+        STATS[n] = (cluster_data.wss_data.wss, t, cluster_data.n_iter)
+    WSS = [STATS[n][0] for n in N_CLUSTERS]
+    TIME = [STATS[n][1] for n in N_CLUSTERS]
+    N_ITER = [STATS[n][2] for n in N_CLUSTERS]
 
-        if verbose:
-            if first_print:
-                _misc.cprint("\nN Clusters\tWSS ", "blue")
-                first_print = False
-            _misc.cprint(f"{i}\t{cluster_data.wss_data.wss}")
+    if verbose:
+        _misc.cprint("\nN Clusters\tWSS\tTime (s)\tIterations", "blue")
+        for n in K:
+            _misc.cprint(f"{n}\t{STATS[n][0]}\t{STATS[n][1]:.3f}\t{STATS[n][2]}")
 
     if plot:
         _ana.PLOT(xdata=N_CLUSTERS, ydata=WSS, xlabel="Number of Clusters", ylabel="Sum of Squared Errors", **kwargs)
+    if return_stats:
+        return N_CLUSTERS, WSS, TIME, N_ITER
     return N_CLUSTERS, WSS
 
 
@@ -1003,7 +2073,7 @@ def apply_MDS(data, n_components=2, random_state=None):
     return mds_data
 
 
-def apply_TSNE(data, n_components=2, perplexity=50, random_state=None):
+def apply_TSNE(data, n_components=2, perplexity=50, random_state=None, condensed=False, dtype=None):
     """
     apply t-distributed stochastic neighbor embedding on data.
 
@@ -1012,13 +2082,27 @@ def apply_TSNE(data, n_components=2, perplexity=50, random_state=None):
         n_components (int): TSNE number of components
         perplexity (int): TSNE perplexity
         random_state (None, int): Determines the random number generator
+        condensed (bool): data contains condensed distance matrices with shape
+          (length, N*(N-1)/2). They are scaled by sqrt(2) so that Euclidean
+          distances between samples match those of square distance matrices.
+        dtype (None, dtype):
+          | compute data type
+          | None: np.float64 for float16 data, otherwise data type of data
+          | np.float32: halves memory usage of TSNE input
 
     Returns:
         tsne_data (array)
             tsne transformed data
     """
-    nsamples, nx, ny = np.array(data).shape
-    data_reshaped = np.array(data).reshape((nsamples, nx*ny))
+    data = np.asarray(data)
+    if dtype is None:
+        dtype = np.float64 if data.dtype == np.float16 else data.dtype
+    data = data.astype(_HELP_np_dtype(dtype), copy=False)
+    if condensed:
+        data_reshaped = np.sqrt(2).astype(data.dtype)*data
+    else:
+        nsamples, nx, ny = data.shape
+        data_reshaped = data.reshape((nsamples, nx*ny))
     tsne_data = TSNE(n_components=n_components, perplexity=perplexity, random_state=random_state).fit_transform(data_reshaped)
     return tsne_data
 
@@ -1278,9 +2362,7 @@ def get_cluster_targets(cluster_data_n10, cluster_data_n30, score_file, prec=3,
 
     # get center distances d[i] = n10_center - n30_center[i]
     size = len(cluster_data_n30.centers)
-    D = np.zeros((size))
-    for i in range(size):
-        D[i] = np.linalg.norm(n10_center-cluster_data_n30.centers[i])
+    D = np.linalg.norm((cluster_data_n30.centers-n10_center).reshape((size, -1)), axis=1)
 
     # rank center distances (low to high)
     n30_dist, n30_targets = _misc.get_ranked_array(D, reverse=True, verbose=False)
@@ -1294,6 +2376,123 @@ def get_cluster_targets(cluster_data_n10, cluster_data_n30, score_file, prec=3,
             _misc.cprint(f"{n30_targets[ndx]:>3}   {n30_dist[ndx]:>6}")
     return (n10_targets, n30_targets, n30_dist)
 
+
+def build_conformation_index(h5_file, save_as="conformation_index.h5", n_lists=None, n_components=None,
+                             HDF_group="/distance_matrices", sss=[None, None, None], verbose=True, **kwargs):
+    """
+    Build a persistent approximate nearest-neighbor index (inverted file, IVF)
+    over the distance matrices of a h5 file.
+
+    | 1) optional: fit a PCA projection to a random sample of frames
+    | 2) fit a coarse quantizer (KMeans with n_lists centroids) to the sample
+    | 3) stream all frames in blocks, assign each frame to the list of its
+    |    closest centroid and save the (projected) frames in the index file
+
+    Distances are Euclidean distances between the (projected) flattened distance
+    matrices. Condensed distance matrices are scaled by sqrt(2), i.e. distances
+    are the same as for square distance matrices. Without PCA the distances are
+    exact, with PCA they are approximated in the projected space.
+
+    Args:
+        h5_file (str): path to h5 file containing distance matrices (see save_h5())
+        save_as (str): path of index file
+        n_lists (None, int):
+          | number of inverted lists (coarse centroids)
+          | None: sqrt(n_frames)
+        n_components (None, int):
+          | None: index flattened distance matrices
+          | int: index PCA projection of flattened distance matrices with n_components
+        HDF_group (str): Hierarchical Data Format group
+        sss (list):
+          | [start, stop, step] indices of <h5_file> data
+          | start (None, int): start index
+          | stop (None, int): stop index
+          | step (None, int): step size
+        verbose (bool)
+
+    Keyword Args:
+        start (None, int): start index
+        stop (None, int): stop index
+        step (None, int): step size
+        n_samples (None, int):
+          | number of randomly sampled frames used to fit PCA and coarse quantizer
+          | None: max(10000, 40*n_lists)
+        block_size (int): number of frames which are read and inserted per block
+        random_state (None, int): random state of sampling, PCA and KMeans
+
+    Returns:
+        index (CONFORMATION_INDEX)
+    """
+    default = {"start": sss[0],
+               "stop": sss[1],
+               "step": sss[2],
+               "n_samples": None,
+               "block_size": 1000,
+               "random_state": None}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    if _misc.get_extension(h5_file) != ".h5":
+        h5_file += ".h5"
+    if _misc.get_extension(save_as) != ".h5":
+        save_as += ".h5"
+    condensed = is_condensed_h5(h5_file, HDF_group)
+    rng = np.random.default_rng(cfg.random_state)
+    sss = [cfg.start, cfg.stop, cfg.step]
+
+    # fit projection and coarse quantizer to random sample
+    with h5py.File(h5_file, "r") as handle:
+        dset = handle[HDF_group]
+        frames = range(len(dset))[slice(*sss)]
+        size = int(np.prod(dset.shape[1:]))
+        if n_lists is None:
+            n_lists = int(max(1, np.sqrt(len(frames))))
+        n_samples = max(10000, 40*n_lists) if cfg.n_samples is None else cfg.n_samples
+        sample = np.sort(rng.choice(len(frames), size=min(max(n_samples, n_lists), len(frames)), replace=False))
+        sample = dset[[frames[i] for i in sample]].reshape((len(sample), size)).astype(np.float64)
+    if condensed:
+        sample *= np.sqrt(2)
+    if n_components is None:
+        mean, components = None, None
+    else:
+        pca = PCA(n_components=n_components, random_state=int(rng.integers(2**31))).fit(sample)
+        mean, components = pca.mean_, pca.components_
+        sample = (sample-mean) @ components.T
+    centroids = KMeans(n_clusters=n_lists, n_init=1, random_state=int(rng.integers(2**31))).fit(sample).cluster_centers_
+    del sample
+
+    # insert all frames
+    index = CONFORMATION_INDEX(centroids, size=size, condensed=condensed, mean=mean, components=components,
+                               index_file=save_as)
+    for ndx, block in tqdm(_HELP_iter_DM_blocks(h5_file, sss=sss, block_size=cfg.block_size, HDF_group=HDF_group),
+                           total=int(np.ceil(len(frames)/cfg.block_size)), disable=not verbose):
+        index.add(block, frames=np.asarray(frames[ndx:ndx+len(block)]))
+    if verbose:
+        print(f"Saved index file as: {os.path.realpath(save_as)}")
+    return index
+
+
+def load_conformation_index(index_file):
+    """
+    Load index file saved by build_conformation_index() or CONFORMATION_INDEX.
+
+    Args:
+        index_file (str): path to index file
+
+    Returns:
+        index (CONFORMATION_INDEX)
+    """
+    with h5py.File(index_file, "r") as handle:
+        mean = handle["mean"][()] if "mean" in handle else None
+        components = handle["components"][()] if "components" in handle else None
+        index = CONFORMATION_INDEX(handle["centroids"][()], size=int(handle.attrs["size"]),
+                                   condensed=bool(handle.attrs["condensed"]), mean=mean, components=components)
+        index._vectors = [handle["vectors"][()]]
+        index._frames = [handle["frames"][()]]
+        index._lists = [handle["lists"][()]]
+        index.radii = handle["radii"][()]
+    index.index_file = index_file
+    return index
+
 ################################################################################
 ################################################################################
 ### WF functions
@@ -1406,7 +2605,8 @@ def WF_print_cluster_scores(cluster_data, cluster_scores, targets=[None], save_a
 
 
 class CLUSTER_DATA(object):
-    def __init__(self, centers=None, counts=None, labels=None, noise_label=None, inertia=None, wss_data=None, compact_score=None):
+    def __init__(self, centers=None, counts=None, labels=None, noise_label=None, inertia=None, wss_data=None, compact_score=None,
+                 n_iter=None):
         """
         saves cluster data as object
 
@@ -1418,6 +2618,7 @@ class CLUSTER_DATA(object):
             inertia (None, float): intertia
             wss_data (None, WSS_DATA)
             compact_score (None, array): mean values of Squared Errors for each cluster ~ can be interpreted as a compactness score
+            n_iter (None, int): number of iterations of the clustering algorithm
         """
         self.centers = np.array(centers)
         self.counts = np.array(counts)
@@ -1426,6 +2627,7 @@ class CLUSTER_DATA(object):
         self.inertia = inertia
         self.wss_data = wss_data
         self.compact_score = np.array(compact_score)
+        self.n_iter = n_iter
         return
 
 
@@ -1582,3 +2784,208 @@ class WSS_DATA_obj(object):
         self.se_mean = np.array(se_mean)
         self.se_std = np.array(se_std)
         return
+
+
+class CONFORMATION_INDEX(object):
+    def __init__(self, centroids, size, condensed=False, mean=None, components=None, index_file=None):
+        """
+        Approximate nearest-neighbor index (inverted file, IVF) over conformations,
+        represented by their (projected) flattened distance matrices. Use
+        build_conformation_index() to build an index from a h5 file and
+        load_conformation_index() to load a saved index.
+
+        Args:
+            centroids (array): coarse centroids with shape (n_lists, dim)
+            size (int): size of flattened distance matrices of index data
+            condensed (bool): index data contains condensed distance matrices
+            mean (None, array): PCA mean with shape (size,)
+            components (None, array): PCA components with shape (dim, size)
+            index_file (None, str):
+              | None: keep index in memory
+              | str: create index file, inserted frames are appended immediately
+
+        .. Note:: Distance matrices passed to add(), query() or query_radius()
+          are either square distance matrices with shape (N, N) or (n, N, N),
+          or have the same (flattened or condensed) format as the index data.
+        """
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.size = size
+        self.condensed = condensed
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.components = None if components is None else np.asarray(components, dtype=np.float64)
+        self.radii = np.zeros(len(self.centroids))
+        self.index_file = index_file
+        dim = self.centroids.shape[1]
+        self._vectors = [np.empty((0, dim), dtype=np.float32)]
+        self._frames = [np.empty(0, dtype=np.int64)]
+        self._lists = [np.empty(0, dtype=np.int32)]
+        self._order = None    # frames sorted by list, see _HELP_sort_lists()
+        self._offsets = None
+
+        if index_file is not None:
+            with h5py.File(index_file, "w") as handle:
+                handle.attrs["size"] = size
+                handle.attrs["condensed"] = condensed
+                handle["centroids"] = self.centroids
+                handle["radii"] = self.radii
+                if self.mean is not None:
+                    handle["mean"] = self.mean
+                    handle["components"] = self.components
+                handle.create_dataset("vectors", shape=(0, dim), maxshape=(None, dim), dtype=np.float32,
+                                      chunks=(max(1, min(1024, 2**20//(4*dim))), dim))
+                handle.create_dataset("frames", shape=(0,), maxshape=(None,), dtype=np.int64, chunks=(1024,))
+                handle.create_dataset("lists", shape=(0,), maxshape=(None,), dtype=np.int32, chunks=(1024,))
+        return
+
+    def __len__(self):
+        return sum(len(item) for item in self._frames)
+
+    def _HELP_vectors(self, DM):
+        """
+        Convert distance matrices into (projected) index vectors with shape (n, dim).
+        """
+        DM = np.asarray(DM, dtype=np.float64)
+        if DM.shape[-1] != self.size:
+            DM = DM.reshape((-1,) + DM.shape[-2:])
+            DM = _HELP_condense(DM) if self.condensed else DM.reshape((len(DM), -1))
+        DM = DM.reshape((-1, self.size))
+        if self.condensed:
+            DM = np.sqrt(2)*DM
+        if self.components is not None:
+            DM = (DM-self.mean) @ self.components.T
+        return DM
+
+    def _HELP_is_single(self, DM):
+        """
+        Returns True if DM is a single distance matrix.
+        """
+        shape = np.shape(DM)
+        return len(shape) == 1 or (len(shape) == 2 and shape[-1] != self.size)
+
+    def _HELP_sort_lists(self):
+        """
+        Consolidate inserted frames and sort them by list.
+        """
+        if self._order is not None:
+            return
+        if len(self._vectors) > 1:
+            self._vectors = [np.concatenate(self._vectors)]
+            self._frames = [np.concatenate(self._frames)]
+            self._lists = [np.concatenate(self._lists)]
+        self._order = np.argsort(self._lists[0], kind="stable")
+        self._offsets = np.searchsorted(self._lists[0][self._order], np.arange(len(self.centroids)+1))
+        return
+
+    def _HELP_members(self, LISTS):
+        """
+        Returns index positions of all frames in LISTS.
+        """
+        if len(LISTS) == 0:
+            return np.empty(0, dtype=int)
+        return np.concatenate([self._order[self._offsets[l]:self._offsets[l+1]] for l in LISTS])
+
+    def add(self, DM, frames=None):
+        """
+        Insert distance matrices into index (and append them to the index file).
+
+        Args:
+            DM (array): distance matrices
+            frames (None, array):
+              | frame ids of DM
+              | None: continue numbering after the largest frame id of the index
+        """
+        V = self._HELP_vectors(DM)
+        if frames is None:
+            start = max([item.max()+1 for item in self._frames if len(item) > 0], default=0)
+            frames = np.arange(start, start+len(V))
+        frames = np.asarray(frames, dtype=np.int64).reshape(-1)
+        if len(frames) != len(V):
+            raise ValueError("frames must have the same length as DM.")
+
+        V = V.astype(np.float32)
+        D = np.sum(self.centroids**2, axis=1)[None] - 2*V.astype(np.float64) @ self.centroids.T
+        L = np.argmin(D, axis=1).astype(np.int32)
+        np.maximum.at(self.radii, L, np.sqrt(np.sum((V-self.centroids[L])**2, axis=1)))
+        self._vectors.append(V)
+        self._frames.append(frames)
+        self._lists.append(L)
+        self._order = None
+
+        if self.index_file is not None:
+            with h5py.File(self.index_file, "r+") as handle:
+                n = len(handle["frames"])
+                for key, value in zip(["vectors", "frames", "lists"], [V, frames, L]):
+                    handle[key].resize(n+len(V), axis=0)
+                    handle[key][n:] = value
+                handle["radii"][...] = self.radii
+        return
+
+    def query(self, DM, k=10, n_probe=8):
+        """
+        Find the k nearest frames of distance matrices.
+
+        Args:
+            DM (array): distance matrix or distance matrices of query conformations
+            k (int): number of nearest frames
+            n_probe (int): number of inverted lists which are searched. The lists
+              closest to the query are searched first. Larger values are more
+              accurate but slower (n_probe >= n_lists: exact search).
+
+        Returns:
+            FRAMES (array)
+                frame ids of the k nearest frames with shape (n, k) or (k,) for a
+                single distance matrix (padded with -1 if the index contains
+                less than k frames)
+            DIST (array)
+                distances of the k nearest frames (padded with inf)
+        """
+        self._HELP_sort_lists()
+        Q = self._HELP_vectors(DM)
+        V, F = self._vectors[0], self._frames[0]
+        counts = np.diff(self._offsets)
+        FRAMES = np.full((len(Q), k), -1, dtype=np.int64)
+        DIST = np.full((len(Q), k), np.inf)
+        for i, q in enumerate(Q):
+            LISTS = np.argsort(np.sum((self.centroids-q)**2, axis=1), kind="stable")
+            n = max(n_probe, int(np.searchsorted(np.cumsum(counts[LISTS]), k))+1)
+            C = self._HELP_members(LISTS[:n])
+            D = np.sqrt(np.sum((V[C]-q)**2, axis=1))
+            ndx = np.argsort(D, kind="stable")[:k]
+            FRAMES[i, :len(ndx)] = F[C[ndx]]
+            DIST[i, :len(ndx)] = D[ndx]
+        if self._HELP_is_single(DM):
+            return FRAMES[0], DIST[0]
+        return FRAMES, DIST
+
+    def query_radius(self, DM, radius):
+        """
+        Find all frames within radius of distance matrices. Lists which cannot
+        contain frames within radius (triangle inequality) are skipped, i.e.
+        the search is exact in the index space.
+
+        Args:
+            DM (array): distance matrix or distance matrices of query conformations
+            radius (float): search radius
+
+        Returns:
+            FRAMES (list, array)
+                frame ids within radius sorted by distance, list of arrays or
+                array for a single distance matrix
+            DIST (list, array)
+                distances of frames within radius
+        """
+        self._HELP_sort_lists()
+        Q = self._HELP_vectors(DM)
+        V, F = self._vectors[0], self._frames[0]
+        FRAMES, DIST = [], []
+        for q in Q:
+            LISTS = np.flatnonzero(np.sqrt(np.sum((self.centroids-q)**2, axis=1)) - self.radii <= radius)
+            C = self._HELP_members(LISTS)
+            D = np.sqrt(np.sum((V[C]-q)**2, axis=1))
+            ndx = np.flatnonzero(D <= radius)
+            ndx = ndx[np.argsort(D[ndx], kind="stable")]
+            FRAMES.append(F[C[ndx]])
+            DIST.append(D[ndx])
+        if self._HELP_is_single(DM):
+            return FRAMES[0], DIST[0]
+        return FRAMES, DIST
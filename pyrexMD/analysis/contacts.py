@@ -42,12 +42,83 @@ import matplotlib
 import matplotlib.pyplot as plt
 import seaborn as sns
 import MDAnalysis as mda
-from MDAnalysis.analysis import contacts as _contacts, distances as _distances
+from MDAnalysis.analysis import contacts as _contacts
 import operator
 import os
 from tqdm.notebook import tqdm
 
 
+def _HELP_shadow_map(positions, pairs, d_cutoff=6.0, shadow_radius=1.0,
+                     shadow_radius_bonded=0.5, bond_cutoff=2.0, block_size=100000):
+    """
+    Shadow map test of atom pairs: a light source is placed at the center of
+    atom i and every other atom k closer to i than atom j casts a shadow. Atom
+    j is shadowed if its sphere (shadow_radius) lies completely in the shadow
+    of any sphere k. A pair is a shadow contact if j is not shadowed by the
+    light source at i and i is not shadowed by the light source at j.
+
+    Args:
+        positions (array): atom positions with shape (N, 3)
+        pairs (array): atom pairs (i, j) with shape (n_pairs, 2) and d_ij <= d_cutoff
+        d_cutoff (float): cutoff distance, i.e. only atoms within d_cutoff can cast shadows
+        shadow_radius (float): shadow radius of atoms
+        shadow_radius_bonded (float): shadow radius of atoms bonded to i or j
+        bond_cutoff (float): atoms with distance <= bond_cutoff are treated as bonded
+        block_size (int): number of (pair, atom) tests per block
+
+    Returns:
+        CONTACT (array)
+            bool array with length n_pairs, True if pair is a shadow contact
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    N = len(positions)
+
+    # neighbor lists in CSR format
+    NB = mda.lib.distances.self_capped_distance(positions, max_cutoff=d_cutoff, return_distances=False)
+    NB = np.concatenate([NB, NB[:, ::-1]]).reshape((-1, 2))
+    NB = NB[np.lexsort((NB[:, 1], NB[:, 0]))]
+    NB_count = np.bincount(NB[:, 0], minlength=N)
+    NB_start = np.concatenate([[0], np.cumsum(NB_count)[:-1]])
+
+    def __shadowed(I, J):
+        """
+        Returns True for atoms J which are completely shadowed with light source at atoms I.
+        """
+        SHADOWED = np.zeros(len(I), dtype=bool)
+        # split pairs into blocks with at most block_size (pair, atom) tests
+        cum = np.cumsum(NB_count[I])
+        bounds = np.searchsorted(cum, np.arange(0, cum[-1] if len(cum) > 0 else 0, block_size), side="right")
+        bounds = np.unique(np.concatenate([[0], bounds, [len(I)]]))
+        for p0, p1 in zip(bounds[:-1], bounds[1:]):
+            i, j = I[p0:p1], J[p0:p1]
+            n = NB_count[i]
+            P = np.repeat(np.arange(p0, p1), n)     # pair index of each test
+            offset = np.arange(len(P)) - np.repeat(np.cumsum(n)-n, n)
+            K = NB[np.repeat(NB_start[i], n) + offset, 1]
+            I_, J_ = I[P], J[P]
+
+            v_ij = positions[J_] - positions[I_]
+            v_ik = positions[K] - positions[I_]
+            d_ij = np.linalg.norm(v_ij, axis=1)
+            d_ik = np.linalg.norm(v_ik, axis=1)
+            d_jk = np.linalg.norm(positions[K] - positions[J_], axis=1)
+            r_k = np.where((d_ik <= bond_cutoff) | (d_jk <= bond_cutoff), shadow_radius_bonded, shadow_radius)
+
+            valid = (K != J_) & (d_ik < d_ij) & (r_k < d_ik)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                cos_alpha = np.einsum("ij,ij->i", v_ij, v_ik)/(d_ij*d_ik)
+                alpha = np.arccos(np.clip(cos_alpha, -1, 1))
+                theta_k = np.arcsin(np.clip(r_k/d_ik, 0, 1))
+                theta_j = np.arcsin(np.clip(shadow_radius/d_ij, 0, 1))
+            shadowed = valid & (alpha + theta_j <= theta_k)
+            SHADOWED[p0:p1] = np.bincount(P[shadowed]-p0, minlength=p1-p0) > 0
+        return SHADOWED
+
+    pairs = np.asarray(pairs, dtype=int).reshape((-1, 2))
+    I, J = pairs[:, 0], pairs[:, 1]
+    return ~__shadowed(I, J) & ~__shadowed(J, I)
+
+
 def get_Native_Contacts(ref, d_cutoff=6.0, sel="protein", **kwargs):
     """
     Get list of unique RES pairs and list of detailed RES pairs with native contacts.
@@ -62,8 +133,14 @@ def get_Native_Contacts(ref, d_cutoff=6.0, sel="protein", **kwargs):
 
     Keyword Args:
         method (str):
-          | '1' or 'Contact_Matrix': mda.contact_matrix() with d_cutoff
-          | '2' or 'Shadow_Map' #TODO
+          | '1' or 'Contact_Matrix': sparse contact matrix with d_cutoff, i.e. only
+            atom pairs within d_cutoff are evaluated (neighbor search)
+          | '2' or 'Shadow_Map': contacts within d_cutoff which are not shadowed
+            by other atoms (see _HELP_shadow_map()), i.e. a light source at
+            atom i must illuminate atom j and vice versa.
+        shadow_radius (float): shadow radius of atoms (method 'Shadow_Map'). Defaults to 1.0 (Angstrom).
+        shadow_radius_bonded (float): shadow radius of atoms bonded to the
+          contact atoms (method 'Shadow_Map'). Defaults to 0.5 (Angstrom).
         norm (bool): apply topology.norm_universe()
         ignh (bool): ignore hydrogen
         save_as (None, str):
@@ -76,8 +153,13 @@ def get_Native_Contacts(ref, d_cutoff=6.0, sel="protein", **kwargs):
             native contacts with unique RES pairs
         NC_d (list)
             detailed list of NCs containing (RES pairs), (ATOM numbers), (ATOM names)
+
+    .. Hint:: NC can be used directly to calculate QValues of the native
+      contacts for a trajectory, e.g. with get_QBias(mobile, bc=NC).
     """
     default = {"method": "1",
+               "shadow_radius": 1.0,
+               "shadow_radius_bonded": 0.5,
                "norm": True,
                "ignh": True,
                "save_as": None}
@@ -101,21 +183,32 @@ def get_Native_Contacts(ref, d_cutoff=6.0, sel="protein", **kwargs):
     NC = []     # list with unique NC pairs
     NC_d = []   # detailed list with NCs containing (RES pairs), (ATOM pairs), (NAME pairs)
 
-    if cfg.method in ['1', 'Contact_Matrix', 'contact_matrix']:
-        RES = a.resids
-        IDS = a.ids
-        NAMES = a.names
-
-        CM = _distances.contact_matrix(a.positions, cutoff=d_cutoff)
-        for i in range(len(CM)):
-            for j in range(i + 1, len(CM)):  # no double count/reduce computing time
-                if RES[j] - RES[i] > 3 and CM[i][j] == True and (RES[i], RES[j]) not in NC:
-                    NC.append((RES[i], RES[j]))
-                    NC_d.append([(RES[i], RES[j]), (IDS[i], IDS[j]), (NAMES[i], NAMES[j])])
-
-    elif cfg.method in ['2', 'Shadow_Map', 'shadow_map']:
-        # TODO method 2: SHADOWMAP
-        pass
+    if cfg.method not in ['1', 'Contact_Matrix', 'contact_matrix', '2', 'Shadow_Map', 'shadow_map']:
+        raise ValueError("method must be either '1'/'Contact_Matrix' or '2'/'Shadow_Map'")
+    RES = a.resids
+    IDS = a.ids
+    NAMES = a.names
+
+    # sparse contacts: atom pairs (i < j) within d_cutoff via neighbor search
+    pairs = mda.lib.distances.self_capped_distance(a.positions, max_cutoff=d_cutoff, return_distances=False)
+    pairs = np.sort(pairs.reshape((-1, 2)), axis=1)
+    I, J = pairs[:, 0], pairs[:, 1]
+    mask = RES[J] - RES[I] > 3
+    I, J = I[mask], J[mask]
+
+    if cfg.method in ['2', 'Shadow_Map', 'shadow_map']:
+        mask = _HELP_shadow_map(a.positions, np.stack([I, J], axis=1), d_cutoff=d_cutoff,
+                                shadow_radius=cfg.shadow_radius,
+                                shadow_radius_bonded=cfg.shadow_radius_bonded)
+        I, J = I[mask], J[mask]
+
+    # unique RES pairs, each represented by its first atom pair (row-major order)
+    order = np.lexsort((J, I))
+    I, J = I[order], J[order]
+    _, first = np.unique(np.stack([RES[I], RES[J]], axis=1), axis=0, return_index=True)
+    for i, j in zip(I[first], J[first]):
+        NC.append((RES[i], RES[j]))
+        NC_d.append([(RES[i], RES[j]), (IDS[i], IDS[j]), (NAMES[i], NAMES[j])])
 
     # sort
     NC = sorted(NC)
@@ -129,10 +222,11 @@ def get_Native_Contacts(ref, d_cutoff=6.0, sel="protein", **kwargs):
         else:
             # hardcoded nucleic selection
             resid, resname, id, name = _top.parsePDB(u.filename, sel="name N1 or name N3", norm=cfg.norm)
+        resid2id = dict(zip(resid[::-1], id[::-1]))  # reversed: keep first atom id of each resid
         with open(cfg.save_as, "w") as fout:
             fout.write("#RESi\tRESj\tATOMi\tATOMj\n")
             for IJ in NC:
-                fout.write(f"{IJ[0]}\t{IJ[1]}\t{id[resid.index(IJ[0])]}\t{id[resid.index(IJ[1])]}\n")
+                fout.write(f"{IJ[0]}\t{IJ[1]}\t{resid2id[IJ[0]]}\t{resid2id[IJ[1]]}\n")
         _misc.cprint(f"Saved file as: {cfg.save_as}")
     return(NC, NC_d)
 
@@ -166,6 +260,9 @@ def get_NC_distances(mobile, ref, sss=[None, None, None], sel="protein", method=
         norm (bool): apply topology.norm_universe()
         ignh (bool): ignore hydrogen (mass < 1.2)
         save_as (None, str): save native contacts logfile as...
+        full_DM (bool):
+          | True: calculate and return full distance matrices
+          | False: calculate and return only the distances of items in NC (default)
 
     Returns:
         NC (list)
@@ -173,14 +270,16 @@ def get_NC_distances(mobile, ref, sss=[None, None, None], sel="protein", method=
         NC_dist (list)
             native contact distances ~ distances of items in NC
         DM (array)
-            array of distance matrices
+          | array of native contact distances with shape (n_frames, len(NC))
+          | array of distance matrices (if full_DM is True)
     """
     default = {"start": sss[0],
                "stop": sss[1],
                "step": sss[2],
                "norm": True,
                "ignh": True,
-               "save_as": None}
+               "save_as": None,
+               "full_DM": False}
     cfg = _misc.CONFIG(default, **kwargs)
     if "save_as" in kwargs:
         del kwargs["save_as"]
@@ -201,21 +300,27 @@ def get_NC_distances(mobile, ref, sss=[None, None, None], sel="protein", method=
     NC, NC_d = get_Native_Contacts(ref, sel=selid2, d_cutoff=d_cutoff,
                                    ignh=cfg.ignh, save_as=cfg.save_as)
 
-    if method.lower() == "shortest_distance":
-        DM = []
-        for ts in tqdm(mobile.trajectory[cfg.start:cfg.stop:cfg.step], disable=not verbose):
-            SD, _ = _ana.get_shortest_RES_distances(mobile, sel=selid1)
-            DM.append(SD)
-    elif method.lower() == "contact_distance":
-        DM = _ana.get_Distance_Matrices(mobile, sel=selid1, sss=[cfg.start, cfg.stop, cfg.step])
-    else:
+    if method.lower() not in ["shortest_distance", "contact_distance"]:
         raise ValueError("method must be either 'shortest_distance' or 'contact_distance'")
+    if not cfg.full_DM:
+        # get native contact distances
+        DM = _ana.get_Contact_Pair_Distances(mobile, NC, sel=selid1, sss=[cfg.start, cfg.stop, cfg.step],
+                                             method=method, ignh=cfg.ignh, verbose=verbose)
+        NC_dist = list(DM.flatten())
+    else:
+        if method.lower() == "shortest_distance":
+            DM = []
+            for ts in tqdm(mobile.trajectory[cfg.start:cfg.stop:cfg.step], disable=not verbose):
+                SD, _ = _ana.get_shortest_RES_distances(mobile, sel=selid1, detailed=False)
+                DM.append(SD)
+        else:
+            DM = _ana.get_Distance_Matrices(mobile, sel=selid1, sss=[cfg.start, cfg.stop, cfg.step])
 
-    # get native contact distances
-    NC_dist = []
-    for dm in DM:
-        for item in NC:
-            NC_dist.append(dm[item[0]-1][item[1]-1])
+        # get native contact distances
+        NC_dist = []
+        for dm in DM:
+            for item in NC:
+                NC_dist.append(dm[item[0]-1][item[1]-1])
 
     if plot:
         _ana.plot_hist(NC_dist, **kwargs)
@@ -252,6 +357,9 @@ def get_BC_distances(u, bc, sss=[None, None, None], sel="protein", method="short
         norm (bool): apply topology.norm_universe()
         ignh (bool): ignore hydrogen (mass < 1.2)
         save_as (None, str): save native contacts logfile as...
+        full_DM (bool):
+          | True: calculate and return full distance matrices
+          | False: calculate and return only the distances of items in BC (default)
 
     Returns:
         BC (list)
@@ -259,7 +367,8 @@ def get_BC_distances(u, bc, sss=[None, None, None], sel="protein", method="short
         BC_dist (list)
             bias contact distances ~ distances of items in BC
         DM (array)
-            array of distance matrices
+          | array of bias contact distances with shape (n_frames, len(BC))
+          | array of distance matrices (if full_DM is True)
     """
     BC = bc
     default = {"start": sss[0],
@@ -267,7 +376,8 @@ def get_BC_distances(u, bc, sss=[None, None, None], sel="protein", method="short
                "step": sss[2],
                "norm": True,
                "ignh": True,
-               "save_as": None}
+               "save_as": None,
+               "full_DM": False}
     cfg = _misc.CONFIG(default, **kwargs)
     if "save_as" in kwargs:
         del kwargs["save_as"]
@@ -280,22 +390,28 @@ def get_BC_distances(u, bc, sss=[None, None, None], sel="protein", method="short
     # convert sel to selid
     selid = _top.sel2selid(u, sel=sel, norm=cfg.norm)
 
-    # get native contacts and distance matrices
-    if method == "shortest_distance":
-        DM = []
-        for ts in u.trajectory[cfg.start:cfg.stop:cfg.step]:
-            SD, _ = _ana.get_shortest_RES_distances(u, sel=selid)
-            DM.append(SD)
-    elif method == "contact_distance":
-        DM = _ana.get_Distance_Matrices(u, sel=selid, sss=[cfg.start, cfg.stop, cfg.step])
-    else:
+    if method not in ["shortest_distance", "contact_distance"]:
         raise ValueError("method must be either 'shortest_distance' or 'contact_distance'")
+    if not cfg.full_DM:
+        # get bias contact distances
+        DM = _ana.get_Contact_Pair_Distances(u, BC, sel=selid, sss=[cfg.start, cfg.stop, cfg.step],
+                                             method=method, ignh=cfg.ignh, verbose=False)
+        BC_dist = list(DM.flatten())
+    else:
+        # get distance matrices
+        if method == "shortest_distance":
+            DM = []
+            for ts in u.trajectory[cfg.start:cfg.stop:cfg.step]:
+                SD, _ = _ana.get_shortest_RES_distances(u, sel=selid, detailed=False)
+                DM.append(SD)
+        else:
+            DM = _ana.get_Distance_Matrices(u, sel=selid, sss=[cfg.start, cfg.stop, cfg.step])
 
-    # get native contact distances
-    BC_dist = []
-    for dm in DM:
-        for item in BC:
-            BC_dist.append(dm[item[0]-1][item[1]-1])
+        # get bias contact distances
+        BC_dist = []
+        for dm in DM:
+            for item in BC:
+                BC_dist.append(dm[item[0]-1][item[1]-1])
 
     if plot:
         _ana.plot_hist(BC_dist, **kwargs)
@@ -742,6 +858,7 @@ def plot_DCA_TPR(ref, DCA_fin, n_DCA, d_cutoff=6.0, sel='protein', pdbid='pdbid'
     return fig, ax
 
 
+@_misc.memoize()
 def get_QNative(mobile, ref, sel="protein and name CA", sss=[None, None, None],
                 d_cutoff=8.0, plot=True, verbose=True, **kwargs):
     """
@@ -781,6 +898,14 @@ def get_QNative(mobile, ref, sel="protein and name CA", sss=[None, None, None],
         lw (int): 1 (old default: 0)
         save_plot (bool)
         save_as (str): "QNative.png"
+        n_jobs (int):
+          | number of worker processes
+          | 1: serial analysis (default)
+          | -1: use all available cores
+          | >1: split frame range into n_jobs chunks which are analyzed in
+            parallel and stitched back in frame order
+        backend (str): "multiprocessing"
+        memoize (bool): memoize result on disk, see misc.memoize(). Defaults to False.
 
     .. Note :: sel (arg) is ignored if sel1 or sel2 (kwargs) are passed.
 
@@ -802,7 +927,9 @@ def get_QNative(mobile, ref, sel="protein and name CA", sss=[None, None, None],
                "ms": 4,
                "lw": 1,          # old default: 0
                "save_plot": False,
-               "save_as": "QNative.png"}
+               "save_as": "QNative.png",
+               "n_jobs": 1,
+               "backend": "multiprocessing"}
     cfg = _misc.CONFIG(default, **kwargs)
     if cfg.sel1 is None and cfg.sel2 is None:
         cfg.sel1 = sel
@@ -812,15 +939,25 @@ def get_QNative(mobile, ref, sel="protein and name CA", sss=[None, None, None],
     #####################################################################
     _top.norm_and_align_universe(mobile, ref)
 
-    ref1 = ref.select_atoms(cfg.sel1)  # reference group 1 in reference conformation
-    ref2 = ref.select_atoms(cfg.sel2)  # reference group 2 in reference conformation
+    if cfg.n_jobs != 1:
+        cfg = _ana._HELP_sss_None2int(mobile, cfg)
+        RESULTS = _ana._HELP_run_parallel(get_QNative, args=(mobile, ref),
+                                          kwargs={**kwargs, "sel1": cfg.sel1, "sel2": cfg.sel2, "d_cutoff": d_cutoff,
+                                                  "plot": False, "save_plot": False},
+                                          cfg=cfg, n_jobs=cfg.n_jobs, backend=cfg.backend, verbose=verbose)
+        FRAMES = np.concatenate([result[0] for result in RESULTS])
+        QNATIVE = np.concatenate([result[1] for result in RESULTS])
+
+    else:
+        ref1 = ref.select_atoms(cfg.sel1)  # reference group 1 in reference conformation
+        ref2 = ref.select_atoms(cfg.sel2)  # reference group 2 in reference conformation
 
-    results = _contacts.Contacts(mobile, select=(cfg.sel1, cfg.sel2), refgroup=(ref1, ref2),
-                                 radius=d_cutoff, method=cfg.method)
+        results = _contacts.Contacts(mobile, select=(cfg.sel1, cfg.sel2), refgroup=(ref1, ref2),
+                                     radius=d_cutoff, method=cfg.method)
 
-    results.run(start=cfg.start, stop=cfg.stop, step=cfg.step, verbose=verbose)
-    FRAMES = results.timeseries[:, 0]
-    QNATIVE = results.timeseries[:, 1]
+        results.run(start=cfg.start, stop=cfg.stop, step=cfg.step, verbose=verbose)
+        FRAMES = results.timeseries[:, 0]
+        QNATIVE = results.timeseries[:, 1]
 
     if plot:
         _misc.cprint(f"average QNative value: {round(np.mean(QNATIVE), 3)}", "blue")
@@ -875,6 +1012,11 @@ def get_QBias(mobile, bc, sss=[None, None, None], d_cutoff=8.0,
           | sets norm of QBIAS. Default is False.
           | True: includes selfcontacts on main diagonal of CM (max count > len(bc))
           | False: ignores selfcontacts on main diagonal of CM (max count == len(bc))
+        full_CM (bool):
+          | True: calculate full distance matrices and return full contact matrices
+          | False: calculate only bias contact distances (default)
+        cache (bool, str): read coordinates via the on-disk coordinate cache, see
+          topology.get_cached_coordinates() (False: disabled, default)
         softcut (bool): Increase QBias if np.isclose(d, d_cutoff, atol=softcut_tol) is True. Defaults to True.
         softcut_tol (float): Softcut tolerance. Defatuls to 0.2 (Angstrom).
         softcut_inc: Increase QBias by this value if softcut applies. Defaults to 0.25.
@@ -897,18 +1039,13 @@ def get_QBias(mobile, bc, sss=[None, None, None], d_cutoff=8.0,
         QBIAS (array)
             array with fraction of formed bias contacts
         CM (array)
-            array with contact matrices
+          | array with formed bias contacts with shape (n_frames, len(bc))
+          | array with contact matrices (if full_CM is True)
     """
-    def __HELP_softcut(d, d0, tol):
-        """
-        Returns value between 0 and 1, based on difference between d-d0 and d0+tol
-        """
-        if np.isclose(d, d0, atol=tol):
-            return round(1.0-abs(d-d0)/tol, 3)
-        return 0
-
     default = {"dtype": bool,
                "include_selfcontacts": False,
+               "full_CM": False,
+               "cache": False,
                "softcut": True,
                "softcut_tol": 0.2,
                "softcut_inc": 0.25,
@@ -934,34 +1071,44 @@ def get_QBias(mobile, bc, sss=[None, None, None], d_cutoff=8.0,
 
     if norm:
         _top.norm_universe(mobile)
-        a = mobile.select_atoms(sel)
-
-    QBIAS = []  # QBias value (fraction of formed bias contacts)
-    #CM = []     # Contact Matrices
+    a = mobile.select_atoms(sel)
 
-    if verbose:
-        _misc.cprint("calculating distance matrices...")
-    DM = _ana.get_Distance_Matrices(mobile=mobile, sel=sel, sss=[cfg.start, cfg.stop, cfg.step], verbose=not cfg.disable)
-    CM = [(dm <= d_cutoff) for dm in DM]  # converts distance matrix to bool matrix -> use as contact matrix
+    # bias contacts as index arrays -> distances of all frames with shape (n_frames, n_bc)
+    BC_ndx = np.asarray(bc, dtype=int).reshape((-1, 2)) - 1
+    BC_i, BC_j = BC_ndx[:, 0], BC_ndx[:, 1]
+    if cfg.full_CM:
+        if verbose:
+            _misc.cprint("calculating distance matrices...")
+        DM = _ana.get_Distance_Matrices(mobile=mobile, sel=sel, sss=[cfg.start, cfg.stop, cfg.step], verbose=not cfg.disable)
+        CM = (DM <= d_cutoff)  # converts distance matrix to bool matrix -> use as contact matrix
+        D = DM[:, BC_i, BC_j]
+    else:
+        if verbose:
+            _misc.cprint("calculating bias contact distances...")
+        D = _ana.get_Contact_Pair_Distances(mobile, bc, sel=sel, sss=[cfg.start, cfg.stop, cfg.step], cache=cfg.cache, verbose=not cfg.disable)
 
     if verbose:
         _misc.cprint("calculating QBias...")
-    for i in tqdm(range(len(CM)), disable=cfg.disable):
-        count = 0
-        for item in bc:
-            if CM[i][item[0]-1, item[1]-1] == True:
-                count += 1
-            elif cfg.softcut is True:
-                d = DM[i][item[0]-1, item[1]-1]
-                if (d-d_cutoff <= cfg.softcut_tol):
-                    count += __HELP_softcut(d, d_cutoff, cfg.softcut_tol)
-                    CM[i][item[0]-1, item[1]-1] = True
-        if cfg.include_selfcontacts == False:
-            # norm based on used bias contacts
-            QBIAS.append(count/len(bc))
-        else:
-            # norm based on used bias contacts and selfcontacts
-            QBIAS.append((count+len(a))/(len(bc)+len(a)))
+    formed = (D <= d_cutoff)
+    COUNT = np.sum(formed, axis=1, dtype=float)
+    if cfg.softcut is True:
+        # softcut: value between 0 and 1, based on difference between d-d_cutoff and softcut_tol
+        soft = ~formed & (D-d_cutoff <= cfg.softcut_tol)
+        close = soft & np.isclose(D, d_cutoff, atol=cfg.softcut_tol)
+        COUNT += np.sum(np.where(close, np.round(1.0-np.abs(D-d_cutoff)/cfg.softcut_tol, 3), 0), axis=1)
+        if cfg.full_CM:
+            frame_ndx, bc_ndx = np.nonzero(soft)
+            CM[frame_ndx, BC_i[bc_ndx], BC_j[bc_ndx]] = True
+    else:
+        soft = np.zeros_like(formed)
+    if not cfg.full_CM:
+        CM = formed | soft
+    if cfg.include_selfcontacts == False:
+        # norm based on used bias contacts
+        QBIAS = COUNT/len(BC_ndx)
+    else:
+        # norm based on used bias contacts and selfcontacts
+        QBIAS = (COUNT+len(a))/(len(BC_ndx)+len(a))
     if prec is not None:
         QBIAS = [round(i, prec) for i in QBIAS]
     FRAMES = list(range(len(QBIAS)))
@@ -1020,6 +1167,11 @@ def get_QBias_TPFP(mobile, BC, NC, sss=[None, None, None], d_cutoff=8.0, prec=3,
           | sets norm of QBIAS. Default is False.
           | True: includes selfcontacts on main diagonal of CM (max count > len(bc))
           | False: ignores selfcontacts on main diagonal of CM (max count == len(bc))
+        full_CM (bool):
+          | True: calculate full distance matrices and return full contact matrices
+          | False: calculate only bias contact distances (default)
+        cache (bool, str): read coordinates via the on-disk coordinate cache, see
+          topology.get_cached_coordinates() (False: disabled, default)
         start (None, int): start frame
         stop (None, int): stop frame
         step (None, int): step size
@@ -1037,10 +1189,13 @@ def get_QBias_TPFP(mobile, BC, NC, sss=[None, None, None], d_cutoff=8.0, prec=3,
         FP (array)
             array with Qvalue of false positive bias contacts
         CM (array)
-            array with distance matrices
+          | array with formed bias contacts with shape (n_frames, len(BC))
+          | array with contact matrices (if full_CM is True)
     """
     default = {"dtype": bool,
                "include_selfcontacts": False,
+               "full_CM": False,
+               "cache": False,
                "start": sss[0],
                "stop": sss[1],
                "step": sss[2],
@@ -1066,43 +1221,45 @@ def get_QBias_TPFP(mobile, BC, NC, sss=[None, None, None], d_cutoff=8.0, prec=3,
     if norm:
         _top.norm_universe(mobile)
 
-    CM = []  # Contact Matrices
-    TP = []  # Qvalue of true positive bias contacts (fraction of formed contacts)
-    FP = []  # Qvalue of false positive bias contacts (fraction of formed contacts)
-    len_BC_TP = sum([True for item in BC if item in NC])
-    len_BC_FP = sum([True for item in BC if item not in NC])
+    # bias contacts as index arrays and native mask (set lookup instead of list lookup)
+    NC_set = set(tuple(int(x) for x in item) for item in NC)
+    BC_ndx = np.asarray(BC, dtype=int).reshape((-1, 2))
+    is_native = np.array([tuple(item) in NC_set for item in BC_ndx.tolist()], dtype=bool)
+    BC_i, BC_j = BC_ndx[:, 0]-1, BC_ndx[:, 1]-1
+    len_BC_TP = np.sum(is_native)
+    len_BC_FP = np.sum(~is_native)
     TPR = round(100*(1-len_BC_FP/len_BC_TP), 2)
     if verbose:
         _misc.cprint(f"The used bias contacts have a TPR of {TPR}% with {len_BC_TP} native contacts and {len_BC_FP} non-native contacts.", "blue")
 
-    # calculate distance matrices
-    if verbose:
-        _misc.cprint("Calculating Distance Matrices...")
-    DM = _ana.get_Distance_Matrices(mobile=mobile, sel=sel, sss=[cfg.start, cfg.stop, cfg.step], verbose=verbose)
-    for dm in DM:
-        cm = (dm <= d_cutoff)   # converts distance matrix to bool matrix -> use as contact matrix
-        CM.append(cm)
+    if cfg.full_CM:
+        # calculate distance matrices
+        if verbose:
+            _misc.cprint("Calculating Distance Matrices...")
+        DM = _ana.get_Distance_Matrices(mobile=mobile, sel=sel, sss=[cfg.start, cfg.stop, cfg.step], verbose=verbose)
+        CM = (DM <= d_cutoff)   # converts distance matrix to bool matrix -> use as contact matrix
+        formed = CM[:, BC_i, BC_j]   # shape (n_frames, n_bc)
+    else:
+        # calculate bias contact distances
+        if verbose:
+            _misc.cprint("Calculating Bias Contact Distances...")
+        D = _ana.get_Contact_Pair_Distances(mobile, BC_ndx, sel=sel, sss=[cfg.start, cfg.stop, cfg.step], cache=cfg.cache, verbose=verbose)
+        CM = formed = (D <= d_cutoff)   # shape (n_frames, n_bc)
 
     # calculate TP and FP
     if verbose:
         _misc.cprint("Calculating QValues...")
-    for cm in tqdm(CM, disable=cfg.disable):
-        count_TP = 0
-        count_FP = 0
-        for item in BC:
-            if item in NC and cm[item[0]-1, item[1]-1] == True:
-                count_TP += 1
-            elif item not in NC and cm[item[0]-1, item[1]-1] == True:
-                count_FP += 1
-
-        if cfg.include_selfcontacts == False:
-            # norm based on used bias contacts
-            TP.append(count_TP/len_BC_TP)
-            FP.append(count_FP/len_BC_FP)
-        else:
-            # norm based on used bias contacts and selfcontacts
-            TP.append((count_TP+len(cm))/(len_BC_TP+len(cm)))
-            FP.append(count_FP/len_BC_FP)
+    count_TP = np.sum(formed[:, is_native], axis=1)
+    count_FP = np.sum(formed[:, ~is_native], axis=1)
+    if cfg.include_selfcontacts == False:
+        # norm based on used bias contacts
+        TP = count_TP/len_BC_TP
+        FP = count_FP/len_BC_FP
+    else:
+        # norm based on used bias contacts and selfcontacts
+        n_atoms = mobile.select_atoms(sel).n_atoms
+        TP = (count_TP+n_atoms)/(len_BC_TP+n_atoms)
+        FP = count_FP/len_BC_FP
 
     if prec is not None:
         TP = [round(i, prec) for i in TP]
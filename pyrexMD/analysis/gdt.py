@@ -57,6 +57,7 @@ import pyrexMD.misc as _misc
 import pyrexMD.topology as _top
 import pyrexMD.analysis.analyze as _ana
 import MDAnalysis as mda
+from MDAnalysis.analysis import align as _align
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -178,6 +179,7 @@ def _HELP_sss_None2int(obj, cfg):
     return cfg
 
 
+@_misc.memoize()
 def GDT(mobile, ref, sel1="protein and name CA", sel2="protein and name CA",
         sss=[None, None, None], cutoff=[0.5, 10, 0.5], true_resids=True,
         verbose=True, **kwargs):
@@ -220,7 +222,24 @@ def GDT(mobile, ref, sel1="protein and name CA", sel2="protein and name CA",
         min_cutoff (float)
         max_cutoff (float)
         step_cutoff (float)
+        batched (bool):
+          | True: resolve and match selections once, read frames in blocks and
+            superimpose each block with a vectorized Kabsch algorithm
+          | False: align each frame via get_Pair_Distances() (reference implementation)
+        block_size (int): number of frames per block if batched == True
+        prefetch (int): number of blocks which are decoded ahead by a background
+          thread if batched == True (0: disabled, default)
+        cache (bool, str): read coordinates via the on-disk coordinate cache, see
+          topology.get_cached_coordinates() (False: disabled, default)
+        n_jobs (int):
+          | number of worker processes
+          | 1: serial analysis (default)
+          | -1: use all available cores
+          | >1: split frame range into n_jobs chunks which are analyzed in
+            parallel and stitched back in frame order
+        backend (str): "multiprocessing"
         disable (bool): disable progress bar
+        memoize (bool): memoize result on disk, see misc.memoize(). Defaults to False.
 
     Returns:
         GDT_percent (list)
@@ -248,12 +267,30 @@ def GDT(mobile, ref, sel1="protein and name CA", sel2="protein and name CA",
                "step": sss[2],
                "min_cutoff": cutoff[0],
                "max_cutoff": cutoff[1],
-               "step_cutoff": cutoff[2]}
+               "step_cutoff": cutoff[2],
+               "batched": True,
+               "block_size": 1000,
+               "prefetch": 0,
+               "cache": False,
+               "n_jobs": 1,
+               "backend": "multiprocessing"}
     cfg = _misc.CONFIG(default, **kwargs)
     cfg = _HELP_sss_None2int(mobile, cfg)  # convert None values of they keys sss, start, stop, step to integers
 
+    if cfg.n_jobs != 1:
+        RESULTS = _ana._HELP_run_parallel(GDT, args=(mobile, ref),
+                                          kwargs={**kwargs, "sel1": sel1, "sel2": sel2,
+                                                  "cutoff": cutoff, "true_resids": true_resids},
+                                          cfg=cfg, n_jobs=cfg.n_jobs, backend=cfg.backend, verbose=verbose)
+        GDT_percent = [item for result in RESULTS for item in result[0]]
+        GDT_resids = [item for result in RESULTS for item in result[1]]
+        GDT_cutoff = RESULTS[0][2]
+        RMSD = [item for result in RESULTS for item in result[3]]
+        FRAME = [item for result in RESULTS for item in result[4]]
+        return(GDT_percent, GDT_resids, GDT_cutoff, RMSD, FRAME)
+
     FRAME = list(np.arange(cfg.start, cfg.stop, cfg.step))
-    min_cutoff, max_cutoff, step_cutoff = cutoff[0], cutoff[1], cutoff[2]
+    min_cutoff, max_cutoff, step_cutoff = cfg.min_cutoff, cfg.max_cutoff, cfg.step_cutoff
     GDT_cutoff = list(np.arange(min_cutoff, max_cutoff+step_cutoff, step_cutoff))  # list with values 0.5 to 10 with steps of 0.5
     while GDT_cutoff[-1] > max_cutoff:
         GDT_cutoff = GDT_cutoff[: -1]
@@ -261,30 +298,67 @@ def GDT(mobile, ref, sel1="protein and name CA", sel2="protein and name CA",
     GDT_percent = []  # list: percent of RES (CA) for each cutoff condition
     RMSD = []  # list: tuples with (RMSD before alignment, RMSD after alignment)
 
-    # analyze trajectory
-    for ts in tqdm(mobile.trajectory[cfg.start: cfg.stop: cfg.step], disable=not verbose):
-        PAIR_DISTANCES, _RMSD, _resids_mobile, _resids_ref = get_Pair_Distances(
-            mobile, ref, sel1=sel1, sel2=sel2, weights=weights)
-        RMSD.append(_RMSD)
-
-        # get elements of PAIR_DISTANCES that are <= cutoff
-        PD_ndx = []
-        PD_percent = []
-        shift = min(mobile.atoms.select_atoms(sel1).residues.resids)
-        for cutoff in GDT_cutoff:
-            p, ndx = get_array_percent(PAIR_DISTANCES, cutoff)
-            if true_resids:
-                ndx += shift
-            PD_ndx.append(ndx[0])
-            PD_percent.append(p)
-
-        GDT_resids.append(PD_ndx)
-        GDT_percent.append(PD_percent)
-
-    # test if RES ids within output match
-    if np.any(_resids_mobile != _resids_ref):
+    if not cfg.batched:
+        # analyze trajectory (reference implementation: one alignment per frame)
+        for ts in tqdm(mobile.trajectory[cfg.start: cfg.stop: cfg.step], disable=not verbose):
+            PAIR_DISTANCES, _RMSD, _resids_mobile, _resids_ref = get_Pair_Distances(
+                mobile, ref, sel1=sel1, sel2=sel2, weights=weights)
+            RMSD.append(_RMSD)
+
+            # get elements of PAIR_DISTANCES that are <= cutoff
+            PD_ndx = []
+            PD_percent = []
+            shift = min(mobile.atoms.select_atoms(sel1).residues.resids)
+            for cutoff in GDT_cutoff:
+                p, ndx = get_array_percent(PAIR_DISTANCES, cutoff)
+                if true_resids:
+                    ndx += shift
+                PD_ndx.append(ndx[0])
+                PD_percent.append(p)
+
+            GDT_resids.append(PD_ndx)
+            GDT_percent.append(PD_percent)
+
+        # test if RES ids within output match
+        if np.any(_resids_mobile != _resids_ref):
+            raise ValueError(f'''{GDT.__module__}.{GDT.__name__}():\
+            \nGDT_resids: Residue IDs of mobile and reference don't match! Norm and align universe first.''')
+        return(GDT_percent, GDT_resids, GDT_cutoff, RMSD, FRAME)
+
+    # resolve and match selections once
+    mobile_atoms = mobile.atoms.select_atoms(sel1)
+    ref_atoms = ref.atoms.select_atoms(sel2)
+    if mobile_atoms.n_atoms != ref_atoms.n_atoms or np.any(mobile_atoms.resids != ref_atoms.resids):
         raise ValueError(f'''{GDT.__module__}.{GDT.__name__}():\
         \nGDT_resids: Residue IDs of mobile and reference don't match! Norm and align universe first.''')
+    mobile_fit, ref_fit = _align.get_matching_atoms(mobile_atoms, ref_atoms, tol_mass=0.1, strict=False)
+    fit_weights = _align.get_weights(ref_fit, weights)
+    fit_ndx = np.flatnonzero(np.isin(mobile_atoms.ix, mobile_fit.ix))
+    ref_xyz = ref_atoms.positions.astype(np.float64)
+    shift = min(mobile_atoms.residues.resids) if true_resids else 0
+    n_atoms = mobile_atoms.n_atoms
+    n_cutoff = len(GDT_cutoff)
+    cutoff_ndx = np.arange(n_cutoff)
+
+    # analyze trajectory in blocks of frames
+    for frames, _, xyz in _top.iter_frame_blocks(mobile_atoms, frames=FRAME, block_size=cfg.block_size,
+                                                   prefetch=cfg.prefetch, cache=cfg.cache, verbose=verbose):
+        old_rmsd, new_rmsd, R, mobile_com, ref_com = _ana._HELP_kabsch_batch(xyz[:, fit_ndx], ref_xyz[fit_ndx], weights=fit_weights)
+        fitted = (xyz - mobile_com[:, None, :]) @ R + ref_com
+        PAIR_DISTANCES = np.linalg.norm(fitted - ref_xyz, axis=2)
+
+        # bin[i, j] is the index of the smallest cutoff with PAIR_DISTANCES[i, j] <= cutoff
+        # counts[i, k] is the number of pair distances <= GDT_cutoff[k]
+        bins = np.searchsorted(GDT_cutoff, PAIR_DISTANCES, side="left")
+        counts = np.zeros((len(frames), n_cutoff+1), dtype=int)
+        np.add.at(counts, (np.arange(len(frames))[:, None], bins), 1)
+        counts = np.cumsum(counts, axis=1)[:, :n_cutoff]
+
+        for i in range(len(frames)):
+            RMSD.append((old_rmsd[i], new_rmsd[i]))
+            GDT_percent.append([_misc.percent(c, n_atoms) for c in counts[i]])
+            mask = bins[i] <= cutoff_ndx[:, None]
+            GDT_resids.append([np.flatnonzero(m) + shift for m in mask])
     return(GDT_percent, GDT_resids, GDT_cutoff, RMSD, FRAME)
 
 
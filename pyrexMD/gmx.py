@@ -5,8 +5,9 @@
 # @Last modified time: 30.11.2021
 
 """
-.. hint:: This module contains modified `GromacsWrapper` functions for
-    streamlining the interaction with `GROMACS` for system setups etc.
+.. hint:: This module contains modified `GROMACS` functions for
+    streamlining the interaction with `GROMACS` for system setups etc. The
+    GROMACS tools are executed directly as subprocesses (see run_gmx()).
 
 
 Example:
@@ -53,47 +54,281 @@ Content:
 --------
 """
 
-import logging
 import numpy as np
 import pyrexMD.misc as _misc
 import MDAnalysis as mda
-import gromacs
+import asyncio
+import shlex
+import shutil
+import subprocess
+import threading
 import glob
 import os
 
 
-logging.getLogger('gromacs.config').disabled = True
-gromacs.environment.flags['capture_output'] = True  # print gromacs output
-
 ################################################################################
 ################################################################################
+### GROMACS runner
+
+GMX_EXE = None  # None: autodetect gmx executable, e.g. "gmx", "gmx_mpi" or "mpirun -np 4 gmx_mpi"
 
 
-def __fix_ResourceWarning__():
+def get_gmx_exe():
+    """
+    Get GROMACS executable. Uses GMX_EXE if set, otherwise searches PATH for
+    gmx, gmx_mpi, gmx_d and gmx_mpi_d (in this order).
+
+    Returns:
+        gmx_exe (list)
+            command of GROMACS executable, e.g. ["gmx"]
     """
-    Fix 'ResourceWarning: unclosed file' of GromacsWrapper's config.py module
+    if GMX_EXE is not None:
+        return shlex.split(GMX_EXE)
+    for name in ["gmx", "gmx_mpi", "gmx_d", "gmx_mpi_d"]:
+        if shutil.which(name) is not None:
+            return [name]
+    raise _misc.Error("Failed to find GROMACS executable (gmx, gmx_mpi). Source GMXRC or set gmx.GMX_EXE.")
+
+
+def _HELP_gmx_args(tool, **kwargs):
     """
-    module_path = f"{os.path.dirname(os.path.realpath(gromacs.__file__))}/config.py"
-    old_str = "import sys"
-    new_str = "import sys       ### fixed warning\n"
-    new_str += "import warnings  ### fixed warning\n"
-    new_str += "warnings.simplefilter('ignore', ResourceWarning)  ### fixed warning\n"
-
-    needs_fix = True
-    with open(module_path, "r") as f:
-        old_text = f.read()
-        if "### fixed warning" in old_text:
-            needs_fix = False
+    Returns command line of GROMACS tool.
+
+    Args:
+        tool (str): GROMACS tool, e.g. "mdrun" or "convert-tpr"
+
+    Keyword Args:
+        | options of GROMACS tool
+        | key=True -> -key
+        | key=False -> -nokey
+        | key=None -> skip option
+        | key=[v1, v2] -> -key v1 v2
+        | key=v -> -key v
+    """
+    ARGS = get_gmx_exe() + [tool.replace("_", "-")]
+    for key, value in kwargs.items():
+        option = f"-{key.lstrip('-')}"
+        if value is None:
+            continue
+        elif value is True:
+            ARGS.append(option)
+        elif value is False:
+            ARGS.append(f"-no{option[1:]}")
+        elif isinstance(value, (list, tuple)):
+            ARGS += [option] + [str(item) for item in value]
         else:
-            new_text = old_text.replace(old_str, new_str)
-    if needs_fix:
-        with open(module_path, "w") as f:
-            f.write(new_text)
-    return
+            ARGS += [option, str(value)]
+    return ARGS
+
+
+def _HELP_gmx_input(input):
+    """
+    Returns stdin string of interactive GROMACS prompts (e.g. group selection).
+    """
+    if input is None:
+        return None
+    if isinstance(input, (list, tuple)):
+        input = "\n".join([str(item) for item in input])
+    input = str(input)
+    return input if input.endswith("\n") else input + "\n"
+
+
+class _HELP_LineHandler(object):
+    """
+    Collects the output lines of a GROMACS process and forwards them to a log
+    file and a callback function. Progress updates which are terminated by
+    carriage returns are treated as separate lines.
+    """
+
+    def __init__(self, fout=None, callback=None):
+        self.fout = fout
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.LINES = {"stdout": [], "stderr": []}
+        self.BUFFER = {"stdout": "", "stderr": ""}
+
+    def feed(self, text, stream):
+        text = self.BUFFER[stream] + text.replace("\r\n", "\n").replace("\r", "\n")
+        *LINES, self.BUFFER[stream] = text.split("\n")
+        for line in LINES:
+            self.emit(line, stream)
+
+    def flush(self):
+        for stream in self.BUFFER:
+            if self.BUFFER[stream]:
+                self.emit(self.BUFFER[stream], stream)
+                self.BUFFER[stream] = ""
+
+    def emit(self, line, stream):
+        with self.lock:
+            self.LINES[stream].append(line)
+            if self.fout is not None:
+                self.fout.write(line + "\n")
+                self.fout.flush()
+            if self.callback is not None:
+                self.callback(line, stream)
+
+    def output(self):
+        return "\n".join(self.LINES["stdout"]), "\n".join(self.LINES["stderr"])
+
+
+def _HELP_stream_callback(callback, stream):
+    """
+    Returns callback function which also prints lines (if stream is True).
+    """
+    if not stream:
+        return callback
+
+    def func(line, name):
+        print(line, flush=True)
+        if callback is not None:
+            callback(line, name)
+    return func
+
+
+def run_gmx(tool, input=None, cwd=None, logfile=None, callback=None, stream=False,
+            timeout=None, check=True, **kwargs):
+    """
+    Run a GROMACS tool as subprocess (gmx <tool> <options>) and stream its
+    output line by line in real time.
+
+    Args:
+        tool (str): GROMACS tool, e.g. "pdb2gmx", "mdrun", "trjconv"
+        input (None, str, list): input for interactive prompts (e.g. group selection)
+        cwd (None, str): working directory of the subprocess
+        logfile (None, str): stream stdout and stderr into log file
+        callback (None, function): function callback(line, stream) which is
+          called for each output line with stream "stdout" or "stderr"
+        stream (bool): print output lines in real time
+        timeout (None, float): timeout in seconds. The process is killed and
+          subprocess.TimeoutExpired is raised after timeout.
+        check (bool): raise misc.Error if return code is not 0
+
+    Keyword Args:
+        options of GROMACS tool, e.g. deffnm="em" -> -deffnm em, v=True -> -v
+
+    Returns:
+        returncode (int)
+            return code of GROMACS process
+        stdout (str)
+            stdout of GROMACS process
+        stderr (str)
+            stderr of GROMACS process
+
+    Example:
+        | >> gmx.run_gmx("mdrun", deffnm="em", v=True, stream=True, logfile="mdrun.log")
+    """
+    ARGS = _HELP_gmx_args(tool, **kwargs)
+    fout = None if logfile is None else open(logfile, "w")
+    handler = _HELP_LineHandler(fout, _HELP_stream_callback(callback, stream))
+    try:
+        process = subprocess.Popen(ARGS, cwd=cwd, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        def read(pipe, name):
+            for chunk in iter(lambda: pipe.read1(2**16), b""):
+                handler.feed(chunk.decode(errors="replace"), name)
+
+        THREADS = [threading.Thread(target=read, args=(process.stdout, "stdout"), daemon=True),
+                   threading.Thread(target=read, args=(process.stderr, "stderr"), daemon=True)]
+        for thread in THREADS:
+            thread.start()
+        stdin = _HELP_gmx_input(input)
+        try:
+            if stdin is not None:
+                process.stdin.write(stdin.encode())
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            for thread in THREADS:
+                thread.join()
+            handler.flush()
+    finally:
+        if fout is not None:
+            fout.close()
+
+    stdout, stderr = handler.output()
+    if check and returncode != 0:
+        raise _misc.Error(f"GROMACS command failed with return code {returncode}: {' '.join(ARGS)}\n{stderr}")
+    return returncode, stdout, stderr
+
+
+async def run_gmx_async(tool, input=None, cwd=None, logfile=None, callback=None, stream=False,
+                        timeout=None, check=True, **kwargs):
+    """
+    Asynchronous version of run_gmx(), i.e. multiple GROMACS processes can be
+    executed concurrently via asyncio.
+
+    Args:
+        see run_gmx()
+
+    Keyword Args:
+        see run_gmx()
+
+    Returns:
+        returncode (int)
+            return code of GROMACS process
+        stdout (str)
+            stdout of GROMACS process
+        stderr (str)
+            stderr of GROMACS process
+
+    Example:
+        | >> JOBS = [gmx.run_gmx_async("mdrun", deffnm=f"rex_{i}/em") for i in range(1, 5)]
+        | >> RESULTS = await asyncio.gather(*JOBS)
+    """
+    ARGS = _HELP_gmx_args(tool, **kwargs)
+    fout = None if logfile is None else open(logfile, "w")
+    handler = _HELP_LineHandler(fout, _HELP_stream_callback(callback, stream))
+    try:
+        process = await asyncio.create_subprocess_exec(*ARGS, cwd=cwd, stdin=asyncio.subprocess.PIPE,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE)
+
+        async def read(pipe, name):
+            while True:
+                chunk = await pipe.read(2**16)
+                if not chunk:
+                    break
+                handler.feed(chunk.decode(errors="replace"), name)
+
+        async def communicate():
+            stdin = _HELP_gmx_input(input)
+            try:
+                if stdin is not None:
+                    process.stdin.write(stdin.encode())
+                    await process.stdin.drain()
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            await asyncio.gather(read(process.stdout, "stdout"), read(process.stderr, "stderr"))
+            return await process.wait()
+
+        try:
+            returncode = await asyncio.wait_for(communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(ARGS, timeout)
+        finally:
+            handler.flush()
+    finally:
+        if fout is not None:
+            fout.close()
+
+    stdout, stderr = handler.output()
+    if check and returncode != 0:
+        raise _misc.Error(f"GROMACS command failed with return code {returncode}: {' '.join(ARGS)}\n{stderr}")
+    return returncode, stdout, stderr
 
 
-### execute fix
-__fix_ResourceWarning__()
 ################################################################################
 ################################################################################
 # Help functions
@@ -198,7 +433,10 @@ def clean_up(path="./", pattern="gmx_pattern", ignore=None, verbose=True):
             for ign in ignore:
                 if ign in item:
                     continue
-        os.remove(item)
+        try:
+            os.remove(item)
+        except FileNotFoundError:
+            continue    # removed by concurrent process
         if verbose:
             print('removed file:', item)
     return
@@ -239,7 +477,7 @@ def _get_sel_code(sel, **kwargs):
 def pdb2gmx(f, o="protein.gro", odir="./", ff="amber99sb-ildn", water="tip3p",
             ignh=True, verbose=True, **kwargs):
     """
-    Modified function of gromacs.pdb2gmx().
+    Modified function of gmx pdb2gmx.
 
     GROMACS info:
         'pdb2gmx' reads a .pdb (or .gro) file, reads some database files, adds
@@ -273,7 +511,6 @@ def pdb2gmx(f, o="protein.gro", odir="./", ff="amber99sb-ildn", water="tip3p",
 
     .. Hint:: Find more valid Keyword Args via
 
-        - python -> gromacs.pdb2gmx.help()
         - terminal -> gmx pdb2gmx -h
 
     Returns:
@@ -281,12 +518,15 @@ def pdb2gmx(f, o="protein.gro", odir="./", ff="amber99sb-ildn", water="tip3p",
             realpath of output file
     """
     cfg = _setup_config(**kwargs)
+    for key in ["cprint_color", "log", "log_overwrite"]:
+        if key in kwargs:
+            del kwargs[key]
     ############################################################################
     o = _misc.joinpath(odir, o)  # special case for joinpath
 
-    # GromacsWrapper
+    # GROMACS
     with _misc.HiddenPrints(verbose=verbose):
-        _, cfg.stdout, cfg.stderr = gromacs.pdb2gmx(f=f, o=o, ff=ff, water=water.lower(), ignh=ignh, v=verbose)
+        _, cfg.stdout, cfg.stderr = run_gmx("pdb2gmx", f=f, o=o, ff=ff, water=water.lower(), ignh=ignh, v=verbose, **kwargs)
         print(f"{cfg.stderr} /n {cfg.stdout}")
 
     odir = _clean_func(o)
@@ -297,7 +537,7 @@ def pdb2gmx(f, o="protein.gro", odir="./", ff="amber99sb-ildn", water="tip3p",
 
 def editconf(f, o="default", odir="./", verbose=True, **kwargs):
     """
-    - Modified function of gromacs.editconf()
+    - Modified function of gmx editconf
     - Alias function of convert_TPR2PDB()
 
     GROMACS info:
@@ -329,7 +569,6 @@ def editconf(f, o="default", odir="./", verbose=True, **kwargs):
 
     .. Hint:: Find more valid Keyword Args via
 
-        - python  -> gromacs.editconf.help()
         - terminal -> gmx editconf -h
 
     Returns:
@@ -346,9 +585,9 @@ def editconf(f, o="default", odir="./", verbose=True, **kwargs):
     else:
         o = _misc.joinpath(odir, o)  # special case for joinpath
 
-    # GromacsWrapper
+    # GROMACS
     with _misc.HiddenPrints(verbose=verbose):
-        _, cfg.stdout, cfg.stderr = gromacs.editconf(f=f, o=o, **kwargs)
+        _, cfg.stdout, cfg.stderr = run_gmx("editconf", f=f, o=o, **kwargs)
         print(f"{cfg.stderr} /n {cfg.stdout}")
 
     odir = _clean_func(o)
@@ -363,7 +602,7 @@ convert_TPR2PDB = editconf
 
 def convert_TPR(s, o="default", odir="./", sel="protein", verbose=True, **kwargs):
     """
-    Modified function of gromacs.convert_tpr().
+    Modified function of gmx convert-tpr.
 
     GROMACS info:
         'gmx convert-tpr' can edit run input files in three ways:
@@ -392,7 +631,6 @@ def convert_TPR(s, o="default", odir="./", sel="protein", verbose=True, **kwargs
 
     .. Hint:: Find more valid Keyword Args via
 
-        - python -> gromacs.convert_tpr.help()
         - terminal -> gmx convert_tpr -h
 
     Returns:
@@ -408,9 +646,9 @@ def convert_TPR(s, o="default", odir="./", sel="protein", verbose=True, **kwargs
     else:
         o = _misc.joinpath(odir, o)  # special case for joinpath
 
-    # GromacsWrapper
+    # GROMACS
     with _misc.HiddenPrints(verbose=verbose):
-        gromacs.convert_tpr(s=s, o=o, input=sel_code, **kwargs)
+        run_gmx("convert_tpr", s=s, o=o, input=sel_code, **kwargs)
 
     ofile = _save_func(o, cfg.cprint_color)
     clean_up(path=os.path.dirname(os.path.realpath(ofile)), pattern=".*offsets.npz", verbose=False)
@@ -420,7 +658,7 @@ def convert_TPR(s, o="default", odir="./", sel="protein", verbose=True, **kwargs
 
 def grompp(f, o, c, p="topol.top", verbose=True, **kwargs):
     """
-    Modified function of gromacs.grompp().
+    Modified function of gmx grompp.
 
     Args:
         f (str): input file: mdp
@@ -441,7 +679,6 @@ def grompp(f, o, c, p="topol.top", verbose=True, **kwargs):
 
     .. Hint:: Find more valid Keyword Args via
 
-        - python -> gromacs.grompp.help()
         - terminal -> gmx grompp -h
 
     Returns:
@@ -459,9 +696,9 @@ def grompp(f, o, c, p="topol.top", verbose=True, **kwargs):
     odir = os.path.realpath(os.path.dirname(os.path.realpath(o)))
     o = _misc.joinpath(odir, o)  # special case for joinpath
 
-    # GromacsWrapper
+    # GROMACS
     with _misc.HiddenPrints(verbose=verbose):
-        _, cfg.stdout, cfg.stderr = gromacs.grompp(f=f, o=o, c=c, p=p, v=verbose,
+        _, cfg.stdout, cfg.stderr = run_gmx("grompp", f=f, o=o, c=c, p=p, v=verbose,
                                                    maxwarn=cfg.maxwarn, **kwargs)
         print(f"{cfg.stderr} /n {cfg.stdout}")
 
@@ -473,7 +710,7 @@ def grompp(f, o, c, p="topol.top", verbose=True, **kwargs):
 
 def solvate(cp, cs="spc216.gro", o="solvent.gro", p="topol.top", verbose=True, **kwargs):
     """
-    Modified function of gromacs.solvate(). cp is usually "box.gro"
+    Modified function of gmx solvate. cp is usually "box.gro"
 
     Args:
         cp (str): structure file ~ solute:  gro pdb tpr (g96 brk ent esp)
@@ -499,7 +736,6 @@ def solvate(cp, cs="spc216.gro", o="solvent.gro", p="topol.top", verbose=True, *
 
     .. Hint:: Find more valid Keyword Args via
 
-        - python -> gromacs.solvate.help()
         - terminal -> gmx solvate -h
 
     Returns:
@@ -511,9 +747,9 @@ def solvate(cp, cs="spc216.gro", o="solvent.gro", p="topol.top", verbose=True, *
     odir = os.path.realpath(os.path.dirname(os.path.realpath(cp)))
     o = _misc.joinpath(odir, o)  # special case for joinpath
 
-    # GromacsWrapper
+    # GROMACS
     with _misc.HiddenPrints(verbose=verbose):
-        _, cfg.stdout, cfg.stderr = gromacs.solvate(cp=cp, cs=cs, o=o, p=p, **kwargs)
+        _, cfg.stdout, cfg.stderr = run_gmx("solvate", cp=cp, cs=cs, o=o, p=p, **kwargs)
         print(f"{cfg.stderr} /n {cfg.stdout}")
 
     odir = _clean_func(o)
@@ -525,7 +761,7 @@ def solvate(cp, cs="spc216.gro", o="solvent.gro", p="topol.top", verbose=True, *
 def genion(s, o, p="topol.top", input="SOL", pname="NA", nname="CL", conc=0.15,
            neutral=True, verbose=True, **kwargs):
     """
-    Modified fuction of gromacs.genion().
+    Modified fuction of gmx genion.
 
     GROMACS info:
         gmx genion randomly replaces solvent molecules with monoatomic ions.
@@ -555,7 +791,6 @@ def genion(s, o, p="topol.top", input="SOL", pname="NA", nname="CL", conc=0.15,
 
     .. Hint:: Find more valid Keyword Args via
 
-        - python -> gromacs.genion.help()
         - terminal -> gmx genion -h
 
     Returns:
@@ -567,9 +802,9 @@ def genion(s, o, p="topol.top", input="SOL", pname="NA", nname="CL", conc=0.15,
     odir = os.path.realpath(os.path.dirname(os.path.realpath(o)))
     o = _misc.joinpath(odir, o)  # special case for joinpath
 
-    # GromacsWrapper
+    # GROMACS
     with _misc.HiddenPrints(verbose=verbose):
-        _, cfg.stdout, cfg.stderr = gromacs.genion(s=s, o=o, p=p, pname=pname,
+        _, cfg.stdout, cfg.stderr = run_gmx("genion", s=s, o=o, p=p, pname=pname,
                                                    nname=nname, neutral=neutral,
                                                    input=str(input), **kwargs)
         print(f"{cfg.stderr} /n {cfg.stdout}")
@@ -580,16 +815,17 @@ def genion(s, o, p="topol.top", input="SOL", pname="NA", nname="CL", conc=0.15,
     return ofile
 
 
-def mdrun(verbose=True, **kwargs):
+def mdrun(verbose=True, logfile=None, callback=None, timeout=None, **kwargs):
     """
-    Alias fuction of gromacs.mdrun().
-
-    .. Note:: output can be printed only after mdrun has finished. To see
-      realtime updates invoke the command using "!gmx_mpi mdrun <parameters>"
-      instead
+    Alias fuction of gmx mdrun. The output (including progress updates) is
+    printed in real time if verbose is True.
 
     Args:
         verbose (bool): print/mute GROMACS messages
+        logfile (None, str): stream GROMACS messages into log file
+        callback (None, function): function callback(line, stream) which is
+          called for each output line (see run_gmx())
+        timeout (None, float): kill mdrun after timeout in seconds
 
     Keyword Args:
         deffnm (str): default filename
@@ -597,19 +833,22 @@ def mdrun(verbose=True, **kwargs):
 
     .. Hint:: Find more valid Keyword Args via
 
-       - python -> gromacs.mdrun.help()
        - terminal -> gmx mdrun -h
+
+    Returns:
+        returncode (int)
+            return code of mdrun
     """
-    # GromacsWrapper
-    with _misc.HiddenPrints(verbose=verbose):
-        _, stdout, stderr = gromacs.mdrun(v=True, **kwargs)
-        print(f"{stderr} /n {stdout}")
-    return
+    # GROMACS
+    returncode, _, _ = run_gmx("mdrun", logfile=logfile, callback=callback, stream=verbose,
+                               timeout=timeout, v=True, **kwargs)
+    return returncode
 
 
-def trjconv(s, f, o="default", odir="./", sel="protein", verbose=True, **kwargs):
+def trjconv(s, f, o="default", odir="./", sel="protein", verbose=True,
+            logfile=None, callback=None, timeout=None, **kwargs):
     """
-    Modified function of gromacs.trjconv().
+    Modified function of gmx trjconv.
 
     GROMACS info:
         gmx trjconv can convert trajectory files in many ways
@@ -636,14 +875,17 @@ def trjconv(s, f, o="default", odir="./", sel="protein", verbose=True, **kwargs)
           | "protein": protein atoms
           | "ca" or "calpha": CA atoms
           | "bb" or "backbone": backbone atoms
-        verbose (bool): print/mute GROMACS messages
+        verbose (bool): print/mute GROMACS messages (in real time)
+        logfile (None, str): stream GROMACS messages into log file
+        callback (None, function): function callback(line, stream) which is
+          called for each output line (see run_gmx())
+        timeout (None, float): kill trjconv after timeout in seconds
 
     Keyword Args:
         cprint_color (str)
 
     .. Hint:: Find more valid Keyword Args via
 
-       - python -> gromacs.trjconv.help()
        - terminal -> gmx trjconv -h
 
     Returns:
@@ -671,9 +913,12 @@ def trjconv(s, f, o="default", odir="./", sel="protein", verbose=True, **kwargs)
     else:
         o = _misc.joinpath(odir, o)  # special case for joinpath
 
-    # GromacsWrapper
-    with _misc.HiddenPrints(verbose=verbose):
-        gromacs.trjconv(s=s, f=f, o=o, input=sel_code, **kwargs)
+    if "cprint_color" in kwargs:
+        del kwargs["cprint_color"]
+
+    # GROMACS
+    run_gmx("trjconv", s=s, f=f, o=o, input=sel_code, logfile=logfile, callback=callback,
+            stream=verbose, timeout=timeout, **kwargs)
 
     ofile = _save_func(o, cfg.cprint_color)
     clean_up(path=os.path.dirname(os.path.realpath(ofile)), pattern=".*offsets.npz", verbose=False)
@@ -727,7 +972,6 @@ def fix_TRAJ(tpr, xtc, o="default", odir="./", tu="ns", sel="protein", pbc="mol"
 
     .. Hint:: Find more valid Keyword Args via
 
-        - python -> gromacs.trjconv.help()
         - terminal -> gmx trjconv -h
 
     Returns:
@@ -755,7 +999,7 @@ def fix_TRAJ(tpr, xtc, o="default", odir="./", tu="ns", sel="protein", pbc="mol"
         o = [_misc.joinpath(odir, o[0]),
              _misc.joinpath(odir, o[1])]
 
-    ### GromacsWrapper
+    ### GROMACS
     print("Fixing topology:")
     tpr_file = convert_TPR(s=tpr, o=o[0], odir=odir, sel=sel, verbose=verbose)  # selection only
 
@@ -770,7 +1014,7 @@ def fix_TRAJ(tpr, xtc, o="default", odir="./", tu="ns", sel="protein", pbc="mol"
 
 def get_RMSD(ref, xtc, o="default", odir="./", tu="ns", sel=["bb", "bb"], verbose=True, **kwargs):
     """
-    Modified function of gromacs.rms(). Calculate backbone RMSD.
+    Modified function of gmx rms. Calculate backbone RMSD.
 
     Args:
         ref (str): reference structure: pdb (tpr gro g96 brk ent)
@@ -795,7 +1039,6 @@ def get_RMSD(ref, xtc, o="default", odir="./", tu="ns", sel=["bb", "bb"], verbos
 
     .. Hint:: Find valid Keyword Args via
 
-        - python -> gromacs.rms.help()
         - terminal -> gmx rms -h
 
     Returns:
@@ -819,12 +1062,12 @@ def get_RMSD(ref, xtc, o="default", odir="./", tu="ns", sel=["bb", "bb"], verbos
     else:
         o = _misc.joinpath(odir, o)
 
-    # GromacsWrapper
+    # GROMACS
     with _misc.HiddenPrints(verbose=verbose):
         sel_code = ""
         for item in sel:
             sel_code += f"{_get_sel_code(item)} "
-        gromacs.rms(s=ref, f=xtc, o=o, tu=tu, input=sel_code, **kwargs)
+        run_gmx("rms", s=ref, f=xtc, o=o, tu=tu, input=sel_code, **kwargs)
 
     ofile = _save_func(o, cfg.cprint_color)
     return ofile
@@ -855,7 +1098,6 @@ def get_ref_structure(f, o="default", odir="./", ff="amber99sb-ildn", water="tip
 
     .. Hint:: Find valid Keyword Args via
 
-        - python -> gromacs.pdb2gmx.help()
         - terminal -> gmx pdb2gmx -h
 
     Returns:
@@ -870,9 +1112,9 @@ def get_ref_structure(f, o="default", odir="./", ff="amber99sb-ildn", water="tip
     else:
         o = _misc.joinpath(odir, o)
 
-    # GromacsWrapper
+    # GROMACS
     with _misc.HiddenPrints(verbose=verbose):
-        gromacs.pdb2gmx(f=f, o=o, ff=ff, water=water.lower(), ignh=ignh, **kwargs)
+        run_gmx("pdb2gmx", f=f, o=o, ff=ff, water=water.lower(), ignh=ignh, **kwargs)
 
     ofile = _save_func(o, cfg.cprint_color)
     return ofile
@@ -16,6 +16,9 @@ import os
 import glob
 import shutil
 import termcolor
+import functools
+import hashlib
+import inspect
 
 from pyrexMD.misc.classes import Error, dtypeError
 
@@ -1169,3 +1172,174 @@ def get_percentile(data, p, prec=2, **kwargs):
     """
     percentile = round(np.percentile(data, p, **kwargs), prec)
     return percentile
+
+
+################################################################################
+################################################################################
+### result memoization
+
+# default directory of memoized results, see memoize()
+MEMOIZE_CACHE_DIR = os.path.expanduser("~/.cache/pyrexMD/results")
+
+
+def _HELP_file_fingerprint(path):
+    """
+    Get fingerprint (realpath, mtime, size) of an existing file.
+    """
+    stat = os.stat(path)
+    return f"file:{os.path.realpath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _HELP_hash_object(obj, sha1):
+    """
+    Update sha1 with a hash of obj. Files are represented by their fingerprint
+    and MDAnalysis universes/atomgroups by the fingerprints of their topology and
+    trajectory files, their current frame and positions as well as their
+    (possibly modified) ids, resids and names. Coordinates of in-memory
+    trajectories (MemoryReader) are hashed as well. Other trajectories which are
+    not backed by files or which use on-the-fly transformations raise Error.
+    """
+    if obj is None or isinstance(obj, (bool, int, float, complex, np.generic)):
+        sha1.update(repr(obj).encode())
+    elif isinstance(obj, str):
+        sha1.update(_HELP_file_fingerprint(obj).encode() if os.path.isfile(obj) else repr(obj).encode())
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        sha1.update(f"ndarray:{obj.dtype}:{obj.shape}".encode())
+        sha1.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple, np.ndarray)):
+        sha1.update(f"{type(obj).__name__}:{len(obj)}".encode())
+        for item in obj:
+            _HELP_hash_object(item, sha1)
+    elif isinstance(obj, dict):
+        sha1.update(f"dict:{len(obj)}".encode())
+        for key in sorted(obj, key=repr):
+            _HELP_hash_object(key, sha1)
+            _HELP_hash_object(obj[key], sha1)
+    elif hasattr(obj, "universe") and hasattr(obj, "atoms"):
+        # MDAnalysis universe or atomgroup
+        u = obj.universe
+        trajectory = u.trajectory
+        if len(getattr(trajectory, "transformations", [])) > 0:
+            raise Error(f"Can not memoize {type(obj).__name__} with on-the-fly trajectory transformations. "
+                        "Call the function with memoize=False.")
+        filenames = [u.filename] + list(getattr(trajectory, "filenames", [trajectory.filename]))
+        _HELP_hash_object([f if isinstance(f, str) else repr(f) for f in filenames], sha1)
+        _HELP_hash_object([len(trajectory), trajectory.frame, obj.atoms.ix, obj.atoms.ids, obj.atoms.resids,
+                           obj.atoms.names.astype(str), obj.atoms.positions], sha1)
+        if hasattr(trajectory, "get_array"):
+            # MemoryReader: coordinates are not backed by a file
+            _HELP_hash_object(trajectory.get_array(), sha1)
+        elif not all(isinstance(f, str) and os.path.isfile(f) for f in filenames[1:]):
+            raise Error(f"Can not memoize {type(obj).__name__} with trajectory {type(trajectory).__name__} "
+                        "which is not backed by a file. Call the function with memoize=False.")
+    else:
+        sha1.update(f"{type(obj).__module__}.{type(obj).__qualname__}:{obj!r}".encode())
+    return
+
+
+def clear_memoize_cache(cache_dir=None, max_size=0):
+    """
+    Remove least recently used results of the memoize cache until the cache size
+    is below max_size.
+
+    Args:
+        cache_dir (None, str): cache directory. None: use MEMOIZE_CACHE_DIR.
+        max_size (int): maximum cache size in bytes. 0: remove all results.
+
+    Returns:
+        removed (list)
+            list with removed files
+    """
+    if cache_dir is None:
+        cache_dir = MEMOIZE_CACHE_DIR
+    FILES = sorted(glob.glob(f"{cache_dir}/*.npz"), key=os.path.getmtime)
+    total_size = sum(os.path.getsize(f) for f in FILES)
+    removed = []
+    for f in FILES:
+        if total_size <= max_size:
+            break
+        total_size -= os.path.getsize(f)
+        os.remove(f)
+        removed.append(f)
+    return removed
+
+
+def memoize(cache_dir=None, max_size=10*2**30, ignore=["verbose", "disable"]):
+    """
+    Decorator which adds opt-in memoization of results on disk. Decorated
+    functions behave as usual unless they are called with the keyword argument
+    memoize=True.
+
+    Results are keyed by a hash of the function name and all arguments
+    (including default values) and saved as npz file. Arrays are saved natively,
+    other objects are pickled. Input files, e.g. trajectories and h5 files, are
+    represented by their realpath, mtime and size, i.e. results are invalidated
+    automatically when the files change.
+
+    .. Note:: Side effects such as plots or saved files are not reproduced when
+      a memoized result is returned.
+
+    Args:
+        cache_dir (None, str): cache directory. None: use MEMOIZE_CACHE_DIR.
+        max_size (int): maximum cache size in bytes. Least recently used
+          results are removed if the cache grows beyond max_size.
+        ignore (list): names of arguments which do not affect the result.
+
+    Returns:
+        decorator (function)
+
+    Example:
+        | >> @memoize()
+        | >> def func(u, sel="protein", **kwargs):
+        | >>     ...
+        | >> func(u, memoize=True)   # calculates and saves result
+        | >> func(u, memoize=True)   # loads result
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, memoize=False, **kwargs):
+            if not memoize:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            ARGS = {}
+            for name, value in bound.arguments.items():
+                if signature.parameters[name].kind == inspect.Parameter.VAR_KEYWORD:
+                    ARGS.update({k: v for k, v in value.items() if k not in ignore})
+                elif name not in ignore:
+                    ARGS[name] = value
+            sha1 = hashlib.sha1(f"{func.__module__}.{func.__qualname__}".encode())
+            _HELP_hash_object(ARGS, sha1)
+            _cache_dir = MEMOIZE_CACHE_DIR if cache_dir is None else cache_dir
+            cache_file = f"{_cache_dir}/{func.__name__}_{sha1.hexdigest()}.npz"
+
+            if os.path.isfile(cache_file):
+                os.utime(cache_file)  # mark result as recently used
+                with np.load(cache_file, allow_pickle=True) as data:
+                    ITEMS = [data[f"item_{i}"] for i in range(int(data["n_items"]))]
+                    ITEMS = [item.item() if item.dtype == object and item.ndim == 0 else item for item in ITEMS]
+                    return tuple(ITEMS) if bool(data["is_tuple"]) else ITEMS[0]
+
+            result = func(*args, **kwargs)
+            is_tuple = isinstance(result, tuple)
+            ITEMS = result if is_tuple else (result,)
+            DATA = {}
+            for i, item in enumerate(ITEMS):
+                if isinstance(item, np.ndarray) and item.dtype != object:
+                    DATA[f"item_{i}"] = item
+                else:
+                    obj = np.empty((), dtype=object)
+                    obj[()] = item
+                    DATA[f"item_{i}"] = obj
+            os.makedirs(_cache_dir, exist_ok=True)
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, "wb") as fout:
+                np.savez(fout, n_items=len(ITEMS), is_tuple=is_tuple, **DATA)
+            clear_memoize_cache(_cache_dir, max_size=max(0, max_size-os.path.getsize(temp_file)))
+            os.replace(temp_file, cache_file)
+            return result
+        return wrapper
+    return decorator
@@ -53,6 +53,13 @@ Example:
 
     # next: upload REX MD run files on HPC and execute production run
 
+    # analyze all replica in parallel after the production run
+    import pyrexMD.analysis.gdt as gdt
+    import pyrexMD.analysis.contacts as con
+    spec = {"GDT": (gdt.GDT, (<ref>,), {}),
+            "QNative": (con.get_QNative, (<ref>,), {"d_cutoff": 6.0})}
+    rex.analyze_REX(rex_dirs, spec, n_jobs=-1, save_as="rex_analysis.h5")
+
 Content:
 --------
 """
@@ -60,6 +67,14 @@ Content:
 from MDAnalysis import Universe
 import os
 import glob
+import shutil
+import inspect
+import contextlib
+import traceback
+import hashlib
+import json
+import multiprocessing
+import h5py
 import numpy as np
 import pyrexMD.topology as _top
 import pyrexMD.gmx as _gmx
@@ -445,7 +460,17 @@ def WF_get_system_parameters(wdir, verbose=False, **kwargs):
     # save cwd and go to wdir
     cwd = os.getcwd()
     wdir = _misc.cd(wdir)
+    try:
+        return _HELP_get_system_parameters(wdir, cfg, verbose=verbose)
+    finally:
+        # go back to cwd
+        _misc.cd(cwd)
+
 
+def _HELP_get_system_parameters(wdir, cfg, verbose=False):
+    """
+    Executes WF_get_system_parameters() inside the working directory wdir.
+    """
     pdbs = glob.glob("*.pdb")
     ref_pdbs = glob.glob("*_ref.pdb")
     if len(ref_pdbs) > 1:
@@ -486,67 +511,400 @@ def WF_get_system_parameters(wdir, verbose=False, **kwargs):
 
     # get maximum solvent number
     maxsol = WF_getParameter_maxsol("./logs/solvate_1.log")
-
-    # go back to cwd
-    _misc.cd(cwd)
     return boxsize, maxsol
 
 
-def WF_REX_setup(rex_dirs, boxsize, maxsol, ff='amber99sb-ildn', water='tip3p',
-                 ignh=True, verbose=False, verbose_gmx=False):
+REX_MANIFEST = "rex_manifest.json"
+REX_SNAPSHOTS = "rex_snapshots"   # snapshots of files which are modified in place by multiple steps
+
+
+def _HELP_file_hash(path):
     """
-    Workflow: REX setup (without energy minimization)
+    Returns sha1 hash of file content or None if the file does not exist.
+    """
+    if not os.path.isfile(path):
+        return None
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as fin:
+        for chunk in iter(lambda: fin.read(2**20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def load_REX_manifest(rex_dir):
+    """
+    Load the manifest of a rex directory which records the completed setup steps.
 
     Args:
-        rex_dirs (list): list with rex_dirs (output of rex.get_REX_DIRS())
-        boxsize (float): suggested boxsize parameter (output of gmx.WF_getParameter_boxsize())
-        maxsol (int): suggested max solution parameter (output of gmx.WF_getParameter_max_solution())
-        ff (str):
-          | force field (see <GROMACS_path>/top/<ff> for valid inputs)
-          | "amber99sb-ildn" etc. for proteins
-          | "amber14sb_OL15" etc. for RNAs
+        rex_dir (str): rex directory
+
+    Returns:
+        manifest (dict)
+            dict with step name: {"key": <hash of parameters and input files>,
+            "outputs": {<file>: <hash of output file>}}. File paths are relative
+            to rex_dir.
+    """
+    manifest_file = f"{rex_dir}/{REX_MANIFEST}"
+    if not os.path.isfile(manifest_file):
+        return {}
+    with open(manifest_file, "r") as fin:
+        return json.load(fin)
+
+
+def _HELP_save_REX_manifest(rex_dir, manifest):
+    """
+    Save manifest atomically as <rex_dir>/rex_manifest.json.
+    """
+    manifest_file = f"{rex_dir}/{REX_MANIFEST}"
+    temp_file = f"{manifest_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as fout:
+        json.dump(manifest, fout, indent=2)
+    os.replace(temp_file, manifest_file)
+    return
+
+
+def _HELP_run_REX_steps(rex_dir, STEPS, resume=True):
+    """
+    Execute the setup steps of a single replica and record each completed step
+    in the manifest <rex_dir>/rex_manifest.json.
+
+    Each step is a dict with the keys
+
+      - name (str): step name
+      - msg (str): message printed before the step is executed
+      - func (function): executes the step (without arguments)
+      - params (dict): parameters of the step (must be json serializable)
+      - inputs (list): input files
+      - outputs (list): output files
+
+    The key of a step is the hash of its parameters and input files. With
+    resume=True, steps are skipped as long as their keys match the manifest.
+    Starting from the first invalidated step all following steps are executed.
+    Steps are also executed again if their outputs were modified afterwards.
+
+    Files which are modified in place by multiple steps (e.g. topol.top) are
+    saved after each of these steps as <rex_dir>/rex_snapshots/<step>/<file>.
+    Before resuming, the snapshot of the last skipped step is restored, i.e.
+    only the invalidated step and the following steps are executed. Without a
+    valid snapshot the file is regenerated starting from the step which wrote it.
+
+    Args:
+        rex_dir (str): rex directory
+        STEPS (list): list of step dicts in execution order
+        resume (bool):
+          | True: skip completed steps with unchanged inputs and outputs
+          | False: execute all steps
+
+    Returns:
+        n_skipped (int)
+            number of skipped steps
+    """
+    rex_dir = os.path.realpath(rex_dir)
+    manifest = load_REX_manifest(rex_dir)
+
+    def relpath(path):
+        return os.path.relpath(os.path.realpath(path), rex_dir)
+
+    def STATE(n):
+        # recorded hashes of files written by the first n steps
+        state = {}
+        for step in STEPS[:n]:
+            state.update(manifest[step["name"]]["outputs"])
+        return state
+
+    def get_key(step, state):
+        INPUTS = {relpath(f): state[relpath(f)] if relpath(f) in state else _HELP_file_hash(f)
+                  for f in step["inputs"]}
+        return hashlib.sha1(json.dumps({"params": step["params"], "inputs": INPUTS},
+                                       sort_keys=True, default=str).encode()).hexdigest()
+
+    def snapshot(step, f):
+        return os.path.join(rex_dir, REX_SNAPSHOTS, step["name"], f)
+
+    WRITERS = {}    # file: indices of steps which write file
+    for ndx, step in enumerate(STEPS):
+        for f in step["outputs"]:
+            WRITERS.setdefault(relpath(f), []).append(ndx)
+    INPLACE = [f for f, value in WRITERS.items() if len(value) > 1]
+
+    n_skipped = 0
+    if resume:
+        for ndx, step in enumerate(STEPS):
+            record = manifest.get(step["name"])
+            if record is None or record["key"] != get_key(step, STATE(ndx)):
+                break
+            n_skipped = ndx + 1
+
+        # outputs of skipped steps modified afterwards (in place files: without valid snapshot)
+        while True:
+            n_min = n_skipped
+            for f, value in STATE(n_skipped).items():
+                if _HELP_file_hash(os.path.join(rex_dir, f)) == value:
+                    continue
+                last = max(i for i in WRITERS[f] if i < n_skipped)
+                if f in INPLACE and _HELP_file_hash(snapshot(STEPS[last], f)) == value:
+                    continue
+                n_min = min(n_min, last)
+            if n_min == n_skipped:
+                break
+            n_skipped = n_min
+
+        # restore in place files from snapshots of last skipped steps
+        for f, value in STATE(n_skipped).items():
+            if f in INPLACE and _HELP_file_hash(os.path.join(rex_dir, f)) != value:
+                last = max(i for i in WRITERS[f] if i < n_skipped)
+                shutil.copy2(snapshot(STEPS[last], f), os.path.join(rex_dir, f))
+
+    for ndx, step in enumerate(STEPS):
+        if ndx < n_skipped:
+            _misc.cprint(f"Skipped {step['name']} (unchanged).", "green")
+            continue
+        if step["msg"]:
+            _misc.cprint(step["msg"], "red")
+        key = get_key(step, {})
+        step["func"]()
+        for f in step["outputs"]:
+            if relpath(f) in INPLACE and os.path.isfile(f):
+                _misc.mkdir(os.path.dirname(snapshot(step, relpath(f))), verbose=False)
+                shutil.copy2(f, snapshot(step, relpath(f)))
+        manifest[step["name"]] = {"key": key,
+                                  "outputs": {relpath(f): _HELP_file_hash(f) for f in step["outputs"]}}
+        _HELP_save_REX_manifest(rex_dir, manifest)
+    return n_skipped
+
+
+def _HELP_REX_setup_replica(rex_dir, boxsize, maxsol, ff='amber99sb-ildn', water='tip3p',
+                            ignh=True, verbose=False, verbose_gmx=False, resume=True):
+    """
+    Setup of a single replica (without energy minimization). All GROMACS input
+    and output files are passed as absolute paths, i.e. the working directory
+    is not changed.
+
+    Args:
+        rex_dir (str): rex directory
+        boxsize (float): suggested boxsize parameter
+        maxsol (int): suggested max solution parameter
+        ff (str): force field
         water (str): water model
         ignh (bool): ignore hydrogen
         verbose (bool): show blue log messages (saved file as, saved log as)
         verbose_gmx (bool): show gmx module messages (requires verbose=True)
+        resume (bool): skip completed steps with unchanged inputs and outputs
     """
-    for rex_dir in rex_dirs:
-        _misc.cprint("#######################################################################################")
-        _misc.cd(rex_dir)
-        decoy_pdb = _misc.get_filename("*_ref.pdb")
-        _misc.cprint(f"Using decoy pdb: {decoy_pdb}")
+    rex_dir = os.path.realpath(rex_dir)
+    mdp_dir = os.path.dirname(rex_dir)
+    top = f"{rex_dir}/topol.top"
+    _misc.cprint("#######################################################################################")
+    decoy_pdb = sorted(glob.glob(f"{rex_dir}/*_ref.pdb"))[0]
+    _misc.cprint(f"Using decoy pdb: {_misc.get_filename(decoy_pdb)}")
 
-        # 1) generate topology
-        _misc.cprint("\nGenerating topology...", "red")
+    def step_pdb2gmx():
         with _misc.HiddenPrints(verbose=verbose):
-            protein_gro = _gmx.pdb2gmx(f=decoy_pdb, ff=ff, water=water, ignh=ignh, verbose=False)
+            _gmx.pdb2gmx(f=decoy_pdb, odir=rex_dir, ff=ff, water=water, ignh=ignh,
+                         p=top, i=f"{rex_dir}/posre.itp", verbose=False)
 
-        # 2) generate box
-        _misc.cprint(f"Generating box with fixed size ({boxsize}) ...", "red")
+    def step_editconf():
         with _misc.HiddenPrints(verbose=verbose):
-            _gmx.editconf(f=protein_gro, o="box.gro", bt="cubic", box=boxsize, c=True, verbose=verbose_gmx)
+            _gmx.editconf(f=f"{rex_dir}/protein.gro", o=f"{rex_dir}/box.gro", bt="cubic", box=boxsize, c=True, verbose=verbose_gmx)
 
-        # 3) generate solvent
-        _misc.cprint(f"Generating solvent with fixed solvent molecules ({maxsol})...", "red")
+    def step_solvate():
         with _misc.HiddenPrints(verbose=verbose):
-            _gmx.solvate(cp="box.gro", maxsol=maxsol, verbose=verbose_gmx)
+            _gmx.solvate(cp=f"{rex_dir}/box.gro", o=f"{rex_dir}/solvent.gro", p=top, maxsol=maxsol, verbose=verbose_gmx)
 
+    def step_grompp():
+        with _misc.HiddenPrints(verbose=verbose):
+            _gmx.grompp(f=f"{mdp_dir}/ions.mdp", o=f"{rex_dir}/ions.tpr", c=f"{rex_dir}/solvent.gro",
+                        p=top, po=f"{rex_dir}/mdout.mdp", verbose=verbose_gmx)
+
+    def step_genion():
+        with _misc.HiddenPrints(verbose=verbose):
+            _gmx.genion(s=f"{rex_dir}/ions.tpr", o=f"{rex_dir}/ions.gro", p=top, verbose=False)
+
+    STEPS = [
+        # 1) generate topology
+        {"name": "pdb2gmx", "msg": "\nGenerating topology...", "func": step_pdb2gmx,
+         "params": {"ff": ff, "water": water, "ignh": ignh},
+         "inputs": [decoy_pdb],
+         "outputs": [f"{rex_dir}/protein.gro", top, f"{rex_dir}/posre.itp"]},
+        # 2) generate box
+        {"name": "editconf", "msg": f"Generating box with fixed size ({boxsize}) ...", "func": step_editconf,
+         "params": {"boxsize": boxsize},
+         "inputs": [f"{rex_dir}/protein.gro"],
+         "outputs": [f"{rex_dir}/box.gro"]},
+        # 3) generate solvent
+        {"name": "solvate", "msg": f"Generating solvent with fixed solvent molecules ({maxsol})...", "func": step_solvate,
+         "params": {"maxsol": maxsol},
+         "inputs": [f"{rex_dir}/box.gro", top],
+         "outputs": [f"{rex_dir}/solvent.gro", top]},
         # 4) generate ions
-        _misc.cprint("Generating ions...", "red")
+        {"name": "grompp_ions", "msg": "Generating ions...", "func": step_grompp,
+         "params": {},
+         "inputs": [f"{mdp_dir}/ions.mdp", f"{rex_dir}/solvent.gro", top],
+         "outputs": [f"{rex_dir}/ions.tpr"]},
+        {"name": "genion", "msg": "", "func": step_genion,
+         "params": {},
+         "inputs": [f"{rex_dir}/ions.tpr", top],
+         "outputs": [f"{rex_dir}/ions.gro", top]}]
+    _HELP_run_REX_steps(rex_dir, STEPS, resume=resume)
+    return
+
+
+def _HELP_REX_energy_minimization_replica(rex_dir, nsteps=None, verbose=False, resume=True, **kwargs):
+    """
+    Energy minimization of a single replica. All GROMACS input and output files
+    are passed as absolute paths, i.e. the working directory is not changed.
+
+    Args:
+        rex_dir (str): rex directory
+        nsteps (None, int): maximum number of steps
+        verbose (bool): show/hide GROMACS output
+        resume (bool): skip completed steps with unchanged inputs and outputs
+
+    Keyword Args:
+        further keyword arguments of gmx.mdrun(), e.g. ntomp or ntmpi
+    """
+    rex_dir = os.path.realpath(rex_dir)
+    mdp_dir = os.path.dirname(rex_dir)
+    _misc.cprint("#######################################################################################")
+
+    def step_grompp():
+        with _misc.HiddenPrints(verbose=verbose):
+            _ = _gmx.grompp(f=f"{mdp_dir}/min.mdp", o=f"{rex_dir}/em.tpr", c=f"{rex_dir}/ions.gro",
+                            p=f"{rex_dir}/topol.top", po=f"{rex_dir}/mdout.mdp")
+
+    def step_mdrun():
         with _misc.HiddenPrints(verbose=verbose):
-            _gmx.grompp(f="../ions.mdp", o="ions.tpr", c="solvent.gro", p="topol.top", verbose=verbose_gmx)
-            _gmx.genion(s="ions.tpr", o="ions.gro", p="topol.top", verbose=False)
+            if nsteps is not None:
+                kwargs["nsteps"] = nsteps
+            _gmx.mdrun(deffnm=f"{rex_dir}/em", verbose=verbose, **kwargs)
+            _gmx.clean_up(rex_dir, verbose=False)
+
+    # 5) energy minimization
+    STEPS = [
+        {"name": "grompp_em", "msg": "Performing energy minimization...", "func": step_grompp,
+         "params": {},
+         "inputs": [f"{mdp_dir}/min.mdp", f"{rex_dir}/ions.gro", f"{rex_dir}/topol.top"],
+         "outputs": [f"{rex_dir}/em.tpr"]},
+        {"name": "mdrun_em", "msg": "", "func": step_mdrun,
+         "params": {"nsteps": nsteps},
+         "inputs": [f"{rex_dir}/em.tpr"],
+         "outputs": [f"{rex_dir}/em.gro"]}]
+    _HELP_run_REX_steps(rex_dir, STEPS, resume=resume)
+    return
+
+
+def _HELP_REX_worker(job):
+    """
+    Worker of _HELP_run_REX_jobs(). Executes func(rex_dir, *args, **kwargs) and
+    redirects all prints into the log file <rex_dir>/logs/<logfile>.
 
+    Returns:
+        rex_dir (str)
+            rex directory
+        error (None, str)
+            traceback if func failed, else None
+    """
+    func, rex_dir, args, kwargs, logfile = job
+    logfile = _misc.joinpath(_misc.mkdir(f"{rex_dir}/logs"), logfile)
+    with open(logfile, "w") as fout, contextlib.redirect_stdout(fout):
+        try:
+            func(rex_dir, *args, **kwargs)
+            return rex_dir, None
+        except Exception:
+            error = traceback.format_exc()
+            print(error)
+            return rex_dir, error
+
+
+def _HELP_run_REX_jobs(func, rex_dirs, args, kwargs, n_jobs=1, logfile="rex.log"):
+    """
+    Execute func(rex_dir, *args, **kwargs) for each rex_dir.
+
+      - n_jobs=1: run sequentially and raise errors immediately.
+      - n_jobs>1: run concurrently in a bounded pool of worker processes. The
+        output of each replica is saved as <rex_dir>/logs/<logfile>. Failed
+        replicas do not abort the other replicas; an Error listing the failed
+        replicas is raised after all replicas have finished.
+
+    Args:
+        func (function): replica function with rex_dir as first argument
+        rex_dirs (list): list with rex_dirs
+        args (tuple): further positional arguments of func
+        kwargs (dict): keyword arguments of func
+        n_jobs (int):
+          | number of concurrent replicas
+          | -1 or None: use all available cores
+        logfile (str): log file name (only used for n_jobs>1)
+    """
+    if n_jobs in [-1, None]:
+        n_jobs = os.cpu_count()
+    if n_jobs == 1:
+        for rex_dir in rex_dirs:
+            func(rex_dir, *args, **kwargs)
+        return
+
+    JOBS = [(func, os.path.realpath(rex_dir), args, kwargs, logfile) for rex_dir in rex_dirs]
+    FAILED = []
+    if len(JOBS) != 0:
+        with multiprocessing.get_context().Pool(min(n_jobs, len(JOBS))) as pool:
+            for rex_dir, error in tqdm(pool.imap_unordered(_HELP_REX_worker, JOBS), total=len(JOBS)):
+                if error is not None:
+                    FAILED.append(rex_dir)
+                    _misc.cprint(f"Replica failed: {rex_dir} (see {rex_dir}/logs/{logfile})", "red")
+    if len(FAILED) != 0:
+        raise _misc.Error(f"{len(FAILED)}/{len(JOBS)} replica failed: {sorted(FAILED)}")
+    return
+
+
+def WF_REX_setup(rex_dirs, boxsize, maxsol, ff='amber99sb-ildn', water='tip3p',
+                 ignh=True, verbose=False, verbose_gmx=False, n_jobs=1, resume=True):
+    """
+    Workflow: REX setup (without energy minimization)
+
+    .. Note:: The working directory is not changed. The file ions.mdp is
+      expected in the parent directory of each rex_dir. Completed steps are
+      recorded in <rex_dir>/rex_manifest.json (see load_REX_manifest()).
+
+    Args:
+        rex_dirs (list): list with rex_dirs (output of rex.get_REX_DIRS())
+        boxsize (float): suggested boxsize parameter (output of gmx.WF_getParameter_boxsize())
+        maxsol (int): suggested max solution parameter (output of gmx.WF_getParameter_max_solution())
+        ff (str):
+          | force field (see <GROMACS_path>/top/<ff> for valid inputs)
+          | "amber99sb-ildn" etc. for proteins
+          | "amber14sb_OL15" etc. for RNAs
+        water (str): water model
+        ignh (bool): ignore hydrogen
+        verbose (bool): show blue log messages (saved file as, saved log as)
+        verbose_gmx (bool): show gmx module messages (requires verbose=True)
+        n_jobs (int):
+          | number of replicas which are set up concurrently
+          | 1: sequential setup
+          | -1 or None: use all available cores
+          | n_jobs>1: output of each replica is saved as <rex_dir>/logs/WF_REX_setup.log
+        resume (bool):
+          | True: skip steps whose parameters, input and output files are unchanged
+            since their last execution, i.e. only invalidated steps are executed again
+          | False: execute all steps
+    """
+    _HELP_run_REX_jobs(_HELP_REX_setup_replica, rex_dirs, args=(boxsize, maxsol),
+                       kwargs={"ff": ff, "water": water, "ignh": ignh, "verbose": verbose,
+                               "verbose_gmx": verbose_gmx, "resume": resume},
+                       n_jobs=n_jobs, logfile="WF_REX_setup.log")
     _misc.cprint("#######################################################################################")
-    _misc.cd("..")
     _misc.cprint("Finished setup of all REX DIRS (skipped energy minimization).", "green")
     return
 
 
-def WF_REX_setup_energy_minimization(rex_dirs, nsteps=None, verbose=False):
+def WF_REX_setup_energy_minimization(rex_dirs, nsteps=None, verbose=False, n_jobs=1,
+                                     resume=True, **kwargs):
     """
     Workflow: REX energy minimization
 
+    .. Note:: The working directory is not changed. The file min.mdp is
+      expected in the parent directory of each rex_dir. Completed steps are
+      recorded in <rex_dir>/rex_manifest.json (see load_REX_manifest()).
+
     Args:
         rex_dirs (list): list with rex_dirs (output of rex.get_REX_DIRS())
         nsteps (None,int):
@@ -554,23 +912,56 @@ def WF_REX_setup_energy_minimization(rex_dirs, nsteps=None, verbose=False):
           | None: use .mdp option
           | int: use instead of .mdp option
         verbose (bool): show/hide GROMACS output
-    """
-    for rex_dir in rex_dirs:
-        _misc.cprint("#######################################################################################")
-        _misc.cd(rex_dir)
-
-        # 5) energy minimization
-        _misc.cprint("Performing energy minimization...", "red")
-        with _misc.HiddenPrints(verbose=verbose):
-            _ = _gmx.grompp(f="../min.mdp", o="em.tpr", c="ions.gro", p="topol.top")
-            if nsteps is None:
-                _gmx.mdrun(deffnm="em", verbose=verbose)
-            else:
-                _gmx.mdrun(deffnm="em", nsteps=nsteps, verbose=verbose)
-            _gmx.clean_up("./", verbose=False)
+        n_jobs (int):
+          | number of concurrent mdrun jobs
+          | 1: sequential energy minimization
+          | -1 or None: use all available cores
+          | n_jobs>1: output of each replica is saved as
+            <rex_dir>/logs/WF_REX_setup_energy_minimization.log
+        resume (bool):
+          | True: skip steps whose parameters, input and output files are unchanged
+            since their last execution
+          | False: execute all steps
 
+    Keyword Args:
+        n_cores (None, int): core budget which is split across concurrent mdrun
+          jobs. None: use all available cores.
+        ntomp (None, int, str):
+          | OpenMP threads per mdrun job
+          | "auto": n_cores//n_jobs if n_jobs>1, else use GROMACS default
+          | None: use GROMACS default
+        ntmpi (None, int, str):
+          | thread-MPI ranks per mdrun job
+          | "auto": 1 if n_jobs>1, else use GROMACS default
+          | None: use GROMACS default (required for MPI builds, i.e. gmx_mpi)
+    """
+    default = {"n_cores": None,
+               "ntomp": "auto",
+               "ntmpi": "auto"}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    if n_jobs in [-1, None]:
+        n_jobs = os.cpu_count()
+    n_cores = os.cpu_count() if cfg.n_cores is None else cfg.n_cores
+    n_jobs = max(1, min(n_jobs, n_cores, len(rex_dirs)))
+
+    mdrun_kwargs = {}
+    if cfg.ntomp == "auto":
+        if n_jobs > 1:
+            mdrun_kwargs["ntomp"] = max(1, n_cores//n_jobs)
+    elif cfg.ntomp is not None:
+        mdrun_kwargs["ntomp"] = cfg.ntomp
+    if cfg.ntmpi == "auto":
+        if n_jobs > 1:
+            mdrun_kwargs["ntmpi"] = 1
+    elif cfg.ntmpi is not None:
+        mdrun_kwargs["ntmpi"] = cfg.ntmpi
+
+    mdrun_kwargs["resume"] = resume
+    _HELP_run_REX_jobs(_HELP_REX_energy_minimization_replica, rex_dirs, args=(nsteps, verbose),
+                       kwargs=mdrun_kwargs, n_jobs=n_jobs,
+                       logfile="WF_REX_setup_energy_minimization.log")
     _misc.cprint("#######################################################################################")
-    _misc.cd("..")
     _misc.cprint("Finished energy minimization of all REX DIRS.", "green")
     return
 
@@ -732,7 +1123,7 @@ def prep_REX_temps(T_0=None, n_REX=None, k=None):
     print(DELTA_DELTA)
 
 
-def prep_REX_mdp(main_dir="./", template="rex.mdp", n_REX=None, verbose=True):
+def prep_REX_mdp(main_dir="./", template="rex.mdp", n_REX=None, verbose=True, resume=True):
     """
     Prepare REX mdp -> copy template and change tempereratures according to rex_temps.log
 
@@ -741,6 +1132,9 @@ def prep_REX_mdp(main_dir="./", template="rex.mdp", n_REX=None, verbose=True):
         template (str): template file
         n_REX (None/int): number of replica
         verbose (bool)
+        resume (bool):
+          | True: skip replicas whose template, temperature and mdp file are unchanged
+          | False: create all mdp files
     """
     with open("rex_temps.log", "r") as fin:
         for line in fin:
@@ -755,24 +1149,33 @@ def prep_REX_mdp(main_dir="./", template="rex.mdp", n_REX=None, verbose=True):
         print("Enter n_REX:", n_REX)
     print(f"Using {template} as template and changing temperatures according to rex_temps.log...")
 
+    template_path = _misc.joinpath(main_dir, template)
     for i in range(1, n_REX+1):
         file_path = _misc.mkdir("rex_" + str(i))
-        with open(_misc.joinpath(main_dir, template), "r") as fin, open(file_path + f"/{template}", "w") as fout:
-            if verbose:
-                print("Saved mdp file as: " + file_path + f"/{template}")
-
-            for line in fin:
-                if "ref_t" in line:
-                    fout.write("ref_t   = %s       %s         ; reference temperature, one for each group, in K\n" % (REX_TEMPS[i-1], REX_TEMPS[i-1]))
-                elif "gen_temp" in line:
-                    fout.write("gen_temp = %s  ; temperature for Maxwell distribution\n" % (REX_TEMPS[i-1]))
-                else:
-                    fout.write(line)
 
+        def step_mdp(i=i, file_path=file_path):
+            with open(template_path, "r") as fin, open(file_path + f"/{template}", "w") as fout:
+                if verbose:
+                    print("Saved mdp file as: " + file_path + f"/{template}")
+
+                for line in fin:
+                    if "ref_t" in line:
+                        fout.write("ref_t   = %s       %s         ; reference temperature, one for each group, in K\n" % (REX_TEMPS[i-1], REX_TEMPS[i-1]))
+                    elif "gen_temp" in line:
+                        fout.write("gen_temp = %s  ; temperature for Maxwell distribution\n" % (REX_TEMPS[i-1]))
+                    else:
+                        fout.write(line)
+
+        STEPS = [{"name": "prep_mdp", "msg": "", "func": step_mdp,
+                  "params": {"T": REX_TEMPS[i-1]},
+                  "inputs": [template_path],
+                  "outputs": [f"{file_path}/{template}"]}]
+        with _misc.HiddenPrints(verbose=verbose):
+            _HELP_run_REX_steps(file_path, STEPS, resume=resume)
     return
 
 
-def prep_REX_tpr(main_dir="./", n_REX=None, verbose=False, **kwargs):
+def prep_REX_tpr(main_dir="./", n_REX=None, verbose=False, resume=True, **kwargs):
     """
     Prepare REX tpr.
 
@@ -780,6 +1183,9 @@ def prep_REX_tpr(main_dir="./", n_REX=None, verbose=False, **kwargs):
         main_dir (str): main directory with rex_1, rex_2, etc.
         n_REX (None/int): number of replica
         verbose (bool)
+        resume (bool):
+          | True: skip replicas whose mdp, structure, topology and tpr files are unchanged
+          | False: create all tpr files
 
     Keyword Args:
         f (str)
@@ -805,9 +1211,187 @@ def prep_REX_tpr(main_dir="./", n_REX=None, verbose=False, **kwargs):
 
     for ndx, rex_dir in enumerate(rex_dirs[:n_REX], start=1):
         _misc.cprint("#######################################################################################")
-        _gmx.grompp(f=f"{rex_dir}/{cfg.f}", o=f"{rex_dir}/{cfg.o}",
-                    c=f"{rex_dir}/{cfg.c}", p=f"{rex_dir}/{cfg.p}",
-                    verbose=verbose)
+
+        def step_grompp(rex_dir=rex_dir):
+            _gmx.grompp(f=f"{rex_dir}/{cfg.f}", o=f"{rex_dir}/{cfg.o}",
+                        c=f"{rex_dir}/{cfg.c}", p=f"{rex_dir}/{cfg.p}",
+                        verbose=verbose)
+
+        STEPS = [{"name": "grompp_rex", "msg": "", "func": step_grompp,
+                  "params": {},
+                  "inputs": [f"{rex_dir}/{cfg.f}", f"{rex_dir}/{cfg.c}", f"{rex_dir}/{cfg.p}"],
+                  "outputs": [f"{rex_dir}/{cfg.o}"]}]
+        _HELP_run_REX_steps(rex_dir, STEPS, resume=resume)
 
     _misc.cprint(f"Finished REX tpr creation for REX DIRS (i=1..{n_REX}).", "green")
     return
+
+
+################################################################################
+################################################################################
+### REX analysis functions
+
+
+def _HELP_analyze_replica(job):
+    """
+    Worker of analyze_REX(). Loads the universe of a single replica and executes
+    func(u, *args, **kwargs) for each entry of the analysis spec.
+
+    Returns:
+        ndx (int)
+            replica index
+        RESULTS (None, dict)
+            dict with results of each analysis or None if the replica failed
+        error (None, str)
+            traceback of the failed replica or None
+    """
+    ndx, rex_dir, spec, top, traj = job
+    try:
+        TOP = sorted(glob.glob(f"{rex_dir}/{top}"))
+        TRAJ = sorted(glob.glob(f"{rex_dir}/{traj}"))
+        if len(TOP) == 0 or len(TRAJ) == 0:
+            raise _misc.Error(f"No files matching top='{top}' and traj='{traj}' found in {rex_dir}.")
+        u = Universe(TOP[0], TRAJ[0])
+
+        RESULTS = {}
+        for name, (func, args, kwargs) in spec.items():
+            RESULTS[name] = func(u, *args, **kwargs)
+        return ndx, RESULTS, None
+    except Exception:
+        return ndx, None, traceback.format_exc()
+
+
+def _HELP_stack_replica_results(VALUES):
+    """
+    Stack the values of a single result item along a new replica axis. Values of
+    failed replicas (None) and values with smaller shapes are padded with NaN.
+
+    Args:
+        VALUES (list): list with array-like values or None for each replica
+
+    Returns:
+        STACK (array)
+            stacked array with shape (n_replica, ...)
+    """
+    ARRAYS = [None if item is None else np.asarray(item) for item in VALUES]
+    SHAPES = [item.shape for item in ARRAYS if item is not None]
+    DTYPES = [item.dtype for item in ARRAYS if item is not None]
+    if len(set(SHAPES)) == 1 and len(SHAPES) == len(ARRAYS) and len(set(DTYPES)) == 1:
+        return np.stack(ARRAYS)
+
+    ndim = max(len(shape) for shape in SHAPES)
+    shape = tuple(max(shape[i] for shape in SHAPES if len(shape) == ndim) for i in range(ndim))
+    STACK = np.full((len(ARRAYS),)+shape, np.nan, dtype=np.float64)
+    for i, item in enumerate(ARRAYS):
+        if item is not None and item.ndim == ndim:
+            STACK[(i,)+tuple(slice(0, n) for n in item.shape)] = item
+    return STACK
+
+
+def analyze_REX(rex_dirs, spec, n_jobs=-1, save_as="rex_analysis.h5", verbose=True, **kwargs):
+    """
+    Apply the same analysis functions to each replica of a REX run in parallel
+    and save the results stacked along a replica axis into a single h5 file.
+
+    Each replica is processed in a separate worker process which loads the
+    universe from the replica directory and executes func(u, *args, **kwargs) for
+    each entry of spec. Failed replicas (e.g. missing trajectory) do not abort the
+    other replicas; their values are NaN and their tracebacks are logged.
+
+    .. Note:: Analysis functions must be picklable (i.e. module-level functions
+      such as gdt.GDT, analyze.get_RMSD, contacts.get_QNative or contacts.get_QBias).
+      The keywords plot and verbose are set to False unless specified in spec.
+      Nested parallelization (n_jobs > 1 within the analysis functions) is not
+      supported inside the worker processes.
+
+    Args:
+        rex_dirs (list): output of get_REX_DIRS()
+        spec (dict):
+          | analysis spec with name: (func, args, kwargs)
+          | args and kwargs are optional, i.e. name: func is also valid
+          | name (str): name of the h5 group
+          | func (function): analysis function with universe as first argument
+          | args (tuple): further positional arguments of func
+          | kwargs (dict): keyword arguments of func
+        n_jobs (int):
+          | number of worker processes
+          | -1 or None: use all available cores
+        save_as (str): save name of h5 file
+        verbose (bool): show progress bar and failed replicas
+
+    Keyword Args:
+        top (str): glob pattern of topology file in each rex_dir (first match is used)
+        traj (str): glob pattern of trajectory file in each rex_dir (first match is used)
+        cprint_color (str)
+
+    Returns:
+        h5_file (str)
+            path of h5 file with
+
+          - "rex_dirs": replica directories
+          - "failed": bool array, True if replica failed
+          - "<name>/<j>": j-th return value of analysis <name> with shape
+            (n_replica, ...). Tuples/lists of return values are split into
+            separate datasets, non-numeric return values are skipped.
+          - attribute "errors" of "failed": tracebacks of failed replicas
+    """
+    default = {"top": "*.pdb",
+               "traj": "*.xtc",
+               "cprint_color": "red"}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    SPEC = {}
+    for name, item in spec.items():
+        if not isinstance(item, (tuple, list)):
+            item = (item,)
+        func = item[0]
+        args = tuple(item[1]) if len(item) > 1 else ()
+        func_kwargs = dict(item[2]) if len(item) > 2 else {}
+        params = inspect.signature(func).parameters
+        for key in ["plot", "verbose"]:
+            if key in params:
+                func_kwargs.setdefault(key, False)
+        SPEC[name] = (func, args, func_kwargs)
+
+    if n_jobs in [-1, None]:
+        n_jobs = os.cpu_count()
+    JOBS = [(ndx, rex_dir, SPEC, cfg.top, cfg.traj) for ndx, rex_dir in enumerate(rex_dirs)]
+    RESULTS = [None]*len(JOBS)
+    ERRORS = [""]*len(JOBS)
+    if len(JOBS) != 0:
+        with multiprocessing.get_context().Pool(max(1, min(n_jobs, len(JOBS)))) as pool:
+            for ndx, result, error in tqdm(pool.imap_unordered(_HELP_analyze_replica, JOBS),
+                                           total=len(JOBS), disable=not verbose):
+                RESULTS[ndx] = result
+                if error is not None:
+                    ERRORS[ndx] = error
+                    if verbose:
+                        _misc.cprint(f"Replica failed: {rex_dirs[ndx]}", cfg.cprint_color)
+
+    # write stacked results
+    if _misc.get_extension(save_as) != ".h5":
+        save_as += ".h5"
+    h5_file = os.path.realpath(save_as)
+    with h5py.File(h5_file, "w") as handle:
+        handle.create_dataset("rex_dirs", data=np.array(rex_dirs, dtype=h5py.string_dtype()))
+        failed = handle.create_dataset("failed", data=np.array([item is None for item in RESULTS], dtype=bool))
+        failed.attrs["errors"] = np.array(ERRORS, dtype=h5py.string_dtype())
+        for name in SPEC:
+            VALUES = [None if item is None else item[name] for item in RESULTS]
+            VALUES = [item if item is None or isinstance(item, (tuple, list)) else (item,) for item in VALUES]
+            n_items = max([len(item) for item in VALUES if item is not None], default=0)
+            group = handle.create_group(name)
+            for j in range(n_items):
+                ITEM = [None if item is None or j >= len(item) else item[j] for item in VALUES]
+                try:
+                    STACK = _HELP_stack_replica_results(ITEM)
+                except (ValueError, TypeError):
+                    continue
+                if STACK.dtype.kind not in "biuf":
+                    continue
+                group.create_dataset(str(j), data=STACK)
+    if verbose:
+        n_failed = sum([item is None for item in RESULTS])
+        print(f"Analyzed {len(RESULTS)-n_failed}/{len(RESULTS)} replica.")
+        print(f"Saved h5 file as: {h5_file}")
+    return h5_file
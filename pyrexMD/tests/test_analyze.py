@@ -11,6 +11,7 @@ import MDAnalysis as mda
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
+import h5py
 from numpy.testing import assert_allclose
 from Bio.PDB.PDBExceptions import PDBConstructionWarning
 from unittest.mock import patch
@@ -72,6 +73,37 @@ def test_get_RMSD(mock_show):
     return
 
 
+def test_get_RMSD_batched():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    ref = mda.Universe(pdb)
+    val = ana.get_RMSD(mobile, ref, sel1='backbone', sel2='backbone', weights=None, batched=True, block_size=4)
+    expected = np.load(f"{pre}/get_RMSD.npy")
+    assert assert_allclose(val[0], expected[0]) == None
+    assert assert_allclose(val[1], expected[1]) == None
+    assert assert_allclose(val[2], expected[2]) == None
+
+    # weights are honored
+    val = ana.get_RMSD(mobile, ref, sel1='backbone', sel2='backbone', weights="mass", batched=True)
+    assert np.any(val[2] != expected[2])
+
+    # prefetch blocks in background thread
+    val = ana.get_RMSD(mobile, ref, sel1='backbone', sel2='backbone', weights=None, batched=True, block_size=4, prefetch=2)
+    assert assert_allclose(val[1], expected[1]) == None
+    assert assert_allclose(val[2], expected[2]) == None
+    return
+
+
+def test_get_RMSD_parallel():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    ref = mda.Universe(pdb)
+    val = ana.get_RMSD(mobile, ref, sel1='backbone', sel2='backbone', n_jobs=2)
+    expected = np.load(f"{pre}/get_RMSD.npy")
+    assert assert_allclose(val[0], expected[0]) == None
+    assert assert_allclose(val[1], expected[1]) == None
+    assert assert_allclose(val[2], expected[2]) == None
+    return
+
+
 @patch("matplotlib.pyplot.show")
 def test_get_RMSF(mock_show):
     mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
@@ -132,6 +164,52 @@ def test_get_Distance_Matrices():
     return
 
 
+def test_get_Contact_Pair_Distances():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    DM = ana.get_Distance_Matrices(mobile, stop=10)
+    pairs = [(1, 5), (2, 10), (3, 20)]
+    val = ana.get_Contact_Pair_Distances(mobile, pairs, stop=10)
+    assert val.shape == (10, 3)
+    assert_allclose(val, np.array([DM[:, i-1, j-1] for i, j in pairs]).T, rtol=1e-5)
+    val = ana.get_Contact_Pair_Distances(mobile, pairs, sel="protein", method="shortest_distance", stop=10)
+    assert val.shape == (10, 3)
+    assert np.all(val <= np.array([DM[:, i-1, j-1] for i, j in pairs]).T + 1e-3)
+    return
+
+
+def test_get_Distance_Matrices_h5():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    h5_file = ana.get_Distance_Matrices(mobile, save_as="./temp.h5", block_size=4, compression="gzip")
+    with h5py.File(h5_file, "r") as handle:
+        val = np.array(handle["/distance_matrices"])
+    expected = np.load(f"{pre}/get_Distance_Matrices.npy")
+    assert assert_allclose(val, expected) == None
+
+    # coverage
+    h5_file = ana.get_Distance_Matrices(mobile, flatten=True, save_as="./temp", stop=5)
+    with h5py.File(h5_file, "r") as handle:
+        assert handle["/distance_matrices"].shape == (5, 400)
+    misc.rm(h5_file)
+    return
+
+
+def test_get_Distance_Matrices_condensed():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    val = ana.get_Distance_Matrices(mobile, condensed=True)
+    expected = np.load(f"{pre}/get_Distance_Matrices.npy")
+    iu = np.triu_indices(expected.shape[-1], k=1)
+    assert val.shape == (len(expected), len(iu[0]))
+    assert assert_allclose(val, expected[:, iu[0], iu[1]], rtol=1e-6) == None
+
+    # coverage
+    h5_file = ana.get_Distance_Matrices(mobile, condensed=True, save_as="./temp.h5")
+    with h5py.File(h5_file, "r") as handle:
+        assert handle["/distance_matrices"].attrs["condensed"]
+        assert tuple(handle["/distance_matrices"].attrs["shape"]) == expected.shape
+    misc.rm(h5_file)
+    return
+
+
 def test_get_shortest_RES_distances():
     ref = mda.Universe(pdb)
     val = ana.get_shortest_RES_distances(ref, sel="protein")
@@ -142,6 +220,17 @@ def test_get_shortest_RES_distances():
     # coverage
     ana.get_shortest_RES_distances(pdb, sel="protein")          # type string
     ana.get_shortest_RES_distances(ref.atoms, sel="protein")    # type atom grp
+
+    # neighbor search within cutoff
+    SD, SD_d = ana.get_shortest_RES_distances(ref, sel="protein", cutoff=6.0, detailed=False)
+    assert SD_d is None
+    mask = expected[0] <= 6.0
+    assert assert_allclose(SD[mask], expected[0][mask], rtol=1e-5) == None
+    assert np.all(np.isinf(SD[~mask]))
+
+    # selections which do not start with the first RES
+    SD, _ = ana.get_shortest_RES_distances(ref, sel="protein and resid 5-10", detailed=False)
+    assert assert_allclose(SD, expected[0][4:10, 4:10]) == None
     return
 
 
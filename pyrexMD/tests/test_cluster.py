@@ -10,7 +10,9 @@ import pytest
 import pathlib
 from unittest.mock import patch
 import numpy as np
+import MDAnalysis as mda
 import pyrexMD.misc as misc
+import pyrexMD.analysis.analyze as ana
 import pyrexMD.analysis.cluster as clu
 
 
@@ -25,6 +27,7 @@ print(f"cwd: {cwd}")
 pre = f"{main_dir}"
 pre2 = f"{main_dir}/examples/files/cluster"
 pre3 = f"{main_dir}/examples/files/rex"
+pre4 = f"{main_dir}/tests/files/1l2y"
 
 
 def test_get_decoy_list():
@@ -173,6 +176,36 @@ def test_reshape_data():
     return
 
 
+def test_condensed_h5():
+    h5_file = f"{pre2}/DM.h5"
+    DM = clu.read_h5(h5_file)
+
+    h5_file2 = clu.save_h5(DM, save_as="./temp.h5", condensed=True)
+    assert clu.is_condensed_h5(h5_file2)
+    assert not clu.is_condensed_h5(clu.save_h5(DM[:10], save_as="./temp2.h5"))
+    DM2 = clu.read_h5(h5_file2)
+    assert DM2.shape == (500, 84*83//2)
+    assert np.all(clu.read_h5(h5_file2, expand=True) == DM)
+    assert np.all(clu.reshape_data(DM2, dim_out=3, condensed=True) == DM)
+    assert np.all(clu.reshape_data(DM, dim_out=2, condensed=True) == DM2)
+
+    # condensed and square distance matrices yield same results
+    labels = [0]*250 + [1]*250
+    CENTROIDS = clu.get_DM_centroids(DM, labels=labels)
+    assert np.allclose(clu.get_DM_centroids(h5_file2, labels=labels), CENTROIDS)
+    assert np.allclose(clu.get_DM_centroids(DM2, labels=labels, condensed=True), CENTROIDS)
+    WSS_DATA = clu.get_DM_WSS(DM, centers=CENTROIDS, labels=labels)
+    WSS_DATA2 = clu.get_DM_WSS(h5_file2, centers=CENTROIDS, labels=labels)
+    assert np.isclose(WSS_DATA.wss, WSS_DATA2.wss)
+    assert np.allclose(WSS_DATA.sse, WSS_DATA2.sse)
+
+    cluster10 = clu.heat_KMeans(h5_file2, n_clusters=10, stop=100)
+    assert cluster10.centers.shape == (10, 84, 84)
+    misc.rm("./temp.h5")
+    misc.rm("./temp2.h5")
+    return
+
+
 def test_heat_KMeans():
     h5_file = f"{pre2}/DM.h5"
     cluster10 = clu.heat_KMeans(h5_file, n_clusters=10, center_type='centroid')
@@ -199,6 +232,94 @@ def test_heat_KMeans_bestofN():
     cluster_data = TOPX_CLUSTER[0]
     assert len(TOPX_CLUSTER) == 1
     assert isinstance(cluster_data, clu.CLUSTER_DATA)
+
+    # true topx ranking, equal results for concurrent restarts
+    ALL = clu.heat_KMeans_bestofN(h5_file, n_clusters=10, N=4, topx=4, random_state=0, stop=100)
+    TOPX_CLUSTER = clu.heat_KMeans_bestofN(h5_file, n_clusters=10, N=4, topx=2, random_state=0, stop=100, n_jobs=2)
+    assert [item.inertia for item in ALL] == sorted([item.inertia for item in ALL])
+    for item, ref in zip(TOPX_CLUSTER, ALL[:2]):
+        assert item.inertia == ref.inertia
+        assert np.all(item.labels == ref.labels)
+
+    # wss_data is computed from the loaded data
+    wss_data = clu.get_DM_WSS(h5_file, ALL[0].centers, ALL[0].labels, stop=100, rescale=True)
+    assert np.allclose(ALL[0].wss_data.sse, wss_data.sse)
+    return
+
+
+def test_heat_Distance_Matrices():
+    mobile = mda.Universe(f"{pre4}/1l2y_ref.pdb", f"{pre4}/traj.xtc")
+    DM = clu.heat_Distance_Matrices(mobile, stop=10)
+    assert DM.split == 0
+    assert np.allclose(DM.numpy(), ana.get_Distance_Matrices(mobile, stop=10, flatten=True))
+    DM = clu.heat_Distance_Matrices(mobile, condensed=True, save_as="./temp_heat_DM.h5")
+    assert np.allclose(DM.numpy(), ana.get_Distance_Matrices(mobile, condensed=True))
+    assert clu.is_condensed_h5("./temp_heat_DM.h5")
+    assert np.allclose(clu.read_h5("./temp_heat_DM.h5"), DM.numpy())
+    misc.rm("./temp_heat_DM.h5")
+
+    # coverage
+    with pytest.raises(TypeError):
+        clu.heat_Distance_Matrices("wrong_dtype")
+    return
+
+
+def test_WF_heat_clustering():
+    mobile = mda.Universe(f"{pre4}/1l2y_ref.pdb", f"{pre4}/traj.xtc")
+    DM = ana.get_Distance_Matrices(mobile)
+    for condensed in [True, False]:
+        cluster_data = clu.WF_heat_clustering(mobile, n_clusters=3, condensed=condensed, random_state=1)
+        assert isinstance(cluster_data, clu.CLUSTER_DATA)
+        assert cluster_data.centers.shape == (3, 20, 20)
+        assert len(cluster_data.labels) == len(DM)
+        wss_data = clu.get_DM_WSS(DM, cluster_data.centers, cluster_data.labels, rescale=True)
+        assert np.allclose(cluster_data.wss_data.sse, wss_data.sse)
+
+    # distributed centroids and WSS
+    DM2 = clu.heat_Distance_Matrices(mobile, condensed=True, verbose=False)
+    CENTROIDS = clu.get_DM_centroids(DM2, cluster_data.labels, condensed=True)
+    assert np.allclose(CENTROIDS, clu.get_DM_centroids(DM, cluster_data.labels))
+    wss_data = clu.get_DM_WSS(DM, CENTROIDS, cluster_data.labels)
+    wss_data2 = clu.get_DM_WSS(DM2, CENTROIDS, cluster_data.labels, condensed=True)
+    assert np.allclose(wss_data.sse, wss_data2.sse)
+    assert np.allclose(wss_data.se_std, wss_data2.se_std)
+    return
+
+
+def test_minibatch_KMeans():
+    h5_file = f"{pre2}/DM.h5"
+    cluster10 = clu.minibatch_KMeans(h5_file, n_clusters=10, batch_size=100, random_state=0)
+    assert isinstance(cluster10, clu.CLUSTER_DATA)
+    assert cluster10.centers.shape == (10, 84, 84)
+    assert len(cluster10.labels) == 500
+    assert sum(cluster10.counts) == 500
+    assert cluster10.n_iter == 1 + 3*5    # k-means++ sample + 3 epochs of 5 slabs
+
+    # wss_data matches independent streaming computation
+    wss_data = clu.get_DM_WSS(h5_file, cluster10.centers, cluster10.labels, rescale=True)
+    assert np.allclose(cluster10.wss_data.sse, wss_data.sse)
+
+    # reproducible with random_state, condensed h5 files, sss
+    val = clu.minibatch_KMeans(h5_file, n_clusters=10, batch_size=100, random_state=0, verbose=False)
+    assert np.all(val.labels == cluster10.labels)
+    h5_file2 = clu.save_h5(clu.read_h5(h5_file, expand=True), save_as="./temp_minibatch.h5", condensed=True, verbose=False)
+    val = clu.minibatch_KMeans(h5_file2, n_clusters=5, batch_size=30, stop=100, random_state=0, verbose=False)
+    assert val.centers.shape == (5, 84, 84)
+    assert len(val.labels) == 100
+    wss_data = clu.get_DM_WSS(h5_file2, val.centers, val.labels, stop=100, rescale=True)
+    assert np.allclose(val.wss_data.sse, wss_data.sse)
+    misc.rm("./temp_minibatch.h5")
+
+    # trailing slab with fewer than n_clusters data points (105 % 50 = 5 < 10)
+    for random_state in range(6):
+        val = clu.minibatch_KMeans(h5_file, n_clusters=10, batch_size=50, stop=105, random_state=random_state, verbose=False)
+        assert len(val.labels) == 105
+
+    # coverage
+    with pytest.raises(TypeError):
+        clu.minibatch_KMeans(["wrong_dtype"], n_clusters=10)
+    with pytest.raises(ValueError):
+        clu.minibatch_KMeans(h5_file, n_clusters=20, stop=10)
     return
 
 
@@ -234,6 +355,47 @@ def test_get_DM_WSS():
     return
 
 
+def test_get_DM_WSS_blocks():
+    h5_file = f"{pre2}/DM.h5"
+    DM = clu.read_h5(h5_file)
+    labels = [0, 1, 2]*100
+
+    # block-wise processing yields same results as processing everything at once
+    CENTROIDS = clu.get_DM_centroids(DM, labels=labels, block_size=1000)
+    assert np.allclose(clu.get_DM_centroids(h5_file, labels=labels, block_size=7), CENTROIDS)
+    WSS_DATA = clu.get_DM_WSS(DM, centers=CENTROIDS, labels=labels, stop=300, block_size=1000)
+    WSS_DATA2 = clu.get_DM_WSS(h5_file, centers=CENTROIDS, labels=labels, stop=300, block_size=7)
+    assert np.isclose(WSS_DATA.wss, WSS_DATA2.wss)
+    assert np.allclose(WSS_DATA.sse, WSS_DATA2.sse)
+    assert np.allclose(WSS_DATA.se_mean, WSS_DATA2.se_mean)
+    assert np.allclose(WSS_DATA.se_std, WSS_DATA2.se_std)
+
+    # labels must match the frames of DM[start:stop:step]
+    with pytest.raises(ValueError):
+        clu.get_DM_WSS(h5_file, centers=CENTROIDS, labels=labels)
+    with pytest.raises(ValueError):
+        clu.get_DM_WSS(DM, centers=CENTROIDS, labels=labels, stop=299)
+    clu.get_DM_WSS(DM, centers=CENTROIDS, labels=labels[::2], stop=300, step=2)
+    return
+
+
+def test_benchmark_precision():
+    h5_file = f"{pre2}/DM.h5"
+    DTYPES, DM_ERROR, WSS, WSS_ERROR, LABELS_ARI, TIME = clu.benchmark_precision(h5_file, n_clusters=5, stop=100)
+    assert DTYPES == ["float64", "float32", "float16"]
+    assert DM_ERROR[0] == 0 and WSS_ERROR[0] == 0 and LABELS_ARI[0] == 1
+    assert DM_ERROR[1] < DM_ERROR[2]
+    assert not os.path.exists("./benchmark_float16.h5")
+
+    # coverage
+    DM = clu.read_h5(h5_file)
+    h5_file = clu.save_h5(DM[:10], save_as="./temp.h5", dtype=np.float16)
+    assert clu.read_h5(h5_file).dtype == np.float16
+    clu.apply_TSNE(clu.read_h5(h5_file), perplexity=5, dtype=np.float32)
+    misc.rm(h5_file)
+    return
+
+
 def test_get_WSS():
     h5_file = f"{pre2}/DM.h5"
     DM = clu.read_h5(h5_file)
@@ -262,6 +424,32 @@ def test_apply_elbow_method(mock_show):
     for item in WSS:
         assert isinstance(item, float)
 
+    # unsorted cluster numbers, warm starts, concurrent chains
+    n_clusters = [5, 1, 3, 9, 7]
+    N_CLUSTERS, WSS, TIME, N_ITER = clu.apply_elbow_method(h5_file, n_clusters=n_clusters, random_state=1,
+                                                           plot=False, return_stats=True)
+    assert N_CLUSTERS == n_clusters
+    assert len(TIME) == len(N_ITER) == len(n_clusters)
+    assert all(item >= 1 for item in N_ITER)
+    assert WSS[1] == max(WSS)
+    val = clu.apply_elbow_method(h5_file, n_clusters=n_clusters, random_state=1, plot=False, n_jobs=2)
+    assert val[0] == N_CLUSTERS
+    assert len(val[1]) == len(WSS)
+
+    # results of cold starts are the same as heat_KMeans() with the same random state
+    N_CLUSTERS, WSS = clu.apply_elbow_method(h5_file, n_clusters=[3], random_state=1, plot=False, warm_start=False)
+    cluster_data = clu.heat_KMeans(h5_file, n_clusters=3, random_state=1, verbose=False)
+    assert WSS[0] == cluster_data.wss_data.wss
+
+    # warm starts keep the centers of smaller n
+    cluster_data = clu.heat_KMeans(h5_file, n_clusters=2, random_state=1, verbose=False)
+    data, condensed = clu._HELP_heat_load(h5_file, "/distance_matrices",
+                                          misc.CONFIG({"dtype": np.float64, "start": None, "stop": None, "step": None}),
+                                          verbose=False)
+    init = clu._HELP_warm_start_centers(data, cluster_data, 4, condensed)
+    assert np.shape(init) == (4, np.shape(data)[1])
+    assert np.allclose(init[:2], cluster_data.centers.reshape((2, -1)))
+
     # coverage
     with pytest.raises(TypeError):
         clu.apply_elbow_method(h5_file, n_clusters=10, stop=10)   # wrong dtype of n_clusters
@@ -365,6 +553,49 @@ def test_get_cluster_targets():
     return
 
 
+def test_conformation_index():
+    h5_file = f"{pre2}/DM.h5"
+    DM = clu.read_h5(h5_file)
+    DM_flat = DM.reshape((len(DM), -1))
+    Q = DM[[3, 250]]
+    DIST = np.linalg.norm(DM_flat[None]-Q.reshape((2, 1, -1)), axis=2)
+
+    # exact search if all lists are probed
+    index = clu.build_conformation_index(h5_file, save_as="./temp_index.h5", n_lists=10, random_state=0)
+    assert len(index) == 500
+    FRAMES, D = index.query(Q, k=5, n_probe=10)
+    assert FRAMES.shape == D.shape == (2, 5)
+    assert np.all(FRAMES[:, 0] == [3, 250])
+    assert np.allclose(D, np.sort(DIST, axis=1)[:, :5], atol=1e-3)
+    FRAMES, D = index.query(Q[0], k=5, n_probe=2)
+    assert FRAMES.shape == (5,)
+    assert FRAMES[0] == 3
+
+    # radius queries are exact
+    radius = np.sort(DIST[1])[10]
+    FRAMES, D = index.query_radius(Q, radius=radius)
+    assert len(FRAMES) == 2
+    assert set(FRAMES[1]) == set(np.flatnonzero(DIST[1] <= radius))
+    assert np.all(np.diff(D[1]) >= 0)
+
+    # incremental insertion, persistence, condensed h5 files
+    index2 = clu.load_conformation_index("./temp_index.h5")
+    index2.add(Q)
+    assert len(clu.load_conformation_index("./temp_index.h5")) == 502
+    FRAMES, D = index2.query(Q[1], k=2, n_probe=10)
+    assert set(FRAMES) == {250, 501}
+    with pytest.raises(ValueError):
+        index2.add(Q, frames=[1])
+    h5_file2 = clu.save_h5(DM, save_as="./temp_index_DM.h5", condensed=True, verbose=False)
+    index3 = clu.build_conformation_index(h5_file2, save_as="./temp_index.h5", n_lists=10, n_components=20,
+                                          random_state=0, verbose=False)
+    FRAMES, D = index3.query(Q, k=3)
+    assert np.all(FRAMES[:, 0] == [3, 250])
+    misc.rm("./temp_index.h5")
+    misc.rm("./temp_index_DM.h5")
+    return
+
+
 def test_WF_print_cluster_accuracy_AND_test_WF_print_cluster_scores():
     h5_file = f"{pre2}/DM.h5"
     DM = clu.read_h5(h5_file)
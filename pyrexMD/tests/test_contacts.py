@@ -42,6 +42,27 @@ def test_get_Native_Contacts():
     # coverage
     con.get_Native_Contacts(pdb, sel="protein", ignh=False, method=1, save_as="./temp.txt")
     misc.rm("./temp.txt")
+    with pytest.raises(ValueError):
+        con.get_Native_Contacts(pdb, method="value_raising_error")
+    return
+
+
+def test_get_Native_Contacts_Shadow_Map():
+    ref = mda.Universe(pdb)
+    NC, NC_d = con.get_Native_Contacts(ref, sel="protein", d_cutoff=6.0, method="Shadow_Map")
+    NC_expected = [tuple(item) for item in np.load(f"{pre}/NC.npy")]
+    assert 0 < len(NC) <= len(NC_expected)
+    assert set(NC).issubset(NC_expected)
+
+    # shadow contacts converge to contacts for vanishing shadow radius
+    NC, NC_d = con.get_Native_Contacts(ref, sel="protein", d_cutoff=6.0, method=2,
+                                       shadow_radius=1e-6, shadow_radius_bonded=1e-6)
+    assert NC == NC_expected
+
+    # vectorized shadow map test
+    positions = np.array([[0, 0, 0], [3, 0, 0], [6, 0, 0], [3, 3, 0]], dtype=float)
+    pairs = np.array([[0, 2], [0, 3]])
+    assert np.all(con._HELP_shadow_map(positions, pairs) == [False, True])
     return
 
 
@@ -53,11 +74,16 @@ def test_get_NC_distances(mock_show):
     NC_dist_expected = np.load(f"{pre}/NC_dist.npy")
     DM_expected = np.load(f"{pre}/DM.npy")
 
-    NC, NC_dist, DM = con.get_NC_distances(mobile, ref)
+    NC, NC_dist, DM = con.get_NC_distances(mobile, ref, full_DM=True)
     assert np.all(NC == NC_expected)
     assert assert_allclose(NC_dist, NC_dist_expected) == None
     assert assert_allclose(DM, DM_expected) == None
 
+    # pair distances only
+    NC, NC_dist, PD = con.get_NC_distances(mobile, ref)
+    assert assert_allclose(NC_dist, NC_dist_expected, rtol=1e-6) == None
+    assert assert_allclose(PD, DM_expected[:, NC_expected[:, 0]-1, NC_expected[:, 1]-1], rtol=1e-6) == None
+
     # coverage
     con.get_NC_distances(pdb, pdb, plot=True, save_as="./temp.png")
     misc.rm("./temp.png")
@@ -77,11 +103,16 @@ def test_get_BC_distances(mock_show):
     BC_dist_expected = np.load(f"{pre}/NC_dist.npy")
     DM_expected = np.load(f"{pre}/DM.npy")
 
-    BC, BC_dist, DM = con.get_BC_distances(mobile, bc=BC_expected)
+    BC, BC_dist, DM = con.get_BC_distances(mobile, bc=BC_expected, full_DM=True)
     assert np.all(BC == BC_expected)
     assert assert_allclose(BC_dist, BC_dist_expected) == None
     assert assert_allclose(DM, DM_expected) == None
 
+    # pair distances only
+    BC, BC_dist, PD = con.get_BC_distances(mobile, bc=BC_expected)
+    assert assert_allclose(BC_dist, BC_dist_expected, rtol=1e-6) == None
+    assert PD.shape == (len(mobile.trajectory), len(BC_expected))
+
     # coverage
     con.get_BC_distances(mobile, bc=BC_expected, method="contact_distance", save_as="./temp.txt", plot=True)
     misc.rm("./temp.txt")
@@ -150,16 +181,31 @@ def test_get_QNative(mock_show):
     return
 
 
+def test_get_QNative_parallel():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    ref = mda.Universe(pdb)
+    FRAMES, QNATIVE = con.get_QNative(mobile, ref, sel="protein and name CA", d_cutoff=6.0, plot=False, n_jobs=2)
+
+    assert (FRAMES == np.load(f"{pre}/FRAMES.npy")).all()
+    assert assert_allclose(QNATIVE, np.load(f"{pre}/QNATIVE.npy")) == None
+    return
+
+
 @patch("matplotlib.pyplot.show")
 def test_get_QBias(mock_show):
     mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
     bc = np.load(f"{pre}/NC.npy")
-    FRAMES, QBIAS, CM = con.get_QBias(mobile, bc, d_cutoff=6.0, plot=False, softcut=False)
+    FRAMES, QBIAS, CM = con.get_QBias(mobile, bc, d_cutoff=6.0, plot=False, softcut=False, full_CM=True)
 
     assert (FRAMES == np.load(f"{pre}/FRAMES.npy")).all()
     assert assert_allclose(QBIAS, np.load(f"{pre}/QBIAS.npy"), atol=0.001) == None
     assert (CM == np.load(f"{pre}/CM.npy")).all()
 
+    # bias contact distances only
+    FRAMES, QBIAS, CM_bc = con.get_QBias(mobile, bc, d_cutoff=6.0, plot=False, softcut=False)
+    assert assert_allclose(QBIAS, np.load(f"{pre}/QBIAS.npy"), atol=0.001) == None
+    assert (CM_bc == CM[:, bc[:, 0]-1, bc[:, 1]-1]).all()
+
     # coverage
     con.get_QBias(mobile, bc, d_cutoff=6.0, plot=True, softcut=True, include_selfcontacts=True, save_plot=True, save_as="./temp.png")
     misc.rm("./temp.png")
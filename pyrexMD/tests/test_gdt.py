@@ -107,6 +107,35 @@ def test_GDT():
     return
 
 
+def test_GDT_batched():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    ref = mda.Universe(pdb)
+    GDT1 = gdt.GDT(mobile, ref, batched=False)
+    GDT2 = gdt.GDT(mobile, ref, batched=True, block_size=4)
+
+    assert assert_allclose(GDT1[0], GDT2[0]) == None
+    assert assert_allclose(GDT1[2], GDT2[2]) == None
+    assert assert_allclose(GDT1[3], GDT2[3], rtol=1e-6) == None
+    assert assert_allclose(GDT1[4], GDT2[4]) == None
+    flat1 = misc.flatten_array(GDT1[1])
+    flat2 = misc.flatten_array(GDT2[1])
+    for i in range(len(flat1)):
+        assert (flat1[i] == flat2[i]).all()
+    return
+
+
+def test_GDT_parallel():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    ref = mda.Universe(pdb)
+    GDT_percent, GDT_resids, GDT_cutoff, RMSD, FRAME = gdt.GDT(mobile, ref, n_jobs=2)
+
+    assert assert_allclose(GDT_percent, np.load(f"{pre}/GDT_percent.npy")) == None
+    assert assert_allclose(GDT_cutoff, np.load(f"{pre}/GDT_cutoff.npy")) == None
+    assert assert_allclose(RMSD, np.load(f"{pre}/GDT_RMSD.npy")) == None
+    assert assert_allclose(FRAME, np.load(f"{pre}/GDT_FRAME.npy")) == None
+    return
+
+
 def test_GDT_rna():
     mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
     ref = mda.Universe(pdb)
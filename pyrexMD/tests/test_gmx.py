@@ -37,6 +37,49 @@ def test_get_sel_code():
     return
 
 
+FAKE_GMX = """import sys
+print("args:", " ".join(sys.argv[1:]))
+print("input:", sys.stdin.read().strip())
+sys.stderr.write("step 1\\rstep 2\\rstep 3\\n")
+sys.exit(int(sys.argv[sys.argv.index("-rc")+1]) if "-rc" in sys.argv else 0)
+"""
+
+
+def test_run_gmx():
+    import sys
+    import asyncio
+    with open("./fake_gmx.py", "w") as fout:
+        fout.write(FAKE_GMX)
+    GMX_EXE = gmx.GMX_EXE
+    gmx.GMX_EXE = f"{sys.executable} ./fake_gmx.py"
+
+    LINES = []
+    rc, stdout, stderr = gmx.run_gmx("convert_tpr", input=[1, 1], logfile="./fake_gmx.log",
+                                     callback=lambda line, stream: LINES.append((line, stream)),
+                                     s="a.tpr", v=True, pbc=False, n=None, box=[1, 2])
+    assert rc == 0
+    assert stdout.splitlines() == ["args: convert-tpr -s a.tpr -v -nopbc -box 1 2", "input: 1", "1"]
+    assert stderr.splitlines() == ["step 1", "step 2", "step 3"]
+    assert ("step 2", "stderr") in LINES
+    with open("./fake_gmx.log", "r") as fin:
+        assert "step 3" in fin.read()
+    with pytest.raises(misc.Error):
+        gmx.run_gmx("mdrun", rc=1)
+    assert gmx.run_gmx("mdrun", rc=1, check=False)[0] == 1
+
+    async def run_jobs():
+        JOBS = [gmx.run_gmx_async("mdrun", deffnm=f"em_{i}") for i in range(3)]
+        return await asyncio.gather(*JOBS)
+    RESULTS = asyncio.run(run_jobs())
+    assert [item[1].splitlines()[0] for item in RESULTS] == [f"args: mdrun -deffnm em_{i}" for i in range(3)]
+    assert RESULTS[0][2].splitlines() == ["step 1", "step 2", "step 3"]
+
+    gmx.GMX_EXE = GMX_EXE
+    misc.rm("./fake_gmx.py")
+    misc.rm("./fake_gmx.log")
+    return
+
+
 def test_pdb2gmx():
     ref = gmx.get_ref_structure(pdb, ff='amber99sb-ildn', water='tip3p', ignh=True)
     ofile = gmx.pdb2gmx(f=ref, o="protein.gro", ff='amber99sb-ildn', water='tip3p', ignh=True)
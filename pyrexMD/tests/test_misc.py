@@ -246,6 +246,76 @@ def test_get_quantile():
     return
 
 
+def test_memoize():
+    cache_dir = "./temp_memoize"
+    calls = []
+
+    @misc.memoize(cache_dir=cache_dir)
+    def func(fin, x, scale=1.0, **kwargs):
+        calls.append(x)
+        return np.arange(x)*scale, f"{x}"
+
+    with open("./temp_memoize.txt", "w") as fout:
+        fout.write("1")
+    val = func("./temp_memoize.txt", 3, memoize=True)
+    val2 = func("./temp_memoize.txt", 3, scale=1.0, memoize=True)
+    assert len(calls) == 1
+    assert isinstance(val2, tuple)
+    assert_allclose(val[0], val2[0])
+    assert val[1] == val2[1]
+
+    # different arguments, disabled memoization and modified files are cache misses
+    func("./temp_memoize.txt", 3, scale=2.0, memoize=True)
+    func("./temp_memoize.txt", 3)
+    assert len(calls) == 3
+    os.utime("./temp_memoize.txt", (0, 0))
+    func("./temp_memoize.txt", 3, memoize=True)
+    assert len(calls) == 4
+    assert len(os.listdir(cache_dir)) == 3
+
+    # in-memory trajectories with same topology but different coordinates are cache misses
+    @misc.memoize(cache_dir=cache_dir)
+    def func2(u):
+        calls.append(u)
+        return u.atoms.positions.mean()
+
+    u1 = mda.Universe(f"{pre3}/1l2y.pdb", in_memory=True)
+    u2 = mda.Universe(f"{pre3}/1l2y.pdb", in_memory=True)
+    u2.trajectory.coordinate_array[:] += 4.0
+    val1 = func2(u1, memoize=True)
+    val2 = func2(u2, memoize=True)
+    assert len(calls) == 6
+    assert np.isclose(val2, val1+4.0)
+    func2(u1, memoize=True)
+    assert len(calls) == 6
+
+    # file-backed trajectories: current frame and modified positions are cache misses
+    u3 = mda.Universe(f"{pre}/files/1l2y/traj.tpr", f"{pre}/files/1l2y/traj.xtc")
+    func2(u3, memoize=True)
+    func2(u3, memoize=True)
+    assert len(calls) == 7
+    u3.trajectory[10]
+    val3 = func2(u3, memoize=True)
+    assert len(calls) == 8
+    assert np.isclose(val3, u3.atoms.positions.mean())
+    u4 = mda.Universe(f"{pre3}/1l2y.pdb")
+    func2(u4, memoize=True)
+    u4.atoms.translate([1.0, 1.0, 1.0])
+    func2(u4, memoize=True)
+    assert len(calls) == 10
+
+    # on-the-fly transformations are not memoized
+    u3.trajectory.add_transformations(lambda ts: ts)
+    with pytest.raises(misc.Error):
+        func2(u3, memoize=True)
+
+    misc.clear_memoize_cache(cache_dir)
+    assert len(os.listdir(cache_dir)) == 0
+    os.rmdir(cache_dir)
+    os.remove("./temp_memoize.txt")
+    return
+
+
 def test_autodetect_header():
     assert misc.autodetect_header(f"{pre3}/1l2y.pdb") == 145
     assert misc.autodetect_header(f"{pre}/files/header_file1.txt") == 8
@@ -7,6 +7,12 @@
 
 import pyrexMD.misc as misc
 import pyrexMD.rex as rex
+import pyrexMD.analysis.analyze as ana
+import pyrexMD.analysis.contacts as con
+import MDAnalysis as mda
+import numpy as np
+from numpy.testing import assert_allclose
+import h5py
 import pathlib
 import pytest
 import os
@@ -122,12 +128,49 @@ def test_WF_REX_setup():
     maxsol = rex.WF_getParameter_maxsol(logfile=log2)
 
     rex.WF_REX_setup(rex_dirs=rex_dirs, boxsize=boxsize, maxsol=maxsol)
+    rex.WF_REX_setup(rex_dirs=rex_dirs, boxsize=boxsize, maxsol=maxsol, n_jobs=2)
     return
 
 
 def test_WF_REX_setup_energy_minimization():
     rex_dirs = rex.get_REX_DIRS()[:2]    # use only 2 rex dirs for test
     rex.WF_REX_setup_energy_minimization(rex_dirs=rex_dirs, nsteps=5, verbose=True)
+    rex.WF_REX_setup_energy_minimization(rex_dirs=rex_dirs, nsteps=5, n_jobs=2)
+    return
+
+
+def _write_replica_file(rex_dir, content):
+    if not os.path.isfile(f"{rex_dir}/input.txt"):
+        raise FileNotFoundError(f"{rex_dir}/input.txt")
+    print(f"processing {rex_dir}")
+    with open(f"{rex_dir}/output.txt", "w") as fout:
+        fout.write(content)
+    return
+
+
+def test_HELP_run_REX_jobs():
+    main_dir = "./temp_rex_jobs"
+    rex_dirs = [misc.mkdir(f"{main_dir}/rex_{i}") for i in range(1, 4)]
+    for rex_dir in rex_dirs[:2]:
+        with open(f"{rex_dir}/input.txt", "w") as fout:
+            fout.write("")
+
+    # failed replica (rex_3) does not abort other replicas
+    with pytest.raises(misc.Error):
+        rex._HELP_run_REX_jobs(_write_replica_file, rex_dirs, args=("test",), kwargs={},
+                               n_jobs=2, logfile="test.log")
+    for rex_dir in rex_dirs[:2]:
+        with open(f"{rex_dir}/output.txt", "r") as fin:
+            assert fin.read() == "test"
+        with open(f"{rex_dir}/logs/test.log", "r") as fin:
+            assert f"processing {rex_dir}" in fin.read()
+    with open(f"{rex_dirs[2]}/logs/test.log", "r") as fin:
+        assert "FileNotFoundError" in fin.read()
+
+    # sequential mode raises immediately
+    with pytest.raises(FileNotFoundError):
+        rex._HELP_run_REX_jobs(_write_replica_file, rex_dirs[::-1], args=("test",), kwargs={}, n_jobs=1)
+    shutil.rmtree(main_dir)
     return
 
 
@@ -151,6 +194,81 @@ def test_create_pull_group_ndx():
     return
 
 
+def test_HELP_run_REX_steps():
+    rex_dir = misc.mkdir("./temp_rex_steps")
+    calls = []
+
+    def write(fout, content, mode="w"):
+        def func():
+            calls.append(os.path.basename(fout))
+            with open(f"{rex_dir}/{fout}", mode) as handle:
+                handle.write(content)
+        return func
+
+    def step1(param):
+        def func():
+            write("a.txt", param)()
+            write("top.txt", "1")()
+        return func
+
+    def get_steps(param="A", param2="2"):
+        return [{"name": "step1", "msg": "step1", "func": step1(param),
+                 "params": {"param": param}, "inputs": [f"{rex_dir}/input.txt"],
+                 "outputs": [f"{rex_dir}/a.txt", f"{rex_dir}/top.txt"]},
+                {"name": "step2", "msg": "step2", "func": write("top.txt", param2, mode="a"),
+                 "params": {"param2": param2}, "inputs": [f"{rex_dir}/a.txt"],
+                 "outputs": [f"{rex_dir}/top.txt"]},
+                {"name": "step3", "msg": "step3", "func": write("b.txt", "3"),
+                 "params": {}, "inputs": [f"{rex_dir}/top.txt"],
+                 "outputs": [f"{rex_dir}/b.txt"]}]
+
+    with open(f"{rex_dir}/input.txt", "w") as fout:
+        fout.write("input")
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps()) == 0
+    assert calls == ["a.txt", "top.txt", "top.txt", "b.txt"]
+    assert list(rex.load_REX_manifest(rex_dir).keys()) == ["step1", "step2", "step3"]
+
+    # unchanged inputs and outputs: skip all steps
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps()) == 3
+    assert len(calls) == 4
+
+    # modified output: rerun from step which writes it
+    with open(f"{rex_dir}/b.txt", "w") as fout:
+        fout.write("modified")
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps()) == 2
+    assert calls[4:] == ["b.txt"]
+
+    # step2 modifies top.txt of step1 in place: modified step2 restores snapshot
+    # of step1 and reruns only step2 and following steps
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps(param2="X")) == 1
+    assert calls[5:] == ["top.txt", "b.txt"]
+    with open(f"{rex_dir}/top.txt") as fin:
+        assert fin.read() == "1X"
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps(param2="X")) == 3
+
+    # deleted in place file is restored from snapshot
+    os.remove(f"{rex_dir}/top.txt")
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps(param2="X")) == 3
+    with open(f"{rex_dir}/top.txt") as fin:
+        assert fin.read() == "1X"
+
+    # no valid snapshot: rerun from step1
+    shutil.rmtree(f"{rex_dir}/{rex.REX_SNAPSHOTS}")
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps()) == 0
+    with open(f"{rex_dir}/top.txt") as fin:
+        assert fin.read() == "12"
+
+    # modified parameter or input file invalidates all following steps
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps(param="B")) == 0
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps(param="B")) == 3
+    with open(f"{rex_dir}/input.txt", "w") as fout:
+        fout.write("new input")
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps(param="B")) == 0
+    assert rex._HELP_run_REX_steps(rex_dir, get_steps(param="B"), resume=False) == 0
+    shutil.rmtree(rex_dir)
+    return
+
+
 def test_prep_REX_temps():
     rex.prep_REX_temps(T_0=280, n_REX=50, k=0.005)
     with open(f"{pre2}/rex_temps.log", "r") as expected, open("./rex_temps.log", "r") as val:
@@ -166,6 +284,10 @@ def test_prep_REX_temps():
 
 def test_prep_REX_mdp():
     rex.prep_REX_mdp(n_REX=2)   # use only 2 replicas for test
+    manifest = rex.load_REX_manifest("./rex_1")
+    assert "prep_mdp" in manifest
+    rex.prep_REX_mdp(n_REX=2)   # skips unchanged replicas
+    assert rex.load_REX_manifest("./rex_1") == manifest
     return
 
 
@@ -175,6 +297,36 @@ def test_prep_REX_tpr():
     return
 
 
+def test_analyze_REX():
+    ref_pdb = f"{pre2}/1l2y/1l2y_ref.pdb"
+    traj = f"{pre2}/1l2y/traj.xtc"
+    rex_main_dir = "./temp_rex_analysis"
+    for i in range(1, 4):
+        misc.mkdir(f"{rex_main_dir}/rex_{i}")
+        misc.cp(ref_pdb, f"{rex_main_dir}/rex_{i}/", verbose=False)
+        if i != 2:      # rex_2 has no trajectory and fails
+            misc.cp(traj, f"{rex_main_dir}/rex_{i}/", verbose=False)
+    rex_dirs = rex.get_REX_DIRS(rex_main_dir)
+    ref = mda.Universe(ref_pdb)
+    spec = {"RMSD": (ana.get_RMSD, (ref, "backbone", "backbone")),
+            "QNative": (con.get_QNative, (ref,), {"d_cutoff": 6.0})}
+    h5_file = rex.analyze_REX(rex_dirs, spec, n_jobs=2, save_as=f"{rex_main_dir}/rex_analysis")
+
+    mobile = mda.Universe(ref_pdb, traj)
+    FRAME, TIME, RMSD = ana.get_RMSD(mobile, ref, "backbone", "backbone", verbose=False)
+    FRAMES, QNATIVE = con.get_QNative(mobile, ref, d_cutoff=6.0, plot=False, verbose=False)
+    with h5py.File(h5_file, "r") as handle:
+        assert list(handle["failed"][:]) == [False, True, False]
+        assert "Error" in str(handle["failed"].attrs["errors"][1])
+        assert handle["RMSD/2"].shape == (3, len(RMSD))
+        assert_allclose(handle["RMSD/2"][0], RMSD)
+        assert_allclose(handle["RMSD/2"][2], RMSD)
+        assert np.all(np.isnan(handle["RMSD/2"][1]))
+        assert_allclose(handle["QNative/1"][2], QNATIVE)
+    shutil.rmtree(rex_main_dir)
+    return
+
+
 # clean up at after tests
 def test_clean_up_after_tests():
     misc.rm("*.mdp")
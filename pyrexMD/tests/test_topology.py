@@ -256,6 +256,73 @@ def test_sel2selid():
     return
 
 
+def test_iter_frame_blocks():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    a = mobile.select_atoms("protein and name CA")
+    expected = np.array([a.positions for ts in mobile.trajectory[2:19:3]])
+    expected_time = np.array([ts.time for ts in mobile.trajectory[2:19:3]])
+
+    FRAMES, TIME, COORDS = [], [], []
+    for frames, time, coords in top.iter_frame_blocks(mobile, sel="protein and name CA", sss=[2, 19, 3], block_size=4):
+        assert len(frames) <= 4
+        FRAMES.extend(frames)
+        TIME.extend(time)
+        COORDS.extend(coords.copy())
+    assert FRAMES == list(range(2, 19, 3))
+    assert assert_allclose(TIME, expected_time) == None
+    assert assert_allclose(COORDS, expected, rtol=1e-6) == None
+    assert mobile.trajectory.frame == 0
+
+    # prefetch blocks in background thread (trajectory of mobile is not changed)
+    mobile.trajectory[7]
+    for prefetch in [1, 3]:
+        BLOCKS = [(frames.copy(), time.copy(), coords.copy()) for frames, time, coords in
+                  top.iter_frame_blocks(mobile, sel="protein and name CA", sss=[2, 19, 3], block_size=4, prefetch=prefetch)]
+        assert list(np.concatenate([item[0] for item in BLOCKS])) == FRAMES
+        assert assert_allclose(np.concatenate([item[1] for item in BLOCKS]), expected_time) == None
+        assert assert_allclose(np.concatenate([item[2] for item in BLOCKS]), expected, rtol=1e-6) == None
+    assert mobile.trajectory.frame == 7
+    # stop early
+    for frames, time, coords in top.iter_frame_blocks(mobile, block_size=2, prefetch=1):
+        break
+
+    # pre-resolved atomgroup and explicit frames
+    frames, time, coords = next(top.iter_frame_blocks(a, frames=[5, 1]))
+    assert list(frames) == [5, 1]
+    assert mobile.trajectory.frame == 1
+    assert assert_allclose(coords[1], mobile.select_atoms("protein and name CA").positions) == None
+    return
+
+
+def test_get_cached_coordinates():
+    mobile = mda.Universe(tpr, xtc, tpr_resid_from_one=True)
+    a = mobile.select_atoms("protein and name CA")
+    expected = np.array([a.positions for ts in mobile.trajectory[::2]])
+    cache_dir = "./temp_cache"
+
+    FRAMES, TIME, COORDS = top.get_cached_coordinates(mobile, sel="protein and name CA", sss=[None, None, 2], cache_dir=cache_dir)
+    assert assert_allclose(COORDS, expected) == None
+    assert len(os.listdir(cache_dir)) == 2
+
+    # second call reads memory map from cache
+    FRAMES2, TIME2, COORDS2 = top.get_cached_coordinates(a, step=2, cache_dir=cache_dir)
+    assert isinstance(COORDS2, np.memmap)
+    assert np.all(FRAMES == FRAMES2) and np.all(TIME == TIME2)
+    assert assert_allclose(COORDS2, expected) == None
+
+    # iter_frame_blocks with cache
+    BLOCKS = [coords.copy() for _, _, coords in top.iter_frame_blocks(a, step=2, block_size=4, cache=cache_dir)]
+    assert assert_allclose(np.concatenate(BLOCKS), expected, rtol=1e-6) == None
+
+    # LRU eviction
+    top.get_cached_coordinates(a, cache_dir=cache_dir, max_size=COORDS.nbytes + 2000)
+    assert len(os.listdir(cache_dir)) == 2
+    assert top.clear_coordinate_cache(cache_dir) != []
+    assert os.listdir(cache_dir) == []
+    os.rmdir(cache_dir)
+    return
+
+
 def test_dump_structure():
     ref = mda.Universe(pdb)
     dirpath = top.dump_structure(ref, frames=0, save_as="./temp.pdb")
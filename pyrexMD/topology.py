@@ -16,9 +16,18 @@ import pyrexMD.misc as _misc
 import MDAnalysis as mda
 import numpy as np
 import os
+import glob
+import hashlib
+import json
+import queue
+import threading
 from tqdm.notebook import tqdm
 
 
+# default directory of the on-disk coordinate cache, see get_cached_coordinates()
+COORDINATE_CACHE_DIR = os.path.expanduser("~/.cache/pyrexMD/coordinates")
+
+
 ################################################################################
 ################################################################################
 ### Modify universe / topology
@@ -482,6 +491,357 @@ def sel2selid(u, sel, norm=True, filter_rna=True):
     return selid
 
 
+def _HELP_prefetch_blocks(trajectory, ix, frames, block_size, prefetch=2, dtype=np.float64):
+    """
+    Read blocks of frames in a background thread into a ring buffer with
+    prefetch+1 slots, so that trajectory decoding overlaps with computations
+    on the current block. The background thread uses a copy of the trajectory
+    reader, i.e. the state of the original trajectory is not changed.
+
+    Args:
+        trajectory (reader): MDAnalysis trajectory reader
+        ix (array): atom indices of the selection
+        frames (array): frame indices
+        block_size (int): number of frames per block
+        prefetch (int): number of blocks which are read ahead
+        dtype (dtype): data type of coordinates
+
+    Yields:
+        FRAMES (array)
+            frame indices of the block
+        TIME (array)
+            times of the block
+        COORDS (array)
+            coordinates of the block with shape (len(FRAMES), len(ix), 3)
+    """
+    n_slots = max(1, int(prefetch)) + 1
+    BUFFER = np.empty((n_slots, min(block_size, max(len(frames), 1)), len(ix), 3), dtype=dtype)
+    free_slots = queue.Queue()
+    filled_slots = queue.Queue()
+    for slot in range(n_slots):
+        free_slots.put(slot)
+    stop = threading.Event()
+
+    def __reader():
+        reader = None
+        try:
+            reader = trajectory.copy()
+            for i_block in range(0, len(frames), block_size):
+                FRAMES = frames[i_block: i_block+block_size]
+                slot = None
+                while slot is None:
+                    if stop.is_set():
+                        return
+                    try:
+                        slot = free_slots.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+                TIME = np.empty(len(FRAMES))
+                for i, frame in enumerate(FRAMES):
+                    ts = reader[frame]
+                    BUFFER[slot, i] = ts.positions[ix]
+                    TIME[i] = ts.time
+                filled_slots.put((slot, FRAMES, TIME))
+        except Exception as e:
+            filled_slots.put(e)
+        finally:
+            if reader is not None:
+                reader.close()
+
+    thread = threading.Thread(target=__reader, daemon=True)
+    thread.start()
+    try:
+        for i_block in range(0, len(frames), block_size):
+            item = filled_slots.get()
+            if isinstance(item, Exception):
+                raise item
+            slot, FRAMES, TIME = item
+            yield FRAMES, TIME, BUFFER[slot, :len(FRAMES)]
+            free_slots.put(slot)
+    finally:
+        stop.set()
+        thread.join()
+
+
+def iter_frame_blocks(u, sel="all", sss=[None, None, None], frames=None, block_size=100, verbose=False, **kwargs):
+    """
+    Iterate over a trajectory in blocks of frames and yield the coordinates of
+    a selection. The selection is resolved once and coordinates are read into
+    a buffer which is reused for each block.
+
+    .. Note:: COORDS is a view on the reused buffer, i.e. it is overwritten by
+      the next block. Copy it if it must be kept.
+
+    .. Note:: The trajectory is positioned at the last frame of each yielded
+      block, i.e. with block_size=1 the universe state matches the yielded frame.
+      Like MDAnalysis trajectory iterators, the trajectory is rewound after the
+      last block. In prefetch and cache mode, the trajectory of u is not changed at all.
+
+    Args:
+        u (universe, atomgrp): universe with trajectory or pre-resolved atomgroup
+          (sel is ignored if u is an atomgroup)
+        sel (str): selection string
+        sss (list):
+          | [start, stop, step]
+          | start (None, int): start frame
+          | stop (None, int): stop frame
+          | step (None, int): step size
+        frames (None, list, array): explicit frame indices. Overrides sss.
+        block_size (int): number of frames per block
+        verbose (bool): show progress bar
+
+    Keyword Args:
+        start (None, int): start frame
+        stop (None, int): stop frame
+        step (None, int): step size
+        dtype (dtype): data type of coordinates. Defaults to np.float64.
+        prefetch (int):
+          | number of blocks which are read ahead by a background thread
+          | 0: read blocks in the main thread (default)
+          | >0: decode the next blocks while the current block is processed
+        cache (bool, str):
+          | read coordinates from the on-disk coordinate cache, see get_cached_coordinates()
+          | False: do not use cache (default)
+          | True: use cache in COORDINATE_CACHE_DIR
+          | str: use cache in this directory
+        cache_size (int): maximum cache size in bytes
+
+    Yields:
+        FRAMES (array)
+            frame indices of the block
+        TIME (array)
+            times of the block
+        COORDS (array)
+            coordinates of the block with shape (len(FRAMES), n_atoms, 3)
+    """
+    default = {"start": sss[0],
+               "stop": sss[1],
+               "step": sss[2],
+               "dtype": np.float64,
+               "prefetch": 0,
+               "cache": False,
+               "cache_size": 10*2**30}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    if isinstance(u, mda.AtomGroup):
+        a = u
+    else:
+        a = u.select_atoms(sel)
+    trajectory = a.universe.trajectory
+    if frames is None:
+        frames = np.arange(len(trajectory))[cfg.start:cfg.stop:cfg.step]
+    frames = np.atleast_1d(np.asarray(frames, dtype=int))
+    block_size = max(1, int(block_size))
+
+    if cfg.cache:
+        cache_dir = cfg.cache if isinstance(cfg.cache, str) else None
+        _, TIME, COORDS = get_cached_coordinates(a, frames=frames, cache_dir=cache_dir, max_size=cfg.cache_size)
+        for i_block in tqdm(range(0, len(frames), block_size), disable=not verbose):
+            FRAMES = frames[i_block: i_block+block_size]
+            yield FRAMES, TIME[i_block: i_block+block_size], np.asarray(COORDS[i_block: i_block+block_size], dtype=cfg.dtype)
+        return
+
+    if cfg.prefetch:
+        with tqdm(total=len(frames), disable=not verbose) as pbar:
+            for FRAMES, TIME, COORDS in _HELP_prefetch_blocks(trajectory, a.ix, frames, block_size,
+                                                               prefetch=cfg.prefetch, dtype=cfg.dtype):
+                pbar.update(len(FRAMES))
+                yield FRAMES, TIME, COORDS
+        return
+
+    BUFFER = np.empty((min(block_size, max(len(frames), 1)), a.n_atoms, 3), dtype=cfg.dtype)
+    with tqdm(total=len(frames), disable=not verbose) as pbar:
+        for i_block in range(0, len(frames), block_size):
+            FRAMES = frames[i_block: i_block+block_size]
+            TIME = np.empty(len(FRAMES))
+            for i, frame in enumerate(FRAMES):
+                # random access instead of trajectory iterators, which rewind the trajectory when exhausted
+                ts = trajectory[frame]
+                BUFFER[i] = a.positions
+                TIME[i] = ts.time
+            pbar.update(len(FRAMES))
+            yield FRAMES, TIME, BUFFER[:len(FRAMES)]
+    trajectory.rewind()
+
+
+def _HELP_coordinate_cache_key(a, frames):
+    """
+    Get key of coordinate cache based on realpaths, mtimes and sizes of the
+    universe files, atom indices of the selection and frame indices.
+
+    Args:
+        a (atomgrp): resolved selection
+        frames (array): frame indices
+
+    Returns:
+        key (None, str)
+            sha1 hex digest or None if the universe is not based on files
+    """
+    u = a.universe
+    trajectory = u.trajectory
+    filenames = [u.filename] + list(getattr(trajectory, "filenames", [trajectory.filename]))
+    FILES = []
+    for filename in filenames:
+        if not isinstance(filename, str) or not os.path.isfile(filename):
+            return None
+        stat = os.stat(filename)
+        FILES.append([os.path.realpath(filename), stat.st_mtime_ns, stat.st_size])
+    sha1 = hashlib.sha1()
+    sha1.update(json.dumps(FILES).encode())
+    sha1.update(np.ascontiguousarray(a.ix, dtype=np.int64).tobytes())
+    sha1.update(np.ascontiguousarray(frames, dtype=np.int64).tobytes())
+    return sha1.hexdigest()
+
+
+def clear_coordinate_cache(cache_dir=None, max_size=0):
+    """
+    Remove least recently used entries of the coordinate cache until the cache
+    size is below max_size.
+
+    Args:
+        cache_dir (None, str): cache directory. None: use default directory.
+        max_size (int): maximum cache size in bytes. 0: remove all entries.
+
+    Returns:
+        removed (list)
+            list with keys of removed cache entries
+    """
+    if cache_dir is None:
+        cache_dir = COORDINATE_CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return []
+    ENTRIES = []
+    for coords_file in glob.glob(f"{cache_dir}/*.npy"):
+        key = _misc.get_base(coords_file)
+        files = [coords_file, f"{cache_dir}/{key}.npz"]
+        size = sum(os.path.getsize(f) for f in files if os.path.isfile(f))
+        ENTRIES.append((os.path.getmtime(coords_file), key, files, size))
+
+    removed = []
+    total_size = sum(item[3] for item in ENTRIES)
+    for mtime, key, files, size in sorted(ENTRIES):
+        if total_size <= max_size:
+            break
+        for f in files:
+            if os.path.isfile(f):
+                os.remove(f)
+        total_size -= size
+        removed.append(key)
+    return removed
+
+
+def get_cached_coordinates(u, sel="all", sss=[None, None, None], frames=None,
+                           cache_dir=None, max_size=10*2**30, verbose=False, **kwargs):
+    """
+    Get coordinates of a selection from an on-disk coordinate cache. On the
+    first call, the coordinates are extracted once from the trajectory and
+    saved as .npy file. Later calls with the same files, selection and frames
+    return a read-only memory map of that file, i.e. no trajectory decoding is
+    required.
+
+    The cache key consists of realpaths, mtimes and sizes of the topology and
+    trajectory files, atom indices of the selection and the frame indices.
+    Entries are invalidated automatically when the files change.
+
+    .. Note:: The cache does not know about on-the-fly transformations of the
+      trajectory. Use a separate cache_dir for transformed trajectories.
+
+    Args:
+        u (universe, atomgrp): universe with trajectory or pre-resolved atomgroup
+          (sel is ignored if u is an atomgroup)
+        sel (str): selection string
+        sss (list):
+          | [start, stop, step]
+          | start (None, int): start frame
+          | stop (None, int): stop frame
+          | step (None, int): step size
+        frames (None, list, array): explicit frame indices. Overrides sss.
+        cache_dir (None, str): cache directory. None: use COORDINATE_CACHE_DIR.
+        max_size (int): maximum cache size in bytes. Least recently used
+          entries are removed if the cache grows beyond max_size.
+        verbose (bool)
+
+    Keyword Args:
+        start (None, int): start frame
+        stop (None, int): stop frame
+        step (None, int): step size
+        block_size (int): number of frames per block during extraction
+
+    Returns:
+        FRAMES (array)
+            frame indices
+        TIME (array)
+            times of frames
+        COORDS (array)
+            coordinates with shape (len(FRAMES), n_atoms, 3) and dtype
+            np.float32 (read-only memory map if cache is used)
+    """
+    default = {"start": sss[0],
+               "stop": sss[1],
+               "step": sss[2],
+               "block_size": 1000}
+    cfg = _misc.CONFIG(default, **kwargs)
+    ############################################################################
+    if isinstance(u, mda.AtomGroup):
+        a = u
+    else:
+        a = u.select_atoms(sel)
+    if cache_dir is None:
+        cache_dir = COORDINATE_CACHE_DIR
+    if frames is None:
+        frames = np.arange(len(a.universe.trajectory))[cfg.start:cfg.stop:cfg.step]
+    frames = np.atleast_1d(np.asarray(frames, dtype=int))
+
+    key = _HELP_coordinate_cache_key(a, frames)
+    if key is None:
+        # universe is not based on files -> no caching
+        COORDS = np.empty((len(frames), a.n_atoms, 3), dtype=np.float32)
+        TIME = np.empty(len(frames))
+        i_block = 0
+        for FRAMES, times, coords in iter_frame_blocks(a, frames=frames, block_size=cfg.block_size, dtype=np.float32):
+            COORDS[i_block: i_block+len(FRAMES)] = coords
+            TIME[i_block: i_block+len(FRAMES)] = times
+            i_block += len(FRAMES)
+        return frames, TIME, COORDS
+
+    coords_file = f"{cache_dir}/{key}.npy"
+    meta_file = f"{cache_dir}/{key}.npz"
+    if not (os.path.isfile(coords_file) and os.path.isfile(meta_file)):
+        os.makedirs(cache_dir, exist_ok=True)
+        if verbose:
+            _misc.cprint(f"Extracting coordinates into cache: {coords_file}")
+        # write into temporary files and rename them afterwards -> no incomplete cache entries
+        temp_coords = f"{coords_file}.{os.getpid()}.tmp"
+        temp_meta = f"{meta_file}.{os.getpid()}.tmp"
+        COORDS = np.lib.format.open_memmap(temp_coords, mode="w+", dtype=np.float32,
+                                           shape=(len(frames), a.n_atoms, 3))
+        TIME = np.empty(len(frames))
+        i_block = 0
+        for FRAMES, times, coords in iter_frame_blocks(a, frames=frames, block_size=cfg.block_size,
+                                                       dtype=np.float32, verbose=verbose):
+            COORDS[i_block: i_block+len(FRAMES)] = coords
+            TIME[i_block: i_block+len(FRAMES)] = times
+            i_block += len(FRAMES)
+        COORDS.flush()
+        del COORDS
+        with open(temp_meta, "wb") as fout:
+            np.savez(fout, frames=frames, time=TIME)
+
+        # make room for the new entry, then move it into the cache
+        size = os.path.getsize(temp_coords) + os.path.getsize(temp_meta)
+        clear_coordinate_cache(cache_dir, max_size=max(0, max_size-size))
+        os.replace(temp_meta, meta_file)
+        os.replace(temp_coords, coords_file)
+    elif verbose:
+        _misc.cprint(f"Reading coordinates from cache: {coords_file}")
+
+    os.utime(coords_file)  # mark entry as recently used
+    with np.load(meta_file) as meta:
+        FRAMES, TIME = meta["frames"], meta["time"]
+    COORDS = np.load(coords_file, mmap_mode="r")
+    return FRAMES, TIME, COORDS
+
+
 def dump_structure(u, frames, save_as, default_dir="./structures", sel="protein"):
     """
     Dump structures for a list of frames with the file name "save_as".
@@ -509,9 +869,9 @@ def dump_structure(u, frames, save_as, default_dir="./structures", sel="protein"
         raise _misc.Error("specify a file format within the 'save_as' string!")
 
     # save structures
+    structure = u.select_atoms(sel)
     for ts in tqdm(u.trajectory[frames]):
         frame = u.trajectory.frame
-        structure = u.select_atoms(sel)
         temp_save_as = f"{dirpath}/{base}_{frame}{ext}"
         structure.write(temp_save_as)
     print("Dumped structures into:", dirpath)
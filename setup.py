@@ -29,7 +29,6 @@ if sys.version_info.minor == 8:
               'biopython==1.78',
               'duecredit>=0.9.1',
               'future>=0.18.2',
-              'GromacsWrapper==0.8.0',
               'h5py>=3.3.0',
               'heat==1.0.0',
               'ipywidgets>=7.6.3',
@@ -64,7 +63,6 @@ if sys.version_info.minor == 6:
               'biopython==1.78',
               'duecredit>=0.9.1',
               'future>=0.17.1',
-              'GromacsWrapper>=0.8.0',
               'h5py>=2.10.0',
               'heat==0.5.0',
               'ipywidgets>=7.4.2',